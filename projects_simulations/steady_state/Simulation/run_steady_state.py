@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Ejecución por lotes (sin interfaz gráfica) de la simulación steady_state.
+
+Cada corrida es autocontenida: copia el proyecto (XML con los pasos pedidos
+y la semilla de Potts, scripts y parámetros) a <outdir>/project, escribe el .cc3d y lanza
+`cc3d.run_script`. Todos los resultados van a <outdir>: results/ (logs, CSV,
+checkpoints) y cc3d/ (VTK y capturas). Varias corridas pueden convivir en el
+mismo nodo sin compartir archivos.
+
+Uso:
+    python run_steady_state.py --outdir corridas/r01 --steps 2000 --seed 7 \\
+        --params parametros.json --vtk-every 100 --log-profile quiet
+"""
+
+import os
+import re
+import sys
+import zlib
+import shutil
+import argparse
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+SIMULATION_DIR = Path(__file__).resolve().parent
+XML_NAME = "steady_state_simulation.xml"
+SIMULATION_FILES = ("steady_state_simulation.py", "steady_state_simulationSteppables.py", "parameters.json")
+CC3D_NAME = "steady_state_simulation.cc3d"
+CC3D_TEMPLATE = """<Simulation version="4.0.0">
+   <XMLScript Type="XMLScript">Simulation/steady_state_simulation.xml</XMLScript>
+   <PythonScript Type="PythonScript">Simulation/steady_state_simulation.py</PythonScript>
+   <Resource Type="Python">Simulation/steady_state_simulationSteppables.py</Resource>
+</Simulation>
+"""
+LOG_PROFILES = ("default", "quiet", "debug")
+POTTS_SEED_STREAM = "potts"
+
+def potts_seed(seed):
+    """
+    Semilla de 32 bits del RNG de Potts de CompuCell3D, derivada de la
+    semilla de la corrida igual que los flujos de RandomStreams.
+    """
+    key = zlib.crc32(POTTS_SEED_STREAM.encode("utf-8"))
+    return int(np.random.SeedSequence(int(seed), spawn_key=(key,)).generate_state(1)[0])
+
+def build_project(outdir, steps=None, seed=None):
+    """
+    Copia el proyecto a <outdir>/project y devuelve la ruta del .cc3d.
+
+    Args:
+        outdir (Path): Directorio de la corrida
+        steps (int, optional): Reemplaza <Steps> del XML
+        seed (int, optional): Semilla de la corrida; fija <RandomSeed> de <Potts>
+    """
+    project_dir = outdir / "project"
+    simulation_dir = project_dir / "Simulation"
+    simulation_dir.mkdir(parents=True, exist_ok=True)
+
+    for name in SIMULATION_FILES:
+        source = SIMULATION_DIR / name
+        if source.exists():
+            shutil.copy2(source, simulation_dir / name)
+
+    xml = (SIMULATION_DIR / XML_NAME).read_text()
+    if steps is not None:
+        xml, replaced = re.subn(r"<Steps>\s*\d+\s*</Steps>", f"<Steps>{int(steps)}</Steps>", xml)
+        if replaced != 1:
+            raise ValueError(f"No se encontró un único <Steps> en {XML_NAME}")
+    if seed is not None:
+        random_seed = f"<RandomSeed>{potts_seed(seed)}</RandomSeed>"
+        xml, replaced = re.subn(r"<RandomSeed>\s*\d+\s*</RandomSeed>", random_seed, xml)
+        if replaced == 0:
+            xml, replaced = re.subn(r"(\s*)</Potts>", rf"\g<1>   {random_seed}\g<1></Potts>", xml, count=1)
+        if replaced != 1:
+            raise ValueError(f"No se encontró la sección <Potts> en {XML_NAME}")
+    (simulation_dir / XML_NAME).write_text(xml)
+
+    cc3d_path = project_dir / CC3D_NAME
+    cc3d_path.write_text(CC3D_TEMPLATE)
+    return cc3d_path
+
+def build_command(cc3d_path, outdir, vtk_every=0, screenshot_every=0):
+    """Comando de cc3d.run_script para el proyecto copiado."""
+    command = [sys.executable, "-m", "cc3d.run_script",
+               "-i", str(cc3d_path),
+               "-o", str(outdir / "cc3d"),
+               "-f", str(int(vtk_every))]
+    if screenshot_every:
+        command += ["--screenshot-output-frequency", str(int(screenshot_every))]
+    return command
+
+def build_env(outdir, params=None, seed=None, log_profile=None, resume=None):
+    """Variables SBA_* que configure_run lee en el proceso de la simulación."""
+    env = dict(os.environ)
+    env["SBA_OUTPUT_DIR"] = str(outdir / "results")
+    if params is not None:
+        env["SBA_PARAMS"] = str(Path(params).resolve())
+    if seed is not None:
+        env["SBA_SEED"] = str(seed)
+    if log_profile is not None:
+        env["SBA_LOG_PROFILE"] = log_profile
+    if resume is not None:
+        env["SBA_RESUME"] = resume if resume == "latest" else str(Path(resume).resolve())
+    return env
+
+def run(args):
+    """Prepara y ejecuta una corrida; devuelve el código de salida de CompuCell3D."""
+    outdir = Path(args.outdir).resolve()
+    outdir.mkdir(parents=True, exist_ok=True)
+    if args.params is not None and not Path(args.params).exists():
+        raise FileNotFoundError(f"No existe el archivo de parámetros {args.params}")
+
+    # La semilla se fija aquí para que Potts y los flujos de NumPy de la corrida salgan de la misma
+    seed = args.seed if args.seed is not None else np.random.SeedSequence().entropy
+    cc3d_path = build_project(outdir, args.steps, seed)
+    command = build_command(cc3d_path, outdir, args.vtk_every, args.screenshot_every)
+    env = build_env(outdir, args.params, seed, args.log_profile, args.resume)
+
+    if args.dry_run:
+        print(" ".join(command))
+        return 0
+
+    print(f"🚀 steady_state → {outdir}")
+    return subprocess.call(command, env=env, cwd=outdir)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ejecuta la simulación steady_state sin interfaz gráfica")
+    parser.add_argument("--outdir", required=True, help="Directorio de la corrida (se crea si no existe)")
+    parser.add_argument("--steps", type=int, default=None, help="MCS a simular (default: <Steps> del XML)")
+    parser.add_argument("--seed", type=int, default=None, help="Semilla de la corrida y del RNG de Potts (default: aleatoria, se guarda en results/rng_seed.json)")
+    parser.add_argument("--params", default=None, help="Archivo JSON de parámetros (default: parameters.json del proyecto)")
+    parser.add_argument("--vtk-every", type=int, default=0, help="MCS entre archivos VTK de la red (0 = ninguno)")
+    parser.add_argument("--screenshot-every", type=int, default=0, help="MCS entre capturas (0 = ninguna)")
+    parser.add_argument("--log-profile", choices=LOG_PROFILES, default=None, help="Perfil de logging (default: SBA_LOG_PROFILE o 'default')")
+    parser.add_argument("--resume", default=None, help="Checkpoint desde el que reanudar (ruta o 'latest')")
+    parser.add_argument("--dry-run", action="store_true", help="Prepara el proyecto y muestra el comando sin ejecutarlo")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    sys.exit(run(parse_args(argv)))
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,53 @@ import sys
 from cc3d import CompuCellSetup
 from steady_state_simulationSteppables import *
 
-CompuCellSetup.register_steppable(ConstraintInitializerSteppable(frequency=1))
-CompuCellSetup.register_steppable(GrowthSteppable(frequency=1))
-CompuCellSetup.register_steppable(MitosisSteppable(frequency=1))
-CompuCellSetup.register_steppable(DeathSteppable(frequency=1))
-CompuCellSetup.register_steppable(MutationSteppable(frequency=1))
+# Directorio de resultados, logging, parámetros y semilla (SBA_OUTPUT_DIR, SBA_LOG_PROFILE, SBA_PARAMS, SBA_SEED)
+configure_run()
 
-CompuCellSetup.run() 
\ No newline at end of file
+microenvironment = MicroenvironmentSteppable(frequency=1)
+
+# Mutation y Death cada k MCS (SBA_MULTIRATE="mutation=4,death=2"), validado contra MULTIRATE_TOLERANCE
+rates = multirate_from_env()
+validate_multirate(rates)
+
+# Pipeline fusionado (SBA_FUSED_PIPELINE=1) o steppables separados
+if FusedCellUpdateSteppable.enabled():
+    fused = FusedCellUpdateSteppable(frequency=1, rates=rates)
+    steppables = [ConstraintInitializerSteppable(frequency=1), microenvironment, fused]
+    timed_steppables = [microenvironment] + fused.stages
+else:
+    steppables = [
+        ConstraintInitializerSteppable(frequency=1),
+        microenvironment,
+        GrowthSteppable(frequency=1),
+        MitosisSteppable(frequency=1),
+        DeathSteppable(frequency=1, rate=rates.get('death', 1)),
+        MutationSteppable(frequency=1, rate=rates.get('mutation', 1)),
+    ]
+    timed_steppables = steppables[1:]
+
+steppables.append(ConvergenceMonitorSteppable(frequency=1))
+steppables.append(InstrumentationSteppable(frequency=1, steppables=timed_steppables))
+
+# Snapshots comprimidos de la red y campos químicos (opcional, SBA_LATTICE_SNAPSHOTS=1 o "o2=10,glc=10,cell_type=50")
+if LatticeSnapshotSteppable.enabled():
+    steppables.append(LatticeSnapshotSteppable(frequency=1))
+
+# Checkpoints periódicos; con SBA_RESUME restaura el estado después de ConstraintInitializer
+gc_steppable = GarbageCollectionSteppable(frequency=1)
+steppables.append(CheckpointSteppable(frequency=1, steppables=steppables + [gc_steppable]))
+
+# GC después de todos los start() (incluida la restauración del checkpoint) para congelar esas células
+steppables.append(gc_steppable)
+
+# Perfilado de todos los steppables registrados (opcional, SBA_PROFILE_STEPS=1); va al final
+if StepProfilerSteppable.enabled():
+    steppables.append(StepProfilerSteppable(frequency=1, steppables=list(steppables)))
+
+# Cierre de los artefactos de la corrida; sin este finish() el manifiesto queda "incomplete"
+steppables.append(RunOutputSteppable(frequency=1))
+
+for steppable in steppables:
+    CompuCellSetup.register_steppable(steppable)
+
+CompuCellSetup.run()
@@ -2,14 +2,130 @@
 from cc3d.core.PySteppables import *
 from cc3d import CompuCellSetup
 import numpy as np
-import random
+import zlib
 import logging
 import gc
 import os
+import sys
 import tracemalloc
 import csv
+import gzip
+import json
+import queue
+import atexit
+import time
+import signal
+from logging.handlers import QueueHandler, QueueListener
+
+# ------------- LOGGING -------------
+
+# Categorías de eventos para muestreo y límites de frecuencia
+LOG_LIFECYCLE = {'category': 'lifecycle'}    # inicio/fin de steppables, archivos guardados
+LOG_DIVISION = {'category': 'division'}
+LOG_DEATH = {'category': 'death'}
+LOG_MUTATION = {'category': 'mutation'}
+LOG_TRANSITION = {'category': 'transition'}
+LOG_COUNTDOWN = {'category': 'countdown'}    # células a punto de cambiar de fenotipo
+LOG_GROWTH = {'category': 'growth'}
+LOG_METRICS = {'category': 'metrics'}
+
+# Perfiles de logging:
+# - level: nivel mínimo de los loggers
+# - allow: categorías permitidas (None = todas); WARNING y superiores siempre pasan
+# - limits: máximo de mensajes por categoría y MCS
+# - sample: conservar 1 de cada k mensajes de la categoría (determinista, no usa RNG)
+LOG_PROFILES = {
+    'debug': {'level': logging.DEBUG, 'allow': None, 'limits': {}, 'sample': {}},
+    'default': {
+        'level': logging.INFO,
+        'allow': None,
+        'limits': {'countdown': 10, 'division': 20, 'death': 20, 'mutation': 20, 'transition': 20, 'growth': 10},
+        'sample': {},
+    },
+    'quiet': {'level': logging.INFO, 'allow': {'lifecycle', 'division', 'death'}, 'limits': {}, 'sample': {}},
+}
+LOG_PROFILE = 'default'
+LOG_PROFILE_ENV = 'SBA_LOG_PROFILE'
+OUTPUT_DIR_ENV = 'SBA_OUTPUT_DIR'   # directorio de resultados de la corrida (por defecto Simulation/results)
+
+class LazyQueueHandler(QueueHandler):
+    """Encola el registro sin formatear: el mensaje se construye en el hilo de escritura."""
+    def prepare(self, record):
+        return record
+
+class CategoryRouterHandler(logging.Handler):
+    """Handler del hilo de escritura: un archivo por logger más la consola."""
+    def __init__(self, output_dir, formatter):
+        super().__init__()
+        self.output_dir = output_dir
+        self.formatter = formatter
+        self.files = {}
+        self.console = logging.StreamHandler()
+        self.console.setFormatter(formatter)
+
+    def emit(self, record):
+        handler = self.files.get(record.name)
+        if handler is None:
+            handler = logging.FileHandler(os.path.join(self.output_dir, f"{record.name}.log"), mode='w')
+            handler.setFormatter(self.formatter)
+            self.files[record.name] = handler
+        handler.handle(record)
+        self.console.handle(record)
+
+    def close(self):
+        for handler in self.files.values():
+            handler.close()
+        self.console.flush()
+        super().close()
+
+class CategoryRateFilter(logging.Filter):
+    """Aplica el perfil activo: categorías permitidas, muestreo y límite por MCS."""
+    def __init__(self, config):
+        super().__init__()
+        self.config = config
+        self.window = None
+        self.counts = {}
+        self.seen = {}
+        self.suppressed = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+
+        profile = self.config.profile
+        category = getattr(record, 'category', 'general')
+        allow = profile['allow']
+        if allow is not None and category not in allow:
+            return False
+
+        every = profile['sample'].get(category)
+        if every:
+            seen = self.seen.get(category, 0)
+            self.seen[category] = seen + 1
+            if seen % every:
+                return False
+
+        limit = profile['limits'].get(category)
+        if limit is not None:
+            if self.config.current_mcs != self.window:
+                self.window = self.config.current_mcs
+                self.counts.clear()
+            count = self.counts.get(category, 0)
+            if count >= limit:
+                self.suppressed[category] = self.suppressed.get(category, 0) + 1
+                return False
+            self.counts[category] = count + 1
+        return True
 
 class LoggerConfig:
+    """
+    Configuración única de logging de la simulación.
+
+    Los loggers solo encolan registros (QueueHandler); el formateo y la
+    escritura a archivo/consola ocurren en un hilo de fondo (QueueListener).
+    El perfil activo (LOG_PROFILE o SBA_LOG_PROFILE) decide qué categorías se
+    conservan y cuántos mensajes por MCS se permiten.
+    """
     _instance = None
 
     def __new__(cls):
@@ -20,30 +136,325 @@ class LoggerConfig:
 
     def _initialize(self):
         current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.output_dir = os.path.join(current_dir, "results")
+        self.output_dir = os.environ.get(OUTPUT_DIR_ENV) or os.path.join(current_dir, "results")
         os.makedirs(self.output_dir, exist_ok=True)
         self.logs = {}
+        self.current_mcs = None
+        self.set_profile(os.environ.get(LOG_PROFILE_ENV) or LOG_PROFILE)
+        self.rate_filter = CategoryRateFilter(self)
+
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+        self.queue = queue.SimpleQueue()
+        self.router = CategoryRouterHandler(self.output_dir, formatter)
+        self.listener = QueueListener(self.queue, self.router)
+        self.listener.start()
+        atexit.register(self.shutdown)
+
+    def set_profile(self, name):
+        if name not in LOG_PROFILES:
+            raise ValueError(f"Perfil de logging desconocido: {name}")
+        self.profile_name = name
+        self.profile = LOG_PROFILES[name]
+        for logger in self.logs.values():
+            logger.setLevel(self.profile['level'])
+
+    def begin_mcs(self, mcs):
+        """Abre la ventana de límites por MCS."""
+        self.current_mcs = mcs
 
     def get_logger(self, name):
         if name not in self.logs:
             logger = logging.getLogger(name)
-            logger.setLevel(logging.INFO)
+            logger.setLevel(self.profile['level'])
 
-            formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-            log_file_path = os.path.join(self.output_dir, f"{name}.log")
-            fh = logging.FileHandler(log_file_path, mode='w')
-            fh.setFormatter(formatter)
-            logger.addHandler(fh)
-
-            ch = logging.StreamHandler()
-            ch.setFormatter(formatter)
-            logger.addHandler(ch)
+            handler = LazyQueueHandler(self.queue)
+            handler.addFilter(self.rate_filter)
+            logger.addHandler(handler)
 
             self.logs[name] = logger
         return self.logs[name]
 
-# Singleton del logger
-logger_main = LoggerConfig().get_logger('main')
+    def shutdown(self):
+        """Vacía la cola y cierra los archivos de log."""
+        if self.listener is None:
+            return
+        suppressed = self.rate_filter.suppressed
+        if suppressed:
+            self.get_logger('main').info("🔇 Mensajes omitidos por límite de frecuencia: %s", suppressed, extra=LOG_LIFECYCLE)
+        self.listener.stop()
+        self.listener = None
+        self.router.close()
+
+# ------------- SALIDAS DE LA CORRIDA -------------
+
+MANIFEST_NAME = 'manifest.json'
+OUTPUT_BUFFER_BYTES = 1 << 20   # buffer de los escritores CSV de larga vida
+
+def atomic_write(path, write, mode='w'):
+    """
+    Escribe `path` a través de un archivo temporal y lo renombra al terminar:
+    el archivo final existe completo o no existe.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, mode, **({'newline': ''} if 'b' not in mode else {})) as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _row_mcs(line, mcs_index):
+    """MCS de una fila CSV (bytes o str); None si la fila está incompleta."""
+    separator = b',' if isinstance(line, bytes) else ','
+    try:
+        return int(float(line.split(separator)[mcs_index]))
+    except (IndexError, ValueError):
+        return None
+
+def truncate_csv(path, last_mcs, mcs_index=0):
+    """
+    Corta en el lugar un CSV ordenado por MCS tras la última fila con
+    MCS <= last_mcs (y tras una última fila a medio escribir). Devuelve el
+    número de filas conservadas, sin contar el encabezado.
+    """
+    rows = 0
+    with open(path, 'rb+') as f:
+        f.readline()
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                break
+            mcs = _row_mcs(line, mcs_index)
+            if mcs is None or mcs > last_mcs:
+                break
+            rows += 1
+        f.seek(offset)
+        f.truncate()
+    return rows
+
+def copy_csv_rows(source, target, last_mcs, mcs_index=0):
+    """Copia encabezado y filas con MCS <= last_mcs de un CSV abierto a otro; devuelve las filas copiadas."""
+    rows = 0
+    target.write(source.readline())
+    for line in source:
+        mcs = _row_mcs(line, mcs_index)
+        if not line.endswith('\n') or mcs is None or mcs > last_mcs:
+            break
+        target.write(line)
+        rows += 1
+    return rows
+
+def resume_source(path, partial_path):
+    """
+    Archivo de la corrida previa a continuar al reanudar: el final si llegó a
+    cerrarse, si no el .partial. El final se mueve a `partial_path` para que
+    un fallo posterior no deje un archivo completo a medias.
+    """
+    if os.path.exists(path):
+        os.replace(path, partial_path)
+    return partial_path if os.path.exists(partial_path) else None
+
+class ArtifactWriter:
+    """
+    Escritor CSV de larga vida con buffer grande. Las filas van a
+    <nombre>.partial; al cerrar se renombra al nombre final y se registra en
+    el manifiesto con su número de filas.
+
+    Con `resume_mcs` continúa el archivo de la corrida previa: conserva las
+    filas con MCS <= resume_mcs (columna "MCS" del encabezado) y agrega a
+    continuación. Si el encabezado cambió se empieza de nuevo.
+    """
+    def __init__(self, output, name, header=None, buffering=OUTPUT_BUFFER_BYTES, resume_mcs=None):
+        self.output = output
+        self.name = name
+        self.path = output.path(name)
+        self.tmp_path = self.path + '.partial'
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.rows = 0
+        kept = self._continue(header, resume_mcs) if resume_mcs is not None and header and 'MCS' in header else None
+        if kept is not None:
+            self._handle = open(self.tmp_path, 'a', newline='', buffering=buffering)
+            self._writer = csv.writer(self._handle)
+            self.rows = kept
+            return
+        self._handle = open(self.tmp_path, 'w', newline='', buffering=buffering)
+        self._writer = csv.writer(self._handle)
+        if header is not None:
+            self._writer.writerow(header)
+
+    def _continue(self, header, resume_mcs):
+        """Corta el archivo previo en `resume_mcs`; devuelve las filas conservadas o None."""
+        source = resume_source(self.path, self.tmp_path)
+        if source is None:
+            return None
+        with open(source, newline='') as f:
+            previous_header = next(csv.reader(f), None)
+        if previous_header != [str(column) for column in header]:
+            return None
+        return truncate_csv(source, resume_mcs, header.index('MCS'))
+
+    @property
+    def closed(self):
+        return self._handle is None
+
+    def writerow(self, row):
+        self._writer.writerow(row)
+        self.rows += 1
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def flush(self):
+        """Pasa el buffer al sistema operativo (las series periódicas lo llaman por muestra)."""
+        self._handle.flush()
+
+    def close(self):
+        if self._handle is None:
+            return
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self._handle.close()
+        self._handle = None
+        os.replace(self.tmp_path, self.path)
+        self.output.register(self.name, rows=self.rows)
+
+    def abandon(self):
+        """Cierra sin renombrar: el .partial queda como registro de una corrida incompleta."""
+        if self._handle is None:
+            return
+        self._handle.flush()
+        self._handle.close()
+        self._handle = None
+
+class RunOutput:
+    """
+    Dueño único del directorio de resultados de la corrida.
+
+    Entrega escritores CSV con buffer (writer), escribe archivos completos de
+    forma atómica (write_csv, write_json, write_text) y mantiene
+    results/manifest.json con filas, bytes y MCS de cada artefacto, de modo
+    que el posprocesamiento sabe qué existe sin recorrer directorios. Al
+    reanudar una corrida se conservan las entradas del manifiesto previo y
+    las series continúan desde el MCS del checkpoint (`resume_mcs`).
+
+    Solo close(), llamado por RunOutputSteppable.finish() al terminar la
+    corrida, renombra los .partial y marca el manifiesto como "complete".
+    Si el proceso termina sin pasar por ahí (excepción, señal, cierre de la
+    ventana), abandon() se ejecuta al salir: deja los .partial y marca el
+    manifiesto como "incomplete".
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(RunOutput, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self.directory = LoggerConfig().output_dir
+        self.manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+        self.artifacts = {}
+        self.writers = {}
+        self.status = 'running'
+        # Desfase de MCS de una corrida reanudada (lo fija CheckpointSteppable al restaurar)
+        self.mcs_offset = 0
+        # MCS del checkpoint desde el que se reanuda (se resuelve antes de que esta corrida escriba otros)
+        self.resume_mcs = checkpoint_mcs(resolve_checkpoint(os.environ.get(RESUME_ENV), self.path("checkpoints")))
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path) as f:
+                    self.artifacts = json.load(f).get('artifacts', {})
+            except (OSError, ValueError):
+                self.artifacts = {}
+        atexit.register(self.abandon)
+
+    def run_mcs(self, step):
+        """MCS de la corrida completa para un paso de CC3D (incluye el desfase al reanudar)."""
+        return step + self.mcs_offset
+
+    def path(self, name):
+        """Ruta absoluta de un artefacto (nombre relativo al directorio de la corrida)."""
+        return os.path.join(self.directory, name)
+
+    def writer(self, name, header=None, resume=False):
+        """
+        Escritor CSV de larga vida; se cierra con close() o con el cierre de
+        la corrida (si el proceso termina antes, queda como .partial). Con `resume` y una corrida reanudada, continúa la serie
+        previa hasta el MCS del checkpoint en vez de sobrescribirla.
+        """
+        current = self.writers.get(name)
+        if current is not None and not current.closed:
+            raise ValueError(f"El artefacto {name} ya tiene un escritor abierto")
+        self.writers[name] = ArtifactWriter(self, name, header, resume_mcs=self.resume_mcs if resume else None)
+        return self.writers[name]
+
+    def write_csv(self, name, header, rows):
+        writer = self.writer(name, header)
+        writer.writerows(rows)
+        writer.close()
+        return writer.path
+
+    def write_json(self, name, data, **kwargs):
+        path = self.path(name)
+        atomic_write(path, lambda f: json.dump(data, f, **{'indent': 2, **kwargs}))
+        self.register(name)
+        return path
+
+    def write_text(self, name, text):
+        path = self.path(name)
+        atomic_write(path, lambda f: f.write(text))
+        self.register(name, rows=text.count('\n'))
+        return path
+
+    def register(self, name, rows=None, **info):
+        """Registra (o actualiza) un artefacto ya escrito y guarda el manifiesto."""
+        path = self.path(name)
+        if os.path.isdir(path):
+            size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+        else:
+            size = os.path.getsize(path)
+        self.artifacts[name] = {'rows': rows, 'bytes': size, 'mcs': LoggerConfig().current_mcs,
+                                'written_at': round(time.time(), 3), **info}
+        self._save_manifest()
+
+    def unregister(self, name):
+        if self.artifacts.pop(name, None) is not None:
+            self._save_manifest()
+
+    def _save_manifest(self):
+        manifest = {'output_dir': self.directory, 'status': self.status, 'artifacts': dict(sorted(self.artifacts.items()))}
+        atomic_write(self.manifest_path, lambda f: json.dump(manifest, f, indent=2))
+
+    def close(self):
+        """Cierre de una corrida terminada: renombra los .partial abiertos y registra los logs."""
+        if self.status != 'running':
+            return
+        for writer in self.writers.values():
+            writer.close()
+        self._end('complete')
+
+    def abandon(self):
+        """Cierre sin finish() (atexit): los .partial se conservan y el manifiesto queda incompleto."""
+        if self.status != 'running':
+            return
+        for writer in self.writers.values():
+            writer.abandon()
+        self._end('incomplete')
+
+    def _end(self, status):
+        self.status = status
+        config = LoggerConfig()
+        config.shutdown()
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.log'):
+                self.register(name)
+        self._save_manifest()
+
+# Logger principal; LoggerConfig le agrega su handler al configurar la corrida (configure_run)
+logger_main = logging.getLogger('main')
 
 # -----------------------------------------------------------------------------------
 # Definición de constantes para la simulación
@@ -80,12 +491,45 @@ glc_THRESHOLD_HIPO = 0.5  # mM - hipoglucemia severa
 lac_THRESHOLD_ACIDIC = 10  # mM - estrés ácido
 lac_THRESHOLD_TOXIC = 20   # mM - toxicidad severa
 
+# Valores metabólicos ideales (condiciones fisiológicas) y tolerancias para considerar el ambiente "óptimo"
+O2_OPTIMAL = 180   # µM
+GLC_OPTIMAL = 10   # mM
+LAC_OPTIMAL = 2.0  # mM
+TOL_O2 = 40
+TOL_GLC = 2
+TOL_LAC = 1
+
+# Clases de ambiente: bits del código uint8 que el snapshot calcula una vez por MCS.
+# Las reglas se solapan (p. ej. óptimo y estrés leve), por eso cada clase es un bit.
+ENV_NEUTRAL = 0
+ENV_OPTIMAL = 1          # o2, glc y lac dentro de la tolerancia del óptimo
+ENV_MILD_STRESS = 2      # hipo <= o2 <= umbral y hipo <= glc <= umbral
+ENV_SEVERE_STRESS = 4    # o2 < hipo y glc < hipo
+ENV_TOXIC_LACTATE = 8    # lac > lac_THRESHOLD_TOXIC
+ENV_VIABLE = 16          # o2 >= hipo y glc >= hipo
+ENV_VIABLE_STRICT = 32   # o2 > hipo y glc > hipo
+ENV_HYPOXIC = 64         # o2 < umbral y glc < umbral (mutación por hipoxia)
+
 # Parámetros de volumen y crecimiento
 MCS_INIT_EVO = 7   # (Acortado) ~6 horas para formación inicial del microambiente
 INITIAL_TARGET_VOLUME = 32  # voxels (~2048 µm³)
 INITIAL_LAMBDA_VOLUME = 2.0
 MITOSIS_VOLUME_THRESHOLD = 64  # Volumen duplicado para división
+NECROTIC_TARGET_VOLUME = 20     # voxels - células necróticas presentes al inicio
+NECROTIC_LAMBDA_VOLUME = 50
+DEAD_TARGET_VOLUME = 25         # voxels - células que mueren durante la corrida
+DEAD_LAMBDA_VOLUME = 50.0
 GROWTH_RATE_PROL = 0.22  # voxels por MCS
+GROWTH_BASE_PROL = 0.26   # voxels por MCS en condiciones óptimas
+GROWTH_BASE_RESE = 0.13
+GROWTH_BASE_INVA = 0.20
+GROWTH_BASE_OTHER = 0.05
+GROWTH_MAX_PER_MCS = 0.5        # límite máximo de crecimiento (voxels por MCS)
+GROWTH_KM_GLC = 0.05            # mM - constante de Michaelis-Menten de glucosa
+GROWTH_KM_O2 = 20.0             # µM - constante de Michaelis-Menten de oxígeno
+GROWTH_KI_LAC = 10.0            # mM - constante de inhibición por lactato
+MITOSIS_CHECK_MARGIN = 8.0     # voxels: margen para fluctuaciones de volumen alrededor del volumen objetivo
+MITOSIS_MAX_STALENESS = 20     # MCS máximos sin leer el volumen real de una célula
 
 # pH óptimo para proliferación
 OPTIMAL_h3o = 7.2  # pH 7.2 (condiciones fisiológicas)
@@ -95,6 +539,7 @@ MUTATION_PERC = 0.05  # 5% de células elegibles para mutar
 MUTATION_DELAY = 28  # ~24 horas para permitir microambiente maduro
 DEATH_DELAY = 18     # ~15 horas de exposición crítica para activar muerte
 MUTATION_PROBABILITY = 0.01  # Baja tasa de mutación aleatoria
+MUTATION_INTERVAL = 500      # MCS entre rondas de mutación aleatoria
 
 # Umbrales de cambio fenotípico (en MCS)
 MCS_PROL_TO_RESE = 14     # 6–12 horas (estrés moderado)
@@ -103,6 +548,146 @@ MCS_RESE_TO_PROL = 10      # 8–12 horas (recuperación parcial)
 MCS_INVA_TO_RESE = 19     # 16–48 horas (normalización ambiental)
 DEATH_MCS_THRESHOLD = 36  # Aumentado de 18 a 36 MCS para dar más tiempo de recuperación
 
+# Telemetría de crecimiento
+GROWTH_LOG_FORMAT = 'csv.gz'     # 'csv', 'csv.gz', 'npz' o 'parquet'
+GROWTH_LOG_MODE = 'per_cell'     # 'per_cell' (una fila por célula) o 'per_type' (agregado por tipo y MCS)
+GROWTH_LOG_FLUSH_INTERVAL = 50   # MCS entre escrituras a disco
+
+# Instrumentación de memoria y rendimiento
+INSTRUMENTATION_INTERVAL = 10          # MCS entre muestras
+TRACEMALLOC_ENV = 'SBA_TRACEMALLOC'    # "1" activa snapshots completos de tracemalloc en cada muestra
+STEP_PROFILE_ENV = 'SBA_PROFILE_STEPS' # "1" registra la duración de start/step/finish de cada steppable
+FUSED_PIPELINE_ENV = 'SBA_FUSED_PIPELINE'  # "1" usa FusedCellUpdateSteppable en lugar de los steppables separados
+
+# Números aleatorios
+SEED_ENV = 'SBA_SEED'   # semilla de la corrida; sin ella se genera una y se guarda en results/rng_seed.json
+
+# Evaluación multi-frecuencia (Mutation y Death cada k MCS con contadores escalados por k)
+MULTIRATE_ENV = 'SBA_MULTIRATE'   # p. ej. "mutation=4,death=2"
+MULTIRATE_TOLERANCE = 0.25        # error relativo máximo admitido en el tiempo de cada transición
+
+# Detección de estado estacionario
+CONVERGENCE_WINDOW = 50        # MCS por ventana
+CONVERGENCE_WINDOWS = 3        # ventanas consecutivas bajo tolerancia para declarar estado estacionario
+CONVERGENCE_MIN_MCS = 100      # no evaluar antes (microambiente y delays iniciales)
+CONVERGENCE_TOLERANCES = {     # cambio relativo máximo por MCS
+    'population': 1e-3,        # células por tipo
+    'volume': 1e-3,            # volumen celular total
+    'fields': 5e-4,            # o2/glc/lac medios en las células
+}
+STEADY_STATE_STOP_ENV = 'SBA_STEADY_STATE_STOP'   # "0" solo registra el estado estacionario sin detener
+
+# Checkpoints
+CHECKPOINT_INTERVAL = 100   # MCS entre checkpoints
+CHECKPOINT_KEEP = 3         # checkpoints conservados (los más recientes)
+CHECKPOINT_FIELDS = ('o2', 'glc', 'lac', 'akg', 'fum', 'h3o', 'hco3')
+CHECKPOINT_COUNTERS = ('transition_counts', 'mutation_count', 'death_count')
+RESUME_ENV = 'SBA_RESUME'   # ruta a un checkpoint o "latest" para reanudar la corrida
+
+# Snapshots de la red (alternativa compacta a la serie LatticeData .vtk)
+LATTICE_SNAPSHOT_FORMAT = 'hdf5'   # 'hdf5' (requiere h5py) o 'npz' (directorio con un .npz por campo y MCS)
+LATTICE_SNAPSHOT_CADENCE = {       # MCS entre snapshots de cada red
+    'cell_type': 100, 'cell_id': 100,
+    'o2': 10, 'glc': 10, 'lac': 10,
+    'akg': 100, 'fum': 100,
+}
+LATTICE_SNAPSHOT_ENV = 'SBA_LATTICE_SNAPSHOTS'   # "1" usa LATTICE_SNAPSHOT_CADENCE; "o2=10,glc=10,cell_type=50" la reemplaza
+
+# Política de recolección de basura
+GC_INTERVAL = 100                  # MCS entre recolecciones completas programadas
+GC_THRESHOLDS = (20000, 50, 1000)  # gen0 alto: cada MCS crea muchos objetos efímeros (tuplas, floats)
+
+# Parámetros externos
+PARAMETERS_ENV = 'SBA_PARAMS'   # ruta a un JSON de parámetros; por defecto parameters.json junto a este archivo
+PARAMETER_NAMES = (
+    'o2_THRESHOLD', 'o2_THRESHOLD_HIPO', 'glc_THRESHOLD', 'glc_THRESHOLD_HIPO',
+    'lac_THRESHOLD_ACIDIC', 'lac_THRESHOLD_TOXIC',
+    'O2_OPTIMAL', 'GLC_OPTIMAL', 'LAC_OPTIMAL', 'TOL_O2', 'TOL_GLC', 'TOL_LAC',
+    'MCS_INIT_EVO', 'INITIAL_TARGET_VOLUME', 'INITIAL_LAMBDA_VOLUME', 'MITOSIS_VOLUME_THRESHOLD',
+    'NECROTIC_TARGET_VOLUME', 'NECROTIC_LAMBDA_VOLUME', 'DEAD_TARGET_VOLUME', 'DEAD_LAMBDA_VOLUME',
+    'GROWTH_RATE_PROL', 'GROWTH_BASE_PROL', 'GROWTH_BASE_RESE', 'GROWTH_BASE_INVA', 'GROWTH_BASE_OTHER',
+    'GROWTH_MAX_PER_MCS', 'GROWTH_KM_GLC', 'GROWTH_KM_O2', 'GROWTH_KI_LAC',
+    'MITOSIS_CHECK_MARGIN', 'MITOSIS_MAX_STALENESS', 'OPTIMAL_h3o',
+    'MUTATION_PERC', 'MUTATION_DELAY', 'DEATH_DELAY', 'MUTATION_PROBABILITY', 'MUTATION_INTERVAL',
+    'MCS_PROL_TO_RESE', 'MCS_RESE_TO_INVA', 'MCS_RESE_TO_PROL', 'MCS_INVA_TO_RESE', 'DEATH_MCS_THRESHOLD',
+)
+# Parámetros enteros (conteos de MCS, intervalos y retardos); el resto se convierte a float
+INTEGER_PARAMETERS = frozenset({
+    'MCS_INIT_EVO', 'MITOSIS_MAX_STALENESS', 'MUTATION_DELAY', 'DEATH_DELAY', 'MUTATION_INTERVAL',
+    'MCS_PROL_TO_RESE', 'MCS_RESE_TO_INVA', 'MCS_RESE_TO_PROL', 'MCS_INVA_TO_RESE', 'DEATH_MCS_THRESHOLD',
+})
+
+def current_parameters():
+    """Valores vigentes de todos los parámetros externos."""
+    return {name: globals()[name] for name in PARAMETER_NAMES}
+
+def _coerce_parameter(name, value, path):
+    """Convierte `value` a int (INTEGER_PARAMETERS) o float, o lanza ValueError."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Parámetro {name} en {path}: se esperaba un número, no {value!r}")
+    if name in INTEGER_PARAMETERS:
+        if not float(value).is_integer():
+            raise ValueError(f"Parámetro {name} en {path}: se esperaba un entero, no {value!r}")
+        return int(value)
+    return float(value)
+
+def load_parameters(path):
+    """
+    Sobrescribe los parámetros del módulo con los de un archivo JSON plano
+    ({"MCS_PROL_TO_RESE": 14, ...}). Los nombres desconocidos son un error
+    para que un typo en un barrido no pase inadvertido. Los parámetros de
+    INTEGER_PARAMETERS se guardan como int (un valor no entero como 14.5 es
+    un error en vez de truncarse); los demás como float.
+    """
+    with open(path) as f:
+        values = json.load(f)
+
+    unknown = sorted(set(values) - set(PARAMETER_NAMES))
+    if unknown:
+        raise ValueError(f"Parámetros desconocidos en {path}: {', '.join(unknown)}")
+
+    for name, value in values.items():
+        globals()[name] = _coerce_parameter(name, value, path)
+    return current_parameters()
+
+def save_parameters(path):
+    """Guarda los parámetros efectivos de la corrida."""
+    atomic_write(path, lambda f: json.dump(current_parameters(), f, indent=2))
+
+DEFAULT_PARAMETERS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parameters.json")
+
+def configure_run(output_dir=None, params=None, seed=None, log_profile=None):
+    """
+    Prepara la corrida antes de crear los steppables: directorio de
+    resultados, logging, parámetros y semilla. Importar este módulo no tiene
+    efectos; todo ocurre aquí. Los argumentos None toman SBA_OUTPUT_DIR,
+    SBA_PARAMS, SBA_SEED y SBA_LOG_PROFILE o los valores por defecto.
+    """
+    if LoggerConfig._instance is not None:
+        raise RuntimeError("configure_run debe llamarse antes de crear steppables o loggers")
+
+    # Se exportan como variables de entorno para que los procesos hijos vean la misma configuración
+    for env_name, value in ((OUTPUT_DIR_ENV, output_dir), (PARAMETERS_ENV, params),
+                            (SEED_ENV, seed), (LOG_PROFILE_ENV, log_profile)):
+        if value is not None:
+            os.environ[env_name] = str(value)
+
+    config = LoggerConfig()
+    config.get_logger('main')
+
+    params_path = os.environ.get(PARAMETERS_ENV) or DEFAULT_PARAMETERS_FILE
+    if os.path.exists(params_path):
+        load_parameters(params_path)
+        logger_main.info(f"⚙️ Parámetros cargados de {params_path}", extra=LOG_LIFECYCLE)
+    elif os.environ.get(PARAMETERS_ENV):
+        raise FileNotFoundError(f"No existe el archivo de parámetros {params_path}")
+    RunOutput().write_json("parameters_used.json", current_parameters())
+
+    RandomStreams()
+    logger_main.info(f"📂 Resultados de la corrida en {config.output_dir} (perfil de logging '{config.profile_name}')",
+                     extra=LOG_LIFECYCLE)
+    return config
+
 # ------------- FIELDACCESSOR Y ENVIRONMENT -------------
 
 class FieldAccessor:
@@ -144,15 +729,13 @@ class EnvironmentEvaluator:
         self.fields = field_accessor
         self.logger = LoggerConfig().get_logger('environment_evaluator')
         
-        # Valores metabólicos ideales (condiciones fisiológicas)
-        self.O2_OPTIMAL = 180  # µM
-        self.GLC_OPTIMAL = 10  # mM
-        self.LAC_OPTIMAL = 2.0 # mM
-        
-        # Tolerancias para considerar condiciones "óptimas"
-        self.TOL_O2 = 40
-        self.TOL_GLC = 2
-        self.TOL_LAC = 1
+        # Valores metabólicos ideales y tolerancias (parámetros externos, leídos al crear el evaluador)
+        self.O2_OPTIMAL = O2_OPTIMAL
+        self.GLC_OPTIMAL = GLC_OPTIMAL
+        self.LAC_OPTIMAL = LAC_OPTIMAL
+        self.TOL_O2 = TOL_O2
+        self.TOL_GLC = TOL_GLC
+        self.TOL_LAC = TOL_LAC
 
     def is_optimal(self, cell):
         """Retorna True si el ambiente es óptimo para crecimiento."""
@@ -194,6 +777,29 @@ class EnvironmentEvaluator:
             self.logger.error(f"⚠️ Error en is_stressed para célula {getattr(cell, 'id', 'None')}: {e}")
             return False
 
+    def optimal_mask(self, o2, glc, lac):
+        """Versión vectorizada de is_optimal sobre arreglos de concentraciones."""
+        return ((np.abs(o2 - self.O2_OPTIMAL) <= self.TOL_O2) &
+                (np.abs(glc - self.GLC_OPTIMAL) <= self.TOL_GLC) &
+                (np.abs(lac - self.LAC_OPTIMAL) <= self.TOL_LAC))
+
+    def stressed_mask(self, o2, glc, lac):
+        """Versión vectorizada de is_stressed sobre arreglos de concentraciones."""
+        return (o2 < o2_THRESHOLD_HIPO) & (glc < glc_THRESHOLD_HIPO)
+
+    def classify(self, o2, glc, lac):
+        """Código de ambiente (bits ENV_*) de cada célula en un arreglo uint8."""
+        codes = np.zeros(len(o2), dtype=np.uint8)
+        codes[self.optimal_mask(o2, glc, lac)] |= ENV_OPTIMAL
+        codes[(o2_THRESHOLD_HIPO <= o2) & (o2 <= o2_THRESHOLD) &
+              (glc_THRESHOLD_HIPO <= glc) & (glc <= glc_THRESHOLD)] |= ENV_MILD_STRESS
+        codes[self.stressed_mask(o2, glc, lac)] |= ENV_SEVERE_STRESS
+        codes[lac > lac_THRESHOLD_TOXIC] |= ENV_TOXIC_LACTATE
+        codes[(o2 >= o2_THRESHOLD_HIPO) & (glc >= glc_THRESHOLD_HIPO)] |= ENV_VIABLE
+        codes[(o2 > o2_THRESHOLD_HIPO) & (glc > glc_THRESHOLD_HIPO)] |= ENV_VIABLE_STRICT
+        codes[(o2 < o2_THRESHOLD) & (glc < glc_THRESHOLD)] |= ENV_HYPOXIC
+        return codes
+
 
 class FieldAccessor:
     def __init__(self, field_obj, default=0.0):
@@ -249,16 +855,1012 @@ class FieldAccessor:
             self.logger.warning(f"⚠️ Error accediendo a campo '{field_name}' en célula {getattr(cell, 'id', 'None')}: {e}")
             return self.default
 
+# ------------- SNAPSHOT DEL MICROAMBIENTE -------------
+
+# Campos químicos que se muestrean una sola vez por MCS
+SNAPSHOT_FIELDS = ('o2', 'glc', 'lac', 'h3o')
+
+# Muestreo de campos: 'com' (vóxel del centro de masa, rápido) o 'volume' (promedio sobre los vóxeles de la célula)
+FIELD_SAMPLING_MODE = 'com'
+FIELD_SAMPLING_ENV = 'SBA_FIELD_SAMPLING'
+LABEL_REFRESH_INTERVAL = 10   # MCS entre reconstrucciones completas de la red de ids (modo 'volume')
+LABEL_VOLUME_TOLERANCE = 4    # voxels de cambio de volumen que obligan a reetiquetar una célula entre reconstrucciones
+
+class MicroenvironmentSnapshot:
+    """
+    Foto única por MCS del microambiente de todas las células.
+
+    Recorre el inventario de células una sola vez, guarda ids, tipos y COM en
+    arreglos y muestrea todos los campos químicos con indexado vectorizado de
+    NumPy. Todos los steppables comparten los mismos arreglos (solo lectura).
+    También clasifica el ambiente de cada célula una sola vez (env_class,
+    bits ENV_*), de modo que los steppables no vuelven a comparar
+    concentraciones.
+
+    En modo 'volume' (SBA_FIELD_SAMPLING=volume) cada concentración es el
+    promedio sobre todos los vóxeles de la célula: se mantiene una red de ids
+    de célula (construida con PixelTracker) y cada campo se reduce con un
+    np.bincount ponderado, una pasada por la red por campo.
+
+    La red de ids se reconstruye completa cada LABEL_REFRESH_INTERVAL MCS.
+    Entre reconstrucciones solo se reetiquetan las células nuevas (mitosis),
+    las que aún no tenían vóxeles y aquellas cuyo volumen cambió al menos
+    LABEL_VOLUME_TOLERANCE vóxeles. Las fluctuaciones de la membrana más
+    pequeñas quedan desfasadas hasta la siguiente reconstrucción: el promedio
+    puede incluir o excluir algunos vóxeles de borde. Como los campos varían
+    suavemente a escala de una célula, el error es pequeño frente al de usar
+    solo el COM. Las células eliminadas se ignoran porque el promedio se
+    indexa por los ids vivos.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(MicroenvironmentSnapshot, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self.logger = LoggerConfig().get_logger('microenvironment')
+        self.field_obj = None
+        self.accessor = None
+        self.field_names = SNAPSHOT_FIELDS
+        self.default = 0.0
+        self.mcs = None
+        self.sampling = os.environ.get(FIELD_SAMPLING_ENV, FIELD_SAMPLING_MODE)
+        if self.sampling not in ('com', 'volume'):
+            raise ValueError(f"Modo de muestreo desconocido: {self.sampling}")
+        self.evaluator = EnvironmentEvaluator(self)
+        self.pixel_source = None
+        self.labels = None
+        self.labels_mcs = None
+        self.label_voxels = {}   # id → (vóxeles planos etiquetados, volumen al etiquetar)
+        self._reset(0)
+
+    def _reset(self, n):
+        self.cells = []
+        self.index = {}
+        self.ids = np.zeros(n, dtype=np.int64)
+        self.types = np.zeros(n, dtype=np.int16)
+        self.coords = np.zeros((n, 3), dtype=np.int64)
+        self.values = {name: np.zeros(n, dtype=np.float64) for name in self.field_names}
+        self.env_class = np.zeros(n, dtype=np.uint8)
+
+    def bind(self, field_obj, pixel_source=None):
+        """
+        Asocia el contenedor de campos de CC3D (solo la primera vez) y, para
+        el modo 'volume', la función que da los vóxeles de una célula
+        (SteppableBasePy.get_cell_pixel_list).
+        """
+        if self.field_obj is None and field_obj is not None:
+            self.field_obj = field_obj
+            self.accessor = FieldAccessor(field_obj, default=self.default)
+        if self.pixel_source is None and pixel_source is not None:
+            self.pixel_source = pixel_source
+        return self
+
+    def ensure(self, cell_list, mcs):
+        """Construye la foto si aún no existe para este MCS y la devuelve."""
+        if self.mcs != mcs:
+            self.update(cell_list, mcs)
+        return self
+
+    def update(self, cell_list, mcs):
+        """Reconstruye la foto completa: una pasada por el inventario y un gather por campo."""
+        cells = [cell for cell in cell_list if cell is not None]
+        if self.sampling == 'volume':
+            if self.labels_mcs is None or mcs - self.labels_mcs >= LABEL_REFRESH_INTERVAL:
+                if self._label_cells(cells, rebuild=True):
+                    self.labels_mcs = mcs
+            else:
+                self._label_cells(self._stale_labels(cells))
+        ids, types, coords, values = self._sample(cells)
+
+        self.cells = cells
+        self.index = {cell_id: row for row, cell_id in enumerate(ids.tolist())}
+        self.ids, self.types, self.coords, self.values = ids, types, coords, values
+        self.env_class = self._classify(values)
+        self.mcs = mcs
+        self._freeze()
+        CellLifecycleRegistry().reconcile(ids)
+
+    def refresh(self, cells):
+        """Vuelve a muestrear células concretas (p. ej. madre e hija tras una mitosis)."""
+        cells = [cell for cell in cells if cell is not None]
+        if not cells:
+            return
+
+        if self.sampling == 'volume' and self.labels is not None:
+            self._label_cells(cells)
+        ids, types, coords, values = self._sample(cells)
+
+        existing = [(row, self.index.get(cell_id)) for row, cell_id in enumerate(ids.tolist())]
+        old_rows = np.array([dst for _, dst in existing if dst is not None], dtype=np.int64)
+        src_rows = np.array([src for src, dst in existing if dst is not None], dtype=np.int64)
+        new_rows = np.array([src for src, dst in existing if dst is None], dtype=np.int64)
+
+        self.ids = self.ids.copy()
+        self.types = self.types.copy()
+        self.coords = self.coords.copy()
+        self.values = {name: arr.copy() for name, arr in self.values.items()}
+        self.env_class = self.env_class.copy()
+        env_class = self._classify(values)
+
+        if old_rows.size:
+            self.types[old_rows] = types[src_rows]
+            self.coords[old_rows] = coords[src_rows]
+            for name in self.field_names:
+                self.values[name][old_rows] = values[name][src_rows]
+            self.env_class[old_rows] = env_class[src_rows]
+
+        if new_rows.size:
+            start = len(self.cells)
+            for offset, src in enumerate(new_rows.tolist()):
+                self.cells.append(cells[src])
+                self.index[int(ids[src])] = start + offset
+            self.ids = np.concatenate([self.ids, ids[new_rows]])
+            self.types = np.concatenate([self.types, types[new_rows]])
+            self.coords = np.concatenate([self.coords, coords[new_rows]])
+            for name in self.field_names:
+                self.values[name] = np.concatenate([self.values[name], values[name][new_rows]])
+            self.env_class = np.concatenate([self.env_class, env_class[new_rows]])
+
+        self._freeze()
+
+    def _sample(self, cells):
+        """Extrae ids, tipos, COM y concentraciones de una lista de células."""
+        n = len(cells)
+        if n == 0:
+            return (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int16),
+                    np.zeros((0, 3), dtype=np.int64),
+                    {name: np.zeros(0, dtype=np.float64) for name in self.field_names})
+
+        raw = np.array([(cell.id, cell.type, cell.xCOM, cell.yCOM, cell.zCOM) for cell in cells], dtype=np.float64)
+        ids = raw[:, 0].astype(np.int64)
+        types = raw[:, 1].astype(np.int16)
+        # int() de Python trunca hacia cero; np.trunc reproduce el mismo voxel
+        coords = np.trunc(raw[:, 2:5]).astype(np.int64)
+
+        valid = np.ones(n, dtype=bool)
+        dim = self.accessor.dim if self.accessor is not None else None
+        if dim is not None:
+            valid = ((coords >= 0).all(axis=1) &
+                     (coords[:, 0] < dim.x) & (coords[:, 1] < dim.y) & (coords[:, 2] < dim.z))
+            if not valid.all():
+                self.logger.warning(f"⚠️ {int((~valid).sum())} células con COM fuera de rango en el snapshot")
+
+        values = {}
+        for name in self.field_names:
+            column = np.full(n, self.default, dtype=np.float64)
+            field_array = self._field_array(name)
+            if field_array is not None:
+                x, y, z = coords[valid].T
+                column[valid] = field_array[x, y, z]
+            elif self.accessor is not None:
+                # Sin vista NumPy del campo: una lectura por célula y campo
+                for row in np.flatnonzero(valid).tolist():
+                    column[row] = self.accessor.get(cells[row], name)
+            values[name] = column
+
+        if self.sampling == 'volume' and self.labels is not None:
+            self._volume_average(ids, values)
+
+        return ids, types, coords, values
+
+    def _classify(self, values):
+        return self.evaluator.classify(values['o2'], values['glc'], values['lac'])
+
+    def _stale_labels(self, cells):
+        """Células sin etiquetar o cuyo volumen se alejó del que tenían al etiquetarlas."""
+        label_voxels = self.label_voxels
+        stale = []
+        for cell in cells:
+            labelled = label_voxels.get(cell.id)
+            if labelled is None or abs(cell.volume - labelled[1]) >= LABEL_VOLUME_TOLERANCE:
+                stale.append(cell)
+        return stale
+
+    def _label_cells(self, cells, rebuild=False):
+        """
+        Escribe el id de cada célula en sus vóxeles de la red de ids (plana,
+        orden x, y, z como los campos), borrando antes los vóxeles que tenía.
+        `rebuild` limpia primero la red.
+        """
+        dim = self.accessor.dim if self.accessor is not None else None
+        if dim is None or self.pixel_source is None:
+            self.logger.warning("⚠️ Muestreo por volumen sin red o sin PixelTracker: se usa el COM")
+            self.sampling = 'com'
+            return False
+
+        if self.labels is None or rebuild:
+            self.labels = np.zeros(dim.x * dim.y * dim.z, dtype=np.int32)
+            self.label_voxels = {}
+        for cell in cells:
+            pixels = self.pixel_source(cell)
+            if pixels is None:
+                self.logger.warning("⚠️ PixelTracker no disponible: se usa el COM")
+                self.sampling = 'com'
+                self.labels = None
+                self.label_voxels = {}
+                return False
+            flat = np.fromiter(((data.pixel.x * dim.y + data.pixel.y) * dim.z + data.pixel.z for data in pixels),
+                               dtype=np.intp)
+            previous = self.label_voxels.get(cell.id)
+            if previous is not None:
+                old = previous[0]
+                self.labels[old[self.labels[old] == cell.id]] = 0
+            self.labels[flat] = cell.id
+            self.label_voxels[cell.id] = (flat, cell.volume)
+        return True
+
+    def _volume_average(self, ids, values):
+        """Sustituye el valor del COM por el promedio sobre los vóxeles de cada célula."""
+        if ids.size == 0:
+            return
+        size = max(int(ids.max()), int(self.labels.max())) + 1
+        counts = np.bincount(self.labels, minlength=size)[ids]
+        labelled = counts > 0
+        for name in self.field_names:
+            field_array = self._field_array(name)
+            if field_array is None:
+                continue
+            sums = np.bincount(self.labels, weights=field_array.ravel(), minlength=size)[ids]
+            values[name][labelled] = sums[labelled] / counts[labelled]
+
+    def _field_array(self, name):
+        """Devuelve el campo como ndarray (x, y, z) si CC3D expone una vista NumPy."""
+        if self.accessor is None or self.accessor.dim is None:
+            return None
+
+        field = getattr(self.field_obj, name, None)
+        if field is None:
+            return None
+
+        dim = self.accessor.dim
+        try:
+            array = np.asarray(field)
+        except Exception:
+            return None
+
+        if array.shape != (dim.x, dim.y, dim.z) or array.dtype == object:
+            return None
+        return array
+
+    def set_types(self, rows, types):
+        """Registra cambios de tipo escritos en CC3D después de construir la foto."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if rows.size == 0:
+            return
+        self.types = self.types.copy()
+        self.types[rows] = types
+        self.types.flags.writeable = False
+
+    def _freeze(self):
+        self.ids.flags.writeable = False
+        self.types.flags.writeable = False
+        self.coords.flags.writeable = False
+        self.env_class.flags.writeable = False
+        for column in self.values.values():
+            column.flags.writeable = False
+
+    def row(self, cell):
+        """Fila de la célula en los arreglos o None si no está en la foto."""
+        if cell is None:
+            return None
+        return self.index.get(cell.id)
+
+    def get(self, cell, field_name):
+        """Misma interfaz que FieldAccessor.get, leyendo de la foto."""
+        row = self.row(cell)
+        field_name = field_name.lower()
+        if row is not None and field_name in self.values:
+            return self.values[field_name][row]
+        if self.accessor is not None:
+            return self.accessor.get(cell, field_name)
+        return self.default
+
+class MicroenvironmentSteppable(SteppableBasePy):
+    """Etapa única por MCS que construye el snapshot compartido del microambiente."""
+    def __init__(self, frequency=1):
+        super().__init__(frequency)
+        self.logger = LoggerConfig().get_logger('microenvironment')
+        self.snapshot = MicroenvironmentSnapshot()
+
+    def start(self):
+        self.snapshot.bind(self.field, pixel_source=self.get_cell_pixel_list)
+        self.logger.info(f"✅ Snapshot del microambiente inicializado (muestreo '{self.snapshot.sampling}')", extra=LOG_LIFECYCLE)
+
+    def step(self, mcs):
+        LoggerConfig().begin_mcs(mcs)
+        self.snapshot.ensure(self.cell_list, mcs)
+
+# ------------- NÚMEROS ALEATORIOS -------------
+
+class RandomStreams:
+    """
+    Servicio de números aleatorios de la corrida.
+
+    Una sola semilla (SBA_SEED o generada con SeedSequence) alimenta un
+    Generator de NumPy independiente por steppable. Cada flujo se deriva del
+    nombre del consumidor, no del orden de creación, así que agregar o quitar
+    steppables no altera los números que reciben los demás. La semilla y los
+    flujos usados se guardan en results/rng_seed.json para reproducir la corrida.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(RandomStreams, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self.logger = LoggerConfig().get_logger('main')
+        seed = os.environ.get(SEED_ENV)
+        self.seed(int(seed) if seed else None)
+
+    def seed(self, seed=None):
+        """Reinicia todos los flujos a partir de `seed` (None = entropía del sistema)."""
+        self.root = np.random.SeedSequence(seed)
+        self.run_seed = self.root.entropy
+        self.streams = {}
+        self.logger.info(f"🎲 Semilla de la corrida: {self.run_seed}", extra=LOG_LIFECYCLE)
+        self.save()
+
+    def stream(self, name):
+        """Generator propio de `name`; la misma semilla da siempre el mismo flujo."""
+        if name not in self.streams:
+            key = zlib.crc32(name.encode('utf-8'))
+            sequence = np.random.SeedSequence(self.run_seed, spawn_key=(key,))
+            self.streams[name] = np.random.Generator(np.random.PCG64(sequence))
+            self.save()
+        return self.streams[name]
+
+    def get_state(self):
+        return {name: rng.bit_generator.state for name, rng in self.streams.items()}
+
+    def set_state(self, states):
+        for name, state in states.items():
+            self.stream(name).bit_generator.state = state
+
+    def save(self):
+        try:
+            RunOutput().write_json("rng_seed.json", {"seed": str(self.run_seed), "streams": sorted(self.streams)})
+        except OSError as e:
+            self.logger.warning(f"⚠️ No se pudo guardar la semilla en rng_seed.json: {e}")
+
+# ------------- CICLO DE VIDA Y ESTADO POR CÉLULA -------------
+
+class CellLifecycleRegistry:
+    """
+    Registro incremental de nacimientos, muertes y eliminaciones de células.
+
+    Se alimenta de eventos (mitosis, necrosis) y de la reconciliación barata
+    que hace el snapshot: solo si el número de células o la suma de ids
+    cambian de forma inesperada se calcula la diferencia de conjuntos para
+    detectar células eliminadas por CC3D. Los suscriptores (p. ej.
+    CellStateStore) mantienen su estado sin volver a recorrer el inventario.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CellLifecycleRegistry, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self.logger = LoggerConfig().get_logger('lifecycle')
+        self.live = set()
+        self.id_sum = 0
+        self.listeners = []
+        self.births = 0
+        self.deaths = 0
+        self.removals = 0
+
+    def subscribe(self, listener):
+        """`listener` puede definir on_birth(parent_id, child_id), on_death(cell_id) y on_removed(cell_id)."""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def _notify(self, event, *args):
+        for listener in self.listeners:
+            handler = getattr(listener, event, None)
+            if handler is not None:
+                handler(*args)
+
+    def _add(self, cell_id):
+        if cell_id not in self.live:
+            self.live.add(cell_id)
+            self.id_sum += cell_id
+
+    def on_birth(self, parent_id, child_id):
+        self._add(parent_id)
+        self._add(child_id)
+        self.births += 1
+        self._notify('on_birth', parent_id, child_id)
+
+    def on_death(self, cell_id):
+        """La célula pasa a necrótica: sigue en el inventario pero deja de tener estado activo."""
+        self.deaths += 1
+        self._notify('on_death', cell_id)
+
+    def on_removed(self, cell_id):
+        if cell_id in self.live:
+            self.live.discard(cell_id)
+            self.id_sum -= cell_id
+            self.removals += 1
+            self._notify('on_removed', cell_id)
+
+    def reconcile(self, ids):
+        """Compara el inventario actual con el registro (O(1) si no hubo eventos fuera de registro)."""
+        if len(ids) == len(self.live) and int(ids.sum()) == self.id_sum:
+            return
+        current = set(ids.tolist())
+        for cell_id in self.live - current:
+            self.on_removed(cell_id)
+        for cell_id in current - self.live:
+            self._add(cell_id)
+
+
+# Columnas de contadores por célula
+COUNTER_CRITICAL = 'critical_condition'
+COUNTER_PROL_TO_RESE = 'low_o2_low_glu_prol_to_rese'
+COUNTER_RESE_TO_INVA = 'low_o2_low_glu_rese_to_inva'
+COUNTER_RESE_TO_PROL = 'high_o2_high_glu_rese_to_prol'
+COUNTER_INVA_TO_RESE = 'high_o2_high_glu_inva_to_rese'
+
+# Columnas del índice de candidatos a mitosis
+COL_TARGET_VOLUME = 'target_volume'
+COL_GROWTH_RATE = 'growth_rate'
+COL_OBSERVED_VOLUME = 'observed_volume'
+COL_OBSERVED_MCS = 'observed_mcs'
+
+class CellStateStore:
+    """
+    Almacén struct-of-arrays para el estado por célula.
+
+    Cada contador es una columna NumPy contigua; las células se direccionan a
+    través de un mapa id→slot. Los slots de células muertas o eliminadas se
+    liberan y se reutilizan, de modo que la memoria queda acotada por el número
+    máximo de células vivas simultáneas.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CellStateStore, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self, capacity=1024):
+        self.logger = LoggerConfig().get_logger('cell_state')
+        self.capacity = capacity
+        self.columns = {}
+        self.defaults = {}
+        self.slot_of = {}
+        self.free_slots = []
+        self.next_slot = 0
+        CellLifecycleRegistry().subscribe(self)
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def __contains__(self, cell_id):
+        return cell_id in self.slot_of
+
+    def register_column(self, name, dtype=np.int32, default=0):
+        """Declara una columna (idempotente)."""
+        if name not in self.columns:
+            self.columns[name] = np.full(self.capacity, default, dtype=dtype)
+            self.defaults[name] = default
+        return self.columns[name]
+
+    def _grow(self):
+        new_capacity = self.capacity * 2
+        for name, column in self.columns.items():
+            grown = np.full(new_capacity, self.defaults[name], dtype=column.dtype)
+            grown[:self.capacity] = column
+            self.columns[name] = grown
+        self.logger.debug(f"📈 CellStateStore ampliado de {self.capacity} a {new_capacity} slots")
+        self.capacity = new_capacity
+
+    def _allocate(self, cell_id):
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            if self.next_slot >= self.capacity:
+                self._grow()
+            slot = self.next_slot
+            self.next_slot += 1
+
+        for name, column in self.columns.items():
+            column[slot] = self.defaults[name]
+        self.slot_of[cell_id] = slot
+        return slot
+
+    def slot(self, cell_id):
+        """Slot de la célula, asignándolo si aún no existe."""
+        slot = self.slot_of.get(cell_id)
+        if slot is None:
+            slot = self._allocate(cell_id)
+        return slot
+
+    def slots(self, cell_ids):
+        """Slots de un arreglo de ids (asigna los que falten) para operar en bloque."""
+        slot_of = self.slot_of
+        result = np.empty(len(cell_ids), dtype=np.int64)
+        for k, cell_id in enumerate(np.asarray(cell_ids).tolist()):
+            slot = slot_of.get(cell_id)
+            result[k] = slot if slot is not None else self._allocate(cell_id)
+        return result
+
+    def release(self, cell_id):
+        """Libera el slot de una célula muerta o eliminada."""
+        slot = self.slot_of.pop(cell_id, None)
+        if slot is not None:
+            self.free_slots.append(slot)
+
+    def release_many(self, cell_ids):
+        for cell_id in cell_ids:
+            self.release(cell_id)
+
+    def on_birth(self, parent_id, child_id):
+        """La hija recibe un slot nuevo con contadores en cero."""
+        self.slot(parent_id)
+        self.release(child_id)
+        return self._allocate(child_id)
+
+    def on_death(self, cell_id):
+        self.release(cell_id)
+
+    def on_removed(self, cell_id):
+        self.release(cell_id)
+
+    def get(self, cell_id, name):
+        slot = self.slot_of.get(cell_id)
+        if slot is None:
+            return self.defaults[name]
+        return self.columns[name][slot]
+
+    def set(self, cell_id, name, value):
+        self.columns[name][self.slot(cell_id)] = value
+
+# ------------- CANDIDATOS A MITOSIS -------------
+
+class MitosisCandidateIndex:
+    """
+    Índice predictivo de candidatas a mitosis.
+
+    Para cada célula guarda el volumen objetivo y su tasa de crecimiento
+    (escritos por GrowthSteppable y MitosisSteppable) y el último volumen real
+    leído. Estima el volumen actual como max(volumen objetivo, último volumen +
+    tasa × MCS transcurridos) y solo se lee `cell.volume` de las células cuya
+    estimación queda a menos de `margin` voxels del umbral, de las que no
+    tienen estimación o de las que llevan `max_staleness` MCS sin lectura. Cada
+    lectura corrige la estimación cuando el volumen va retrasado respecto al
+    objetivo (restricción de volumen blanda).
+
+    Además se lee toda célula que pudo alcanzar el umbral desde su última
+    lectura: último volumen + `max_rise` × MCS transcurridos + `margin`.
+    `max_rise` es la mayor subida de volumen por MCS observada entre lecturas
+    (al menos `max_growth`, el crecimiento máximo del volumen objetivo), de
+    modo que las fluctuaciones de Potts también quedan cubiertas. Ninguna
+    célula cruza el umbral sin ser leída y las divisiones ocurren en el mismo
+    MCS que con el recorrido completo (scripts/utils/verificar_equivalencias.py).
+    """
+    def __init__(self, state, threshold=None, margin=None, max_staleness=None, max_growth=None):
+        # Los valores por defecto se leen al crear el índice (después de configure_run)
+        self.state = state
+        self.threshold = MITOSIS_VOLUME_THRESHOLD if threshold is None else threshold
+        self.margin = MITOSIS_CHECK_MARGIN if margin is None else margin
+        self.max_staleness = MITOSIS_MAX_STALENESS if max_staleness is None else max_staleness
+        self.max_growth = GROWTH_MAX_PER_MCS if max_growth is None else max_growth
+        self.max_rise = self.max_growth
+        self.checked = 0
+        self.skipped = 0
+        state.register_column(COL_TARGET_VOLUME, np.float64, np.nan)
+        state.register_column(COL_GROWTH_RATE, np.float64, 0.0)
+        state.register_column(COL_OBSERVED_VOLUME, np.float64, np.nan)
+        state.register_column(COL_OBSERVED_MCS, np.int64, -1)
+
+    def select(self, slots, mcs):
+        """Máscara de las células cuyo volumen hay que leer en este MCS."""
+        columns = self.state.columns
+        target = columns[COL_TARGET_VOLUME][slots]
+        rate = columns[COL_GROWTH_RATE][slots]
+        observed = columns[COL_OBSERVED_VOLUME][slots]
+        observed_mcs = columns[COL_OBSERVED_MCS][slots]
+
+        elapsed = mcs - observed_mcs
+        estimate = np.fmax(target, observed + rate * elapsed)
+        near = ~(estimate + self.margin < self.threshold)  # incluye estimaciones NaN
+        reachable = observed + self.max_rise * elapsed + self.margin >= self.threshold
+        stale = (observed_mcs < 0) | (elapsed >= self.max_staleness)
+        selected = near | reachable | stale
+
+        checked = int(selected.sum())
+        self.checked += checked
+        self.skipped += len(slots) - checked
+        return selected
+
+    def observe(self, slots, volumes, mcs):
+        """Registra volúmenes reales leídos (corrige la estimación y la cota de subida por MCS)."""
+        previous = self.state.columns[COL_OBSERVED_VOLUME][slots]
+        elapsed = mcs - self.state.columns[COL_OBSERVED_MCS][slots]
+        seen = (self.state.columns[COL_OBSERVED_MCS][slots] >= 0) & (elapsed > 0)
+        if seen.any():
+            rise = (volumes[seen] - previous[seen]) / elapsed[seen]
+            self.max_rise = max(self.max_rise, float(rise.max()))
+        self.state.columns[COL_OBSERVED_VOLUME][slots] = volumes
+        self.state.columns[COL_OBSERVED_MCS][slots] = mcs
+
+# ------------- MOTOR DE TRANSICIONES FENOTÍPICAS -------------
+
+PHENOTYPE_COUNTERS = (COUNTER_PROL_TO_RESE, COUNTER_RESE_TO_INVA, COUNTER_RESE_TO_PROL, COUNTER_INVA_TO_RESE)
+
+# Tipos alternativos de cada tipo al mutar (fila = tipo actual); INVA y otros → PROL/RESE
+MUTATION_TARGETS = np.array([
+    (CELL_TYPE_PROL, CELL_TYPE_RESE),
+    (CELL_TYPE_RESE, CELL_TYPE_INVA),   # PROL
+    (CELL_TYPE_PROL, CELL_TYPE_INVA),   # RESE
+    (CELL_TYPE_PROL, CELL_TYPE_RESE),   # INVA
+    (CELL_TYPE_PROL, CELL_TYPE_RESE),   # NECR
+], dtype=np.int16)
+
+class PhenotypeTransitionEngine:
+    """
+    Versión por lotes de check_and_mutate, update_condition_counters y
+    apply_phenotype_changes. Opera sobre arreglos (tipo, código de ambiente
+    ENV_*, contadores) de todas las células vivas con máscaras de NumPy y
+    reproduce el orden de evaluación de las reglas por célula.
+    """
+    def __init__(self, evaluator):
+        self.env = evaluator
+
+    def transitions(self):
+        """(nombre, contador, umbral, tipo destino) en orden de prioridad."""
+        return (
+            ("PROL→RESE", COUNTER_PROL_TO_RESE, MCS_PROL_TO_RESE, CELL_TYPE_RESE),
+            ("RESE→INVA", COUNTER_RESE_TO_INVA, MCS_RESE_TO_INVA, CELL_TYPE_INVA),
+            ("RESE→PROL", COUNTER_RESE_TO_PROL, MCS_RESE_TO_PROL, CELL_TYPE_PROL),
+            ("INVA→RESE", COUNTER_INVA_TO_RESE, MCS_INVA_TO_RESE, CELL_TYPE_RESE),
+        )
+
+    def mutation_mask(self, types, env_class):
+        """Células que mutan por hipoxia (regla de check_and_mutate)."""
+        viable = np.isin(types, (CELL_TYPE_PROL, CELL_TYPE_RESE, CELL_TYPE_INVA))
+        return viable & ((env_class & ENV_HYPOXIC) != 0)
+
+    def update_counters(self, types, env_class, counters, scale=1):
+        """
+        Incrementos y decaimientos de los cuatro contadores (modifica `counters`).
+        `scale` es el número de MCS que representa esta evaluación.
+        """
+        optimal = (env_class & ENV_OPTIMAL) != 0
+        stressed = (env_class & ENV_SEVERE_STRESS) != 0
+        is_prol = types == CELL_TYPE_PROL
+        is_rese = types == CELL_TYPE_RESE
+        is_inva = types == CELL_TYPE_INVA
+
+        def advance(name, grow, decay):
+            counter = counters[name]
+            counter[decay] = np.maximum(0, counter[decay] - 2 * scale)
+            counter[grow] += scale
+
+        # PROL → RESE: estrés leve; cualquier otra situación decae
+        mild = (env_class & ENV_MILD_STRESS) != 0
+        grow = is_prol & mild
+        advance(COUNTER_PROL_TO_RESE, grow, ~grow)
+
+        # RESE → INVA: estrés severo; cualquier otra situación decae
+        grow = is_rese & stressed
+        advance(COUNTER_RESE_TO_INVA, grow, ~grow)
+
+        # RESE → PROL: solo se actualiza en células RESE
+        good = optimal | ((env_class & ENV_VIABLE_STRICT) != 0)
+        advance(COUNTER_RESE_TO_PROL, is_rese & good, is_rese & ~good)
+
+        # INVA → RESE: solo se actualiza en células INVA
+        good = optimal | ((env_class & ENV_VIABLE) != 0)
+        advance(COUNTER_INVA_TO_RESE, is_inva & good, is_inva & ~good)
+
+    def apply_transitions(self, types, counters):
+        """Aplica la primera transición cuyo contador alcanza su umbral."""
+        new_types = types.copy()
+        pending = np.ones(len(types), dtype=bool)
+        fired = {}
+        for name, counter_name, threshold, target in self.transitions():
+            mask = pending & (counters[counter_name] >= threshold)
+            new_types[mask] = target
+            pending &= ~mask
+            fired[name] = mask
+        return new_types, fired
+
+    def run(self, types, env_class, counters, draw_new_types, scale=1):
+        """
+        Evalúa mutación, contadores y transiciones de un lote de células.
+        `draw_new_types(types)` devuelve el nuevo tipo de cada célula que muta.
+        Retorna (tipos finales, máscara de mutación, máscaras por transición).
+        """
+        types = np.asarray(types).copy()
+        mutated = self.mutation_mask(types, env_class)
+        if mutated.any():
+            types[mutated] = draw_new_types(types[mutated])
+
+        self.update_counters(types, env_class, counters, scale)
+        new_types, fired = self.apply_transitions(types, counters)
+        return new_types, mutated, fired
+
+# ------------- TELEMETRÍA DE CRECIMIENTO -------------
+
+class GrowthTelemetrySink:
+    """
+    Escritor en streaming del log de crecimiento con memoria acotada.
+
+    Las filas se acumulan en arreglos tipados preasignados y se vuelcan a disco
+    por bloques cada `flush_interval` MCS (o cuando el buffer se llena), de
+    modo que un fallo solo pierde el último bloque. Mientras la corrida sigue
+    el archivo se llama <nombre>.partial; close() lo renombra. En modo
+    'per_type' solo se guarda un agregado por tipo celular y MCS.
+
+    Con `resume_mcs` (corrida reanudada desde un checkpoint) el primer volcado
+    continúa el log previo: conserva las filas con MCS <= resume_mcs, descarta
+    el resto y sigue la numeración de bloques npz.
+    """
+    CELL_COLUMNS = (
+        ('MCS', np.int32), ('CellID', np.int64), ('Type', np.int16),
+        ('DeltaVolume', np.float64), ('NewTargetVolume', np.float64),
+        ('LocalGLC', np.float32), ('LocalO2', np.float32), ('LocalLAC', np.float32),
+    )
+    TYPE_COLUMNS = (
+        ('MCS', np.int32), ('Type', np.int16), ('Cells', np.int32),
+        ('TotalDeltaVolume', np.float64), ('MeanDeltaVolume', np.float64), ('MeanTargetVolume', np.float64),
+        ('MeanGLC', np.float32), ('MeanO2', np.float32), ('MeanLAC', np.float32),
+    )
+    # Decimales al escribir CSV (igual que el log original)
+    DECIMALS = {'DeltaVolume': 4, 'MeanDeltaVolume': 4, 'TotalDeltaVolume': 4}
+    FORMATS = ('csv', 'csv.gz', 'npz', 'parquet')
+    MODES = ('per_cell', 'per_type')
+
+    def __init__(self, output_dir, basename='growth_log', fmt=GROWTH_LOG_FORMAT,
+                 mode=GROWTH_LOG_MODE, flush_interval=GROWTH_LOG_FLUSH_INTERVAL, capacity=65536,
+                 resume_mcs=None):
+        self.logger = LoggerConfig().get_logger('growth')
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Formato de log de crecimiento no soportado: {fmt}")
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de log de crecimiento no soportado: {mode}")
+
+        if fmt == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                self.logger.warning("⚠️ pyarrow no disponible: el log de crecimiento se guardará como csv.gz")
+                fmt = 'csv.gz'
+
+        self.output_dir = output_dir
+        self.basename = basename
+        self.fmt = fmt
+        self.mode = mode
+        self.flush_interval = max(1, int(flush_interval))
+        self.capacity = int(capacity)
+        self.schema = self.CELL_COLUMNS if mode == 'per_cell' else self.TYPE_COLUMNS
+        self.buffers = {name: np.zeros(self.capacity, dtype=dtype) for name, dtype in self.schema}
+        self.size = 0
+        self.rows_written = 0
+        self.chunks_written = 0
+        self.resume_mcs = resume_mcs
+        self.last_flush_mcs = None
+        self._handle = None
+        self._writer = None
+        self._parquet = None
+
+        # Acumuladores por tipo para el modo agregado
+        self._agg_mcs = None
+        self._agg = np.zeros((CELL_TYPE_NECR + 1, 6), dtype=np.float64)
+
+    @property
+    def path(self):
+        if self.fmt == 'npz':
+            return os.path.join(self.output_dir, f"{self.basename}_chunks")
+        return os.path.join(self.output_dir, f"{self.basename}.{self.fmt}")
+
+    @property
+    def partial_path(self):
+        """Archivo en escritura; close() lo renombra a `path`."""
+        return self.path + '.partial'
+
+    def append(self, mcs, cell_id, cell_type, delta_volume, target_volume, glc, o2, lac):
+        """Registra el crecimiento de una célula en un MCS."""
+        if self.mode == 'per_type':
+            if self._agg_mcs is not None and mcs != self._agg_mcs:
+                self._emit_aggregate()
+            self._agg_mcs = mcs
+            self._agg[cell_type] += (1.0, delta_volume, target_volume, glc, o2, lac)
+            return
+
+        if self.size >= self.capacity:
+            self.flush()
+        row = self.size
+        for name, value in zip(self.buffers, (mcs, cell_id, cell_type, delta_volume, target_volume, glc, o2, lac)):
+            self.buffers[name][row] = value
+        self.size += 1
+
+    def _emit_aggregate(self):
+        types = np.flatnonzero(self._agg[:, 0])
+        if self.size + len(types) > self.capacity:
+            self.flush()
+        for cell_type in types.tolist():
+            count, delta, target, glc, o2, lac = self._agg[cell_type]
+            row = self.size
+            values = (self._agg_mcs, cell_type, count, delta, delta / count, target / count,
+                      glc / count, o2 / count, lac / count)
+            for name, value in zip(self.buffers, values):
+                self.buffers[name][row] = value
+            self.size += 1
+        self._agg[:] = 0.0
+        self._agg_mcs = None
+
+    def end_mcs(self, mcs):
+        """Cierra el MCS y vuelca a disco si se cumplió el intervalo."""
+        if self.mode == 'per_type' and self._agg_mcs is not None:
+            self._emit_aggregate()
+        if self.last_flush_mcs is None:
+            self.last_flush_mcs = mcs
+        if mcs - self.last_flush_mcs >= self.flush_interval:
+            self.flush()
+            self.last_flush_mcs = mcs
+
+    def flush(self):
+        """Escribe el bloque actual y vacía el buffer."""
+        if self.size == 0:
+            return
+        if self.resume_mcs is not None:
+            self._continue_previous(self.resume_mcs)
+            self.resume_mcs = None
+        chunk = {name: column[:self.size] for name, column in self.buffers.items()}
+        if self.fmt in ('csv', 'csv.gz'):
+            self._write_csv(chunk)
+        elif self.fmt == 'npz':
+            self._write_npz(chunk)
+        else:
+            self._write_parquet(chunk)
+        self.rows_written += self.size
+        self.chunks_written += 1
+        self.size = 0
+
+    def _continue_previous(self, last_mcs):
+        """Retoma el log de la corrida previa hasta `last_mcs` (MCS del checkpoint)."""
+        if self.fmt == 'npz':
+            self._continue_npz(last_mcs)
+            return
+        source = resume_source(self.path, self.partial_path)
+        if source is None:
+            return
+        if self.fmt == 'csv':
+            self.rows_written = truncate_csv(source, last_mcs)
+            self._handle = open(self.partial_path, 'a', newline='')
+            self._writer = csv.writer(self._handle)
+            return
+
+        # gzip y parquet no se pueden cortar en el lugar: se copian las filas conservadas
+        previous = self.partial_path + '.resume'
+        os.replace(source, previous)
+        if self.fmt == 'csv.gz':
+            self._handle = gzip.open(self.partial_path, 'wt', newline='')
+            self._writer = csv.writer(self._handle)
+            with gzip.open(previous, 'rt', newline='') as f:
+                self.rows_written = copy_csv_rows(f, self._handle, last_mcs)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            try:
+                reader = pq.ParquetFile(previous)
+            except (OSError, pa.ArrowException):
+                # Un .partial de una corrida interrumpida no tiene footer y no se puede leer
+                os.replace(previous, self.path + '.incompleto')
+                self.logger.warning(f"⚠️ El log parquet previo no se cerró; se conserva en {self.path}.incompleto "
+                                    f"y el log se reinicia en MCS {last_mcs + 1}")
+                return
+            self._parquet = pq.ParquetWriter(self.partial_path, reader.schema_arrow, compression='zstd')
+            for batch in reader.iter_batches():
+                keep = batch.column('MCS').to_numpy() <= last_mcs
+                if keep.any():
+                    self._parquet.write_table(pa.Table.from_batches([batch.filter(pa.array(keep))]))
+                    self.rows_written += int(keep.sum())
+                if not keep.all():
+                    break
+        os.remove(previous)
+
+    def _continue_npz(self, last_mcs):
+        """Conserva los bloques npz hasta `last_mcs`, recorta el que lo cruza y borra los posteriores."""
+        if not os.path.isdir(self.path):
+            return
+        prefix = f"{self.basename}_"
+        names = sorted(name for name in os.listdir(self.path) if name.startswith(prefix) and name.endswith('.npz'))
+        past_checkpoint = False
+        for name in names:
+            chunk_path = os.path.join(self.path, name)
+            if past_checkpoint:
+                os.remove(chunk_path)
+                continue
+            with np.load(chunk_path, allow_pickle=False) as data:
+                chunk = {key: data[key] for key in data.files}
+            keep = chunk['MCS'] <= last_mcs
+            if keep.all():
+                self.chunks_written += 1
+                self.rows_written += len(keep)
+                continue
+            past_checkpoint = True
+            os.remove(chunk_path)
+            if keep.any():
+                chunk = {key: column[keep] for key, column in chunk.items()}
+                self._write_npz(chunk)
+                self.chunks_written += 1
+                self.rows_written += int(keep.sum())
+
+    def _write_csv(self, chunk):
+        if self._handle is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            if self.fmt == 'csv.gz':
+                self._handle = gzip.open(self.partial_path, 'wt', newline='')
+            else:
+                self._handle = open(self.partial_path, 'w', newline='')
+            self._writer = csv.writer(self._handle)
+            self._writer.writerow([name for name, _ in self.schema])
+
+        columns = []
+        for name, dtype in self.schema:
+            column = chunk[name]
+            if np.issubdtype(dtype, np.floating):
+                column = np.round(column.astype(np.float64), self.DECIMALS.get(name, 2))
+            columns.append(column.tolist())
+        self._writer.writerows(zip(*columns))
+        self._handle.flush()
+
+    def _write_npz(self, chunk):
+        os.makedirs(self.path, exist_ok=True)
+        chunk_path = os.path.join(self.path, f"{self.basename}_{self.chunks_written:05d}.npz")
+        atomic_write(chunk_path, lambda f: np.savez_compressed(f, **chunk), mode='wb')
+
+    def _write_parquet(self, chunk):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({name: chunk[name] for name, _ in self.schema})
+        if self._parquet is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._parquet = pq.ParquetWriter(self.partial_path, table.schema, compression='zstd')
+        self._parquet.write_table(table)
+
+    def close(self):
+        """Vuelca lo pendiente y cierra los archivos abiertos."""
+        if self.mode == 'per_type' and self._agg_mcs is not None:
+            self._emit_aggregate()
+        self.flush()
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+            os.replace(self.partial_path, self.path)
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+            os.replace(self.partial_path, self.path)
+
 class ConstraintInitializerSteppable(SteppableBasePy):
     def __init__(self, frequency=1):
         super().__init__(frequency)
         self.logger = LoggerConfig().get_logger('constraint_initializer')
+        self.state = CellStateStore()
+        self.state.register_column(COL_TARGET_VOLUME, np.float64, np.nan)
         self.initialized = False
 
     def start(self):
         """Inicializa volumen y lambda de volumen para todas las células."""
         if self.initialized:
-            self.logger.info("🛑 ConstraintInitializerSteppable ya inicializado previamente.")
+            self.logger.info("🛑 ConstraintInitializerSteppable ya inicializado previamente.", extra=LOG_LIFECYCLE)
             return
 
         try:
@@ -270,32 +1872,42 @@ class ConstraintInitializerSteppable(SteppableBasePy):
                     cell.targetVolume = INITIAL_TARGET_VOLUME
                     cell.lambdaVolume = INITIAL_LAMBDA_VOLUME
                 else:
-                    cell.targetVolume = 20  # Necróticas
-                    cell.lambdaVolume = 50
+                    cell.targetVolume = NECROTIC_TARGET_VOLUME
+                    cell.lambdaVolume = NECROTIC_LAMBDA_VOLUME
+
+                self.state.set(cell.id, COL_TARGET_VOLUME, cell.targetVolume)
 
                 self.logger.debug(f"📦 Célula {cell.id} (Tipo {cell.type}): TargetVolume={cell.targetVolume}, LambdaVolume={cell.lambdaVolume}")
 
             self.initialized = True
-            self.logger.info("✅ ConstraintInitializerSteppable completado.")
-            gc.collect()
+            self.logger.info("✅ ConstraintInitializerSteppable completado.", extra=LOG_LIFECYCLE)
 
         except Exception as e:
             self.logger.error(f"❌ Error en ConstraintInitializerSteppable.start: {e}")
             self.initialized = False
 
 class GrowthSteppable(SteppableBasePy):
-    def __init__(self, frequency=1):
+    def __init__(self, frequency=1, log_format=GROWTH_LOG_FORMAT, log_mode=GROWTH_LOG_MODE,
+                 flush_interval=GROWTH_LOG_FLUSH_INTERVAL):
         super().__init__(frequency)
         self.logger = LoggerConfig().get_logger('growth')
         self.field_accessor = None
+        self.snapshot = MicroenvironmentSnapshot()
+        self.state = CellStateStore()
+        self.state.register_column(COL_TARGET_VOLUME, np.float64, np.nan)
+        self.state.register_column(COL_GROWTH_RATE, np.float64, 0.0)
         self.env = None
-        self.growth_log = []  # Para guardar todos los registros
+        self.mcs = 0
+        # Log de crecimiento en streaming (memoria acotada)
+        self.growth_sink = GrowthTelemetrySink(RunOutput().directory, fmt=log_format,
+                                               mode=log_mode, flush_interval=flush_interval,
+                                               resume_mcs=RunOutput().resume_mcs)
         self.initialized = False
 
     def start(self):
         """Inicializa el acceso a campos químicos y evaluador de ambiente."""
         if self.initialized:
-            self.logger.info("🛑 GrowthSteppable ya inicializado.")
+            self.logger.info("🛑 GrowthSteppable ya inicializado.", extra=LOG_LIFECYCLE)
             return
 
         try:
@@ -304,9 +1916,10 @@ class GrowthSteppable(SteppableBasePy):
                 return
 
             self.field_accessor = FieldAccessor(self.field)
-            self.env = EnvironmentEvaluator(self.field_accessor)
+            self.snapshot.bind(self.field)
+            self.env = EnvironmentEvaluator(self.snapshot)
             self.initialized = True
-            self.logger.info("✅ GrowthSteppable inicializado correctamente.")
+            self.logger.info("✅ GrowthSteppable inicializado correctamente.", extra=LOG_LIFECYCLE)
         
         except Exception as e:
             self.logger.error(f"❌ Error en GrowthSteppable.start: {e}")
@@ -329,37 +1942,44 @@ class GrowthSteppable(SteppableBasePy):
         if not self.initialized or not self.field_accessor or not self.env:
             return
 
+        self.mcs = mcs
         try:
-            for cell in self.cell_list:
-                if cell is None or cell.type == CELL_TYPE_NECR:
+            snap = self.snapshot.ensure(self.cell_list, mcs)
+            o2, glc, h3o, lac = (snap.values[name] for name in ('o2', 'glc', 'h3o', 'lac'))
+            optimal = (snap.env_class & ENV_OPTIMAL) != 0
+
+            # Solo las células en ambiente óptimo pueden crecer
+            for row in np.flatnonzero(optimal).tolist():
+                cell = snap.cells[row]
+                if cell.type == CELL_TYPE_NECR:
                     continue
 
                 try:
-                    o2_conc, glc_conc, h3o_conc, lac_conc = self.get_metabolic_values(cell)
-                    self.calculate_growth(cell, o2_conc, glc_conc, h3o_conc, lac_conc)
+                    self.calculate_growth(cell, float(o2[row]), float(glc[row]), float(h3o[row]), float(lac[row]), optimal=True)
                 
                 except Exception as e:
                     self.logger.error(f"⚠️ Error procesando célula {getattr(cell, 'id', 'None')}: {e}")
                     continue
 
-            if mcs % 100 == 0:
-                gc.collect()
+            self.growth_sink.end_mcs(mcs)
 
         except Exception as e:
             self.logger.error(f"❌ Error en GrowthSteppable.step: {e}")
 
-    def calculate_growth(self, cell, o2, glc, h3o, lac):
+    def calculate_growth(self, cell, o2, glc, h3o, lac, optimal=None):
         """Calcula y aplica el incremento de volumen celular basado en el microambiente."""
-        if not self.env.is_optimal(cell):
+        if optimal is None:
+            optimal = self.env.is_optimal(cell)
+        if not optimal:
             return
 
         base_growth_rates = {
-            CELL_TYPE_PROL: 0.26,
-            CELL_TYPE_RESE: 0.13,
-            CELL_TYPE_INVA: 0.20
+            CELL_TYPE_PROL: GROWTH_BASE_PROL,
+            CELL_TYPE_RESE: GROWTH_BASE_RESE,
+            CELL_TYPE_INVA: GROWTH_BASE_INVA
         }
 
-        growth_base = base_growth_rates.get(cell.type, 0.05)
+        growth_base = base_growth_rates.get(cell.type, GROWTH_BASE_OTHER)
 
         # Correcciones metabólicas
         effective_glc = max(glc, 0.001)
@@ -367,11 +1987,11 @@ class GrowthSteppable(SteppableBasePy):
         effective_lac = max(lac, 0.001)
 
         # Factores Michaelis-Menten
-        glucose_factor = effective_glc / (0.05 + effective_glc)
-        oxygen_factor = effective_o2 / (20.0 + effective_o2)
+        glucose_factor = effective_glc / (GROWTH_KM_GLC + effective_glc)
+        oxygen_factor = effective_o2 / (GROWTH_KM_O2 + effective_o2)
 
         # Inhibición por lactato (acidosis)
-        lactate_inhibition = 1.0 / (1.0 + (effective_lac / 10.0))
+        lactate_inhibition = 1.0 / (1.0 + (effective_lac / GROWTH_KI_LAC))
 
         # Combinación de factores
         total_factor = glucose_factor * oxygen_factor * lactate_inhibition
@@ -379,25 +1999,21 @@ class GrowthSteppable(SteppableBasePy):
         delta_volume = growth_base * total_factor
 
         # Límite máximo de crecimiento
-        max_growth = 0.5  # voxels por MCS
-        delta_volume = min(delta_volume, max_growth)
+        delta_volume = min(delta_volume, GROWTH_MAX_PER_MCS)
 
         cell.targetVolume += delta_volume
 
+        # Índice de candidatos a mitosis: volumen objetivo y tasa de crecimiento
+        slot = self.state.slot(cell.id)
+        self.state.columns[COL_TARGET_VOLUME][slot] = cell.targetVolume
+        self.state.columns[COL_GROWTH_RATE][slot] = delta_volume
+
         # Guardar en log
-        self.growth_log.append({
-            'MCS': self.simulator.getStep(),
-            'CellID': cell.id,
-            'Type': cell.type,
-            'DeltaVolume': round(delta_volume, 4),
-            'NewTargetVolume': round(cell.targetVolume, 2),
-            'LocalGLC': round(glc, 2),
-            'LocalO2': round(o2, 2),
-            'LocalLAC': round(lac, 2)
-        })
+        self.growth_sink.append(self.mcs, cell.id, cell.type, delta_volume,
+                                cell.targetVolume, glc, o2, lac)
 
-        if self.simulator.getStep() % 100 == 0:
-            self.logger.info(f"🌱 MCS {self.simulator.getStep()}: Célula {cell.id} creció {delta_volume:.4f} voxels.")
+        if self.mcs % 100 == 0:
+            self.logger.info("🌱 MCS %d: Célula %d creció %.4f voxels.", self.mcs, cell.id, delta_volume, extra=LOG_GROWTH)
 
     def finish(self):
         """Guarda resultados de crecimiento al finalizar la simulación."""
@@ -405,40 +2021,34 @@ class GrowthSteppable(SteppableBasePy):
             logger = LoggerConfig().get_logger('growth')
 
             # Guardar volumen final
-            volumen_path = os.path.join(LoggerConfig().output_dir, "volumen_final_celulas.csv")
-            logger.info(f"💾 Guardando {volumen_path}")
-
-            with open(volumen_path, "w", newline="") as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(["Cell ID", "Type", "Current Volume", "Target Volume"])
-                for cell in self.cell_list:
-                    if cell is None:
-                        continue
-                    tipo_nombre = {
-                        CELL_TYPE_PROL: "PROL",
-                        CELL_TYPE_RESE: "RESE",
-                        CELL_TYPE_INVA: "INVA",
-                        CELL_TYPE_NECR: "NECR"
-                    }.get(cell.type, f"Type {cell.type}")
-                    writer.writerow([
-                        cell.id,
-                        tipo_nombre,
-                        round(cell.volume, 2),
-                        round(cell.targetVolume, 2)
-                    ])
-
-            # Guardar log de crecimiento
-            growth_log_path = os.path.join(LoggerConfig().output_dir, "growth_log.csv")
-            logger.info(f"💾 Guardando {growth_log_path}")
-
-            with open(growth_log_path, "w", newline="") as logfile:
-                fieldnames = ['MCS', 'CellID', 'Type', 'DeltaVolume', 'NewTargetVolume', 'LocalGLC', 'LocalO2', 'LocalLAC']
-                writer = csv.DictWriter(logfile, fieldnames=fieldnames)
-                writer.writeheader()
-                for entry in self.growth_log:
-                    writer.writerow(entry)
-
-            logger.info("✅ Archivos de crecimiento guardados exitosamente.")
+            output = RunOutput()
+            writer = output.writer("volumen_final_celulas.csv", ["Cell ID", "Type", "Current Volume", "Target Volume"])
+            for cell in self.cell_list:
+                if cell is None:
+                    continue
+                tipo_nombre = {
+                    CELL_TYPE_PROL: "PROL",
+                    CELL_TYPE_RESE: "RESE",
+                    CELL_TYPE_INVA: "INVA",
+                    CELL_TYPE_NECR: "NECR"
+                }.get(cell.type, f"Type {cell.type}")
+                writer.writerow([
+                    cell.id,
+                    tipo_nombre,
+                    round(cell.volume, 2),
+                    round(cell.targetVolume, 2)
+                ])
+            writer.close()
+            logger.info(f"💾 Guardado {writer.path} ({writer.rows} células)", extra=LOG_LIFECYCLE)
+
+            # Volcar lo pendiente del log de crecimiento
+            self.growth_sink.close()
+            if self.growth_sink.rows_written:
+                output.register(os.path.relpath(self.growth_sink.path, output.directory), rows=self.growth_sink.rows_written,
+                                format=self.growth_sink.fmt, mode=self.growth_sink.mode)
+            logger.info(f"💾 Log de crecimiento: {self.growth_sink.rows_written} filas en {self.growth_sink.path}", extra=LOG_LIFECYCLE)
+
+            logger.info("✅ Archivos de crecimiento guardados exitosamente.", extra=LOG_LIFECYCLE)
 
         except Exception as e:
             logger.error(f"❌ Error en GrowthSteppable.finish: {e}")
@@ -447,13 +2057,18 @@ class GrowthSteppable(SteppableBasePy):
 class MitosisSteppable(MitosisSteppableBase):
     def __init__(self, frequency=1):
         super().__init__(frequency)
-        self.logger = LoggerConfig.get_logger()
+        self.logger = LoggerConfig().get_logger('mitosis')
+        self.snapshot = MicroenvironmentSnapshot()
+        self.state = CellStateStore()
+        self.lifecycle = CellLifecycleRegistry()
+        self.candidates = MitosisCandidateIndex(self.state)
+        self.divided_cells = []
         self.initialized = False
 
     def start(self):
         try:
             self.initialized = True
-            self.logger.info("✅ MitosisSteppable inicializado correctamente")
+            self.logger.info("✅ MitosisSteppable inicializado correctamente", extra=LOG_LIFECYCLE)
         except Exception as e:
             self.logger.error(f"❌ Error inicializando MitosisSteppable: {e}")
             self.initialized = False
@@ -466,46 +2081,62 @@ class MitosisSteppable(MitosisSteppableBase):
             return
 
         try:
-            cells_to_divide = []
-
-            for cell in self.cell_list:
-                if cell is None or cell.type == CELL_TYPE_NECR:
-                    continue  # ❌ Ignorar células muertas
-                if cell.volume > MITOSIS_VOLUME_THRESHOLD:
-                    cells_to_divide.append(cell)
-
+            # Solo se lee el volumen real de las células cercanas al umbral
+            snap = self.snapshot.ensure(self.cell_list, mcs)
+            rows = np.flatnonzero(snap.types != CELL_TYPE_NECR)
+            slots = self.state.slots(snap.ids[rows])
+            selected = self.candidates.select(slots, mcs)
+            check_rows = rows[selected]
+            volumes = np.array([snap.cells[row].volume for row in check_rows.tolist()], dtype=np.float64)
+            self.candidates.observe(slots[selected], volumes, mcs)
+
+            cells_to_divide = [snap.cells[row] for row in check_rows[volumes > MITOSIS_VOLUME_THRESHOLD].tolist()]
+
+            self.divided_cells = []
             for cell in cells_to_divide:
                 self.divide_cell_random_orientation(cell)
-                self.logger.info(f"🧬 División: célula {cell.id} dividida en MCS {mcs}")
+                self.logger.info("🧬 División: célula %d dividida en MCS %d", cell.id, mcs, extra=LOG_DIVISION)
 
-            if mcs % 100 == 0:
-                gc.collect()
+            # Madres e hijas cambian de COM: actualizar el snapshot compartido
+            if self.divided_cells:
+                self.snapshot.refresh(self.divided_cells)
+                self.divided_cells = []
 
         except Exception as e:
             self.logger.error(f"❌ Error en MitosisSteppable.step: {e}")
 
     def update_attributes(self):
-        parent_cell = self.parent_cell
-        parent_cell.targetVolume /= 2.0  # Dividir volumen de la madre en 2
-        self.clone_parent_2_child()
+        try:
+            parent_cell = self.parent_cell
+            parent_cell.targetVolume /= 2.0  # Dividir volumen de la madre en 2
+            self.clone_parent_2_child()
+            self.lifecycle.on_birth(parent_cell.id, self.child_cell.id)
+            for cell in (parent_cell, self.child_cell):
+                self.state.set(cell.id, COL_TARGET_VOLUME, cell.targetVolume)
+            self.divided_cells.extend([parent_cell, self.child_cell])
         except Exception as e:
             self.logger.error(f"❌ Error en update_attributes de MitosisSteppable: {e}")
 
     def finish(self):
         """Opcional: mensaje final de cierre"""
         try:
-            self.logger.info("🧬 Finalizó MitosisSteppable correctamente")
+            self.logger.info(f"🧬 Candidatas a mitosis: {self.candidates.checked} lecturas de volumen, {self.candidates.skipped} omitidas", extra=LOG_LIFECYCLE)
+            self.logger.info("🧬 Finalizó MitosisSteppable correctamente", extra=LOG_LIFECYCLE)
         except Exception as e:
             print(f"⚠️ Error cerrando MitosisSteppable: {e}")
         
 class DeathSteppable(SteppableBasePy):
-    def __init__(self, frequency=1):
+    def __init__(self, frequency=1, rate=1):
         super().__init__(frequency)
-        self.critical_condition_counter = {}
+        self.rate = max(1, int(rate))   # evaluar cada `rate` MCS con contadores escalados
+        self.state = CellStateStore()
+        self.state.register_column(COUNTER_CRITICAL)
+        self.lifecycle = CellLifecycleRegistry()
         self.field_accessor = None
+        self.snapshot = MicroenvironmentSnapshot()
         self.env = None
         self.death_count = 0
-        self.logger = LoggerConfig.get_logger()
+        self.logger = LoggerConfig().get_logger('death')
         self.initialized = False
 
     def start(self):
@@ -522,10 +2153,11 @@ class DeathSteppable(SteppableBasePy):
                 return
 
             self.field_accessor = FieldAccessor(self.field)
-            self.env = EnvironmentEvaluator(self.field_accessor)
+            self.snapshot.bind(self.field)
+            self.env = EnvironmentEvaluator(self.snapshot)
 
             self.initialized = True
-            self.logger.info("✅ DeathSteppable inicializado correctamente")
+            self.logger.info("✅ DeathSteppable inicializado correctamente", extra=LOG_LIFECYCLE)
         except Exception as e:
             self.logger.error(f"❌ Error inicializando DeathSteppable: {e}")
             self.initialized = False
@@ -534,87 +2166,87 @@ class DeathSteppable(SteppableBasePy):
         if not self.initialized or not self.field_accessor or not self.env:
             return
 
-        if mcs < DEATH_DELAY:
+        if mcs < DEATH_DELAY or mcs % self.rate:
             return
 
         try:
-            # Limpiar IDs de células eliminadas
-            cell_ids_actuales = {cell.id for cell in self.cell_list if cell is not None}
-            ids_a_eliminar = set(self.critical_condition_counter.keys()) - cell_ids_actuales
-            for dead_id in ids_a_eliminar:
-                del self.critical_condition_counter[dead_id]
-
-            for cell in self.cell_list:
-                if cell is None or cell.type == CELL_TYPE_NECR:
-                    continue
-
+            # Las células eliminadas ya liberaron su estado vía CellLifecycleRegistry
+            snap = self.snapshot.ensure(self.cell_list, mcs)
+
+            # Contadores de daño de todas las células vivas en bloque
+            # (los tipos del snapshot siguen vigentes: Growth y Mitosis no cambian tipos)
+            rows = np.flatnonzero(snap.types != CELL_TYPE_NECR)
+            slots = self.state.slots(snap.ids[rows])
+            counter = self.state.columns[COUNTER_CRITICAL][slots]
+
+            env_class = snap.env_class[rows]
+
+            # Estresadas: sumar tiempo de daño (las INVA toleran lactato tóxico)
+            stressed = (env_class & ENV_SEVERE_STRESS) != 0
+            tolerant = stressed & (snap.types[rows] == CELL_TYPE_INVA) & ((env_class & ENV_TOXIC_LACTATE) != 0)
+            k = self.rate
+            counter = np.where(tolerant, np.maximum(0, counter - k), counter)
+            counter = np.where(stressed & ~tolerant, counter + k, counter)
+
+            # Recuperación: reducir contador de daño
+            recovering = ~stressed & ((env_class & ENV_VIABLE) != 0)
+            counter = np.where(recovering, np.maximum(0, counter - 2 * k), counter)
+
+            self.state.columns[COUNTER_CRITICAL][slots] = counter
+
+            # Muerte si excede umbral
+            dying = rows[counter >= DEATH_MCS_THRESHOLD]
+            self.snapshot.set_types(dying, CELL_TYPE_NECR)
+            for row in dying.tolist():
+                cell = snap.cells[row]
                 try:
-                    o2_conc = self.field_accessor.get(cell, 'o2')
-                    glc_conc = self.field_accessor.get(cell, 'glc')
-                    lac_conc = self.field_accessor.get(cell, 'lac')
-
-                    if cell.id not in self.critical_condition_counter:
-                        self.critical_condition_counter[cell.id] = 0
-
-                    # Estresadas: sumar tiempo de daño
-                    if self.env.is_stressed(cell):
-                        if cell.type == CELL_TYPE_INVA and lac_conc > lac_THRESHOLD_TOXIC:
-                            self.critical_condition_counter[cell.id] = max(0, self.critical_condition_counter[cell.id] - 1)
-                        else:
-                            self.critical_condition_counter[cell.id] += 1
-
-                    # Recuperación: reducir contador de daño
-                    elif o2_conc >= o2_THRESHOLD_HIPO and glc_conc >= glc_THRESHOLD_HIPO:
-                        self.critical_condition_counter[cell.id] = max(0, self.critical_condition_counter[cell.id] - 2)
-
-                    # Muerte si excede umbral
-                    if self.critical_condition_counter[cell.id] >= DEATH_MCS_THRESHOLD:
-                        cell.type = CELL_TYPE_NECR
-                        cell.targetVolume = 25
-                        cell.lambdaVolume = 50.0
-                        self.death_count += 1
-                        self.logger.info(f"☠️ Célula {cell.id} murió en MCS {mcs}")
+                    cell.type = CELL_TYPE_NECR
+                    cell.targetVolume = DEAD_TARGET_VOLUME
+                    cell.lambdaVolume = DEAD_LAMBDA_VOLUME
+                    self.death_count += 1
+                    self.lifecycle.on_death(cell.id)
+                    self.logger.info("☠️ Célula %d murió en MCS %d", cell.id, mcs, extra=LOG_DEATH)
 
                 except Exception as e:
                     self.logger.error(f"❌ Error procesando célula {getattr(cell, 'id', 'Unknown')}: {e}")
 
-            if mcs % 100 == 0:
-                gc.collect()
-
         except Exception as e:
             self.logger.error(f"❌ Error en DeathSteppable.step: {e}")
 
     def finish(self):
         """Guarda las estadísticas finales de muerte celular."""
         try:
-            logger.info(f"📁 Guardando estadísticas de muerte celular...")
+            self.logger.info("📁 Guardando estadísticas de muerte celular...", extra=LOG_LIFECYCLE)
 
-            death_stats_path = os.path.join(logger_config.output_dir, "death_stats.csv")
-            with open(death_stats_path, "w", newline="") as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(["Total Deaths", "MCS"])
-                writer.writerow([self.death_count, self.simulator.getStep()])
+            RunOutput().write_csv("death_stats.csv", ["Total Deaths", "MCS"],
+                                  [[self.death_count, RunOutput().run_mcs(self.simulator.getStep())]])
 
-            logger.info(f"📁 Archivo 'death_stats.csv' guardado exitosamente")
+            self.logger.info("📁 Archivo 'death_stats.csv' guardado exitosamente", extra=LOG_LIFECYCLE)
 
         except Exception as e:
-            logger.error(f"⚠️ Error guardando death_stats.csv: {str(e)}")
+            self.logger.error(f"⚠️ Error guardando death_stats.csv: {str(e)}")
             print(f"⚠️ Error guardando death_stats.csv: {str(e)}")
 
         finally:
             try:
-                logger.info("🔄 Finalizando DeathSteppable correctamente")
+                self.logger.info("🔄 Finalizando DeathSteppable correctamente", extra=LOG_LIFECYCLE)
             except Exception as e:
                 print(f"⚠️ Error finalizando DeathSteppable: {str(e)}")
 
                 
 class MutationSteppable(SteppableBasePy):
 
-    def __init__(self, frequency=1):
+    def __init__(self, frequency=1, vectorized=True, rate=1):
         super().__init__(frequency)
+        self.rate = max(1, int(rate))   # evaluar cada `rate` MCS con contadores escalados
         self.mutation_count = 0
-        self.mutation_interval = 500
-        self.cell_conditions = {}
+        self.mutation_interval = MUTATION_INTERVAL
+        self.vectorized = vectorized
+        self.engine = None
+        self.rng = RandomStreams().stream('mutation')
+        self.state = CellStateStore()
+        for counter_name in PHENOTYPE_COUNTERS:
+            self.state.register_column(counter_name)
         self.mutation_percentage = MUTATION_PERC
         self.initial_mutation_delay = MUTATION_DELAY
         self.transition_counts = {
@@ -624,12 +2256,10 @@ class MutationSteppable(SteppableBasePy):
             "INVA→RESE": 0
         }
         self.field_accessor = None
-        self.logger = LoggerConfig.get_logger()
+        self.snapshot = MicroenvironmentSnapshot()
+        self.logger = LoggerConfig().get_logger('mutation')
         self.initialized = False
 
-        if not tracemalloc.is_tracing():
-            tracemalloc.start()
-
     def start(self):
         try:
             if self.initialized:
@@ -644,10 +2274,12 @@ class MutationSteppable(SteppableBasePy):
                 return
 
             self.field_accessor = FieldAccessor(self.field)
-            self.env = EnvironmentEvaluator(self.field_accessor)
+            self.snapshot.bind(self.field)
+            self.env = EnvironmentEvaluator(self.snapshot)
+            self.engine = PhenotypeTransitionEngine(self.env)
 
             self.initialized = True
-            self.logger.info("✅ MutationSteppable inicializado correctamente")
+            self.logger.info("✅ MutationSteppable inicializado correctamente", extra=LOG_LIFECYCLE)
 
         except Exception as e:
             self.logger.error(f"❌ Error inicializando MutationSteppable: {e}")
@@ -657,34 +2289,100 @@ class MutationSteppable(SteppableBasePy):
     def step(self, mcs):
         if not self.initialized or not self.field_accessor or mcs < self.initial_mutation_delay:
             return
+        if mcs % self.rate:
+            # La mutación por hipoxia no acumula un contador que se pueda escalar: se evalúa cada MCS
+            self.mutate_hypoxic(self.snapshot.ensure(self.cell_list, mcs), mcs)
+            return
+
+        snap = self.snapshot.ensure(self.cell_list, mcs)
 
         if mcs % 10 == 0:
-            gc.collect()  # Forzar recolección de basura
+            num_cells = int((snap.types != CELL_TYPE_NECR).sum())
+            self.logger.info("🔄 MCS %d: %d células activas, %d mutaciones", mcs, num_cells, self.mutation_count, extra=LOG_METRICS)
+
+        if self.vectorized:
+            self.step_vectorized(snap, mcs)
+        else:
+            self.step_per_cell(snap, mcs)
+
+        self.perform_random_mutations(mcs)
 
-            num_cells = sum(1 for cell in self.cell_list if cell.type != CELL_TYPE_NECR)
-            snapshot = tracemalloc.take_snapshot()
-            memoria_mb = sum(stat.size for stat in snapshot.statistics('lineno')) / (1024 * 1024)
+    def step_vectorized(self, snap, mcs):
+        """Mutación y transiciones de todas las células con el motor por lotes."""
+        rows = np.flatnonzero(snap.types != CELL_TYPE_NECR)
+        if rows.size == 0:
+            return
 
-            self.logger.info(f"🔄 MCS {mcs}: {num_cells} células activas, {self.mutation_count} mutaciones, memoria ≈ {memoria_mb:.2f} MB")
+        types = snap.types[rows]
+        slots = self.state.slots(snap.ids[rows])
+        counters = {name: self.state.columns[name][slots] for name in PHENOTYPE_COUNTERS}
+
+        new_types, mutated, fired = self.engine.run(
+            types, snap.env_class[rows], counters, self.draw_new_cell_types, scale=self.rate)
+
+        for name in PHENOTYPE_COUNTERS:
+            self.state.columns[name][slots] = counters[name]
+
+        num_mutated = int(mutated.sum())
+        self.mutation_count += num_mutated
+        for transition, mask in fired.items():
+            self.transition_counts[transition] += int(mask.sum())
+
+        # Solo se escriben en CC3D las células cuyo tipo cambió realmente
+        changed = np.flatnonzero(new_types != types)
+        for k in changed.tolist():
+            snap.cells[rows[k]].type = int(new_types[k])
+        self.snapshot.set_types(rows[changed], new_types[changed])
+
+        if num_mutated or changed.size:
+            fired_summary = {name: int(mask.sum()) for name, mask in fired.items()}
+            self.logger.info("🔄 MCS %d: %d mutaciones por hipoxia, %d cambios de tipo (%s)",
+                             mcs, num_mutated, changed.size, fired_summary, extra=LOG_TRANSITION)
+
+    def mutate_hypoxic(self, snap, mcs):
+        """Solo la mutación por hipoxia, en los MCS sin evaluación de contadores (rate > 1)."""
+        if not self.vectorized:
+            o2, glc, lac = (snap.values[name].tolist() for name in ('o2', 'glc', 'lac'))
+            for row, cell in enumerate(snap.cells):
+                self.check_and_mutate(cell, o2[row], glc[row], lac[row], mcs)
+            self.snapshot.set_types(np.arange(len(snap.cells)), [cell.type for cell in snap.cells])
+            return
 
-        for cell in self.cell_list:
-            if cell is None or cell.type == CELL_TYPE_NECR:
+        rows = np.flatnonzero(self.engine.mutation_mask(snap.types, snap.env_class))
+        if rows.size == 0:
+            return
+        new_types = self.draw_new_cell_types(snap.types[rows])
+        self.mutation_count += int(rows.size)
+
+        changed = new_types != snap.types[rows]
+        for row, cell_type in zip(rows[changed].tolist(), new_types[changed].tolist()):
+            snap.cells[row].type = int(cell_type)
+        self.snapshot.set_types(rows[changed], new_types[changed])
+        self.logger.info("🔄 MCS %d: %d mutaciones por hipoxia", mcs, rows.size, extra=LOG_TRANSITION)
+
+    def step_per_cell(self, snap, mcs):
+        """Implementación de referencia célula por célula (útil para depurar)."""
+        o2, glc, lac = (snap.values[name].tolist() for name in ('o2', 'glc', 'lac'))
+        optimal = ((snap.env_class & ENV_OPTIMAL) != 0).tolist()
+        stressed = ((snap.env_class & ENV_SEVERE_STRESS) != 0).tolist()
+
+        for row, cell in enumerate(snap.cells):
+            if cell.type == CELL_TYPE_NECR:
                 continue
 
             try:
-                o2_conc = self.field_accessor.get(cell, 'o2')
-                glc_conc = self.field_accessor.get(cell, 'glc')
-                lac_conc = self.field_accessor.get(cell, 'lac')
+                o2_conc, glc_conc, lac_conc = o2[row], glc[row], lac[row]
 
                 self.check_and_mutate(cell, o2_conc, glc_conc, lac_conc, mcs)
-                self.update_condition_counters(cell, o2_conc, glc_conc, lac_conc)
+                self.update_condition_counters(cell, o2_conc, glc_conc, lac_conc,
+                                               optimal=optimal[row], stressed=stressed[row], scale=self.rate)
                 self.apply_phenotype_changes(cell, mcs)
 
             except Exception as e:
                 self.logger.error(f"❌ Error procesando célula {getattr(cell, 'id', 'Unknown')}: {e}")
 
-        self.perform_random_mutations(mcs)
-    
+        self.snapshot.set_types(np.arange(len(snap.cells)), [cell.type for cell in snap.cells])
+
     def check_and_mutate(self, cell, o2_conc, glc_conc, lac_conc, mcs):
         """Verifica si una célula puede mutar según las condiciones del microambiente."""
         if cell.type in [CELL_TYPE_PROL, CELL_TYPE_RESE, CELL_TYPE_INVA]:
@@ -692,9 +2390,9 @@ class MutationSteppable(SteppableBasePy):
                 new_type = self.get_new_cell_type(cell.type)
                 cell.type = new_type
                 self.mutation_count += 1
-                self.logger.info(f"🔄 Célula {cell.id} mutó a tipo {new_type} debido a hipoxia en MCS {mcs}.")    
+                self.logger.info("🔄 Célula %d mutó a tipo %d debido a hipoxia en MCS %d.", cell.id, new_type, mcs, extra=LOG_MUTATION)
                             
-    def update_condition_counters(self, cell, o2_conc, glc_conc, lac_conc):
+    def update_condition_counters(self, cell, o2_conc, glc_conc, lac_conc, optimal=None, stressed=None, scale=1):
         """
         Actualiza contadores para transición de fenotipos basada en el entorno metabólico.
         Se consideran los 4 posibles cambios:
@@ -704,59 +2402,58 @@ class MutationSteppable(SteppableBasePy):
         - INVA → RESE
         """
     
-        if cell.id not in self.cell_conditions:
-            self.cell_conditions[cell.id] = {
-                'low_o2_low_glu_prol_to_rese': 0,
-                'low_o2_low_glu_rese_to_inva': 0,
-                'high_o2_high_glu_rese_to_prol': 0,
-                'high_o2_high_glu_inva_to_rese': 0,
-            }
-    
-        conditions = self.cell_conditions[cell.id]
+        slot = self.state.slot(cell.id)
+        conditions = self.state.columns
+
+        # Clasificación del ambiente (precalculada desde el snapshot si está disponible)
+        if optimal is None:
+            optimal = self.env.is_optimal(cell)
+        if stressed is None:
+            stressed = self.env.is_stressed(cell)
     
         # --------------------------------------
         # → PROLIFERATIVA → RESERVA (estrés leve)
         # --------------------------------------
         if cell.type == CELL_TYPE_PROL and (o2_THRESHOLD_HIPO <= o2_conc <= o2_THRESHOLD and glc_THRESHOLD_HIPO <= glc_conc <= glc_THRESHOLD):
-            conditions['low_o2_low_glu_prol_to_rese'] += 1
-            self.logger.info(f"🔄 Célula {cell.id} (PROL) puede volverse RESE en {MCS_PROL_TO_RESE - conditions['low_o2_low_glu_prol_to_rese']} MCS")
+            conditions[COUNTER_PROL_TO_RESE][slot] += scale
+            self.logger.info("🔄 Célula %d (PROL) puede volverse RESE en %d MCS", cell.id, MCS_PROL_TO_RESE - conditions[COUNTER_PROL_TO_RESE][slot], extra=LOG_COUNTDOWN)
         else:
-            conditions['low_o2_low_glu_prol_to_rese'] = max(0, conditions['low_o2_low_glu_prol_to_rese'] - 2)
+            conditions[COUNTER_PROL_TO_RESE][slot] = max(0, conditions[COUNTER_PROL_TO_RESE][slot] - 2 * scale)
     
         # --------------------------------------
         # → RESERVA → INVASIVA (estrés severo)
         # --------------------------------------
-        if cell.type == CELL_TYPE_RESE and self.env.is_stressed(cell):
-            conditions['low_o2_low_glu_rese_to_inva'] += 1
-            self.logger.info(f"🔄 Célula {cell.id} (RESE) en estrés → puede volverse INVA en {MCS_RESE_TO_INVA - conditions['low_o2_low_glu_rese_to_inva']} MCS")
+        if cell.type == CELL_TYPE_RESE and stressed:
+            conditions[COUNTER_RESE_TO_INVA][slot] += scale
+            self.logger.info("🔄 Célula %d (RESE) en estrés → puede volverse INVA en %d MCS", cell.id, MCS_RESE_TO_INVA - conditions[COUNTER_RESE_TO_INVA][slot], extra=LOG_COUNTDOWN)
         else:
-            conditions['low_o2_low_glu_rese_to_inva'] = max(0, conditions['low_o2_low_glu_rese_to_inva'] - 2)
+            conditions[COUNTER_RESE_TO_INVA][slot] = max(0, conditions[COUNTER_RESE_TO_INVA][slot] - 2 * scale)
     
         # --------------------------------------
         # → RESERVA → PROLIFERATIVA (recuperación)
         # --------------------------------------
         if cell.type == CELL_TYPE_RESE:
-            if self.env.is_optimal(cell):
-                conditions['high_o2_high_glu_rese_to_prol'] += 1
-                self.logger.info(f"🔄 Célula {cell.id} (RESE) en ambiente óptimo: revertirá a PROL en {MCS_RESE_TO_PROL - conditions['high_o2_high_glu_rese_to_prol']} MCS")
+            if optimal:
+                conditions[COUNTER_RESE_TO_PROL][slot] += scale
+                self.logger.info("🔄 Célula %d (RESE) en ambiente óptimo: revertirá a PROL en %d MCS", cell.id, MCS_RESE_TO_PROL - conditions[COUNTER_RESE_TO_PROL][slot], extra=LOG_COUNTDOWN)
             elif o2_conc > o2_THRESHOLD_HIPO and glc_conc > glc_THRESHOLD_HIPO:
-                conditions['high_o2_high_glu_rese_to_prol'] += 1
-                self.logger.info(f"🔄 Célula {cell.id} (RESE) en buenas condiciones: revertirá a PROL en {MCS_RESE_TO_PROL - conditions['high_o2_high_glu_rese_to_prol']} MCS")
+                conditions[COUNTER_RESE_TO_PROL][slot] += scale
+                self.logger.info("🔄 Célula %d (RESE) en buenas condiciones: revertirá a PROL en %d MCS", cell.id, MCS_RESE_TO_PROL - conditions[COUNTER_RESE_TO_PROL][slot], extra=LOG_COUNTDOWN)
             else:
-                conditions['high_o2_high_glu_rese_to_prol'] = max(0, conditions['high_o2_high_glu_rese_to_prol'] - 2)
+                conditions[COUNTER_RESE_TO_PROL][slot] = max(0, conditions[COUNTER_RESE_TO_PROL][slot] - 2 * scale)
     
         # --------------------------------------
         # → INVASIVA → RESERVA (reversión)
         # --------------------------------------
         if cell.type == CELL_TYPE_INVA:
-            if self.env.is_optimal(cell):
-                conditions['high_o2_high_glu_inva_to_rese'] += 1
-                self.logger.info(f"🔄 Célula {cell.id} (INVA) en ambiente óptimo: revertirá a RESE en {MCS_INVA_TO_RESE - conditions['high_o2_high_glu_inva_to_rese']} MCS")
+            if optimal:
+                conditions[COUNTER_INVA_TO_RESE][slot] += scale
+                self.logger.info("🔄 Célula %d (INVA) en ambiente óptimo: revertirá a RESE en %d MCS", cell.id, MCS_INVA_TO_RESE - conditions[COUNTER_INVA_TO_RESE][slot], extra=LOG_COUNTDOWN)
             elif o2_conc >= o2_THRESHOLD_HIPO and glc_conc >= glc_THRESHOLD_HIPO:
-                conditions['high_o2_high_glu_inva_to_rese'] += 1
-                self.logger.info(f"🔄 Célula {cell.id} (INVA) en buenas condiciones: revertirá a RESE en {MCS_INVA_TO_RESE - conditions['high_o2_high_glu_inva_to_rese']} MCS")
+                conditions[COUNTER_INVA_TO_RESE][slot] += scale
+                self.logger.info("🔄 Célula %d (INVA) en buenas condiciones: revertirá a RESE en %d MCS", cell.id, MCS_INVA_TO_RESE - conditions[COUNTER_INVA_TO_RESE][slot], extra=LOG_COUNTDOWN)
             else:
-                conditions['high_o2_high_glu_inva_to_rese'] = max(0, conditions['high_o2_high_glu_inva_to_rese'] - 2)
+                conditions[COUNTER_INVA_TO_RESE][slot] = max(0, conditions[COUNTER_INVA_TO_RESE][slot] - 2 * scale)
 
     def apply_phenotype_changes(self, cell, mcs):
         """
@@ -767,79 +2464,1073 @@ class MutationSteppable(SteppableBasePy):
         if mcs < self.initial_mutation_delay:
             return
     
-        conditions = self.cell_conditions[cell.id]
+        slot = self.state.slot(cell.id)
+        conditions = self.state.columns
     
         # PROL → RESE
-        if conditions['low_o2_low_glu_prol_to_rese'] >= MCS_PROL_TO_RESE:
+        if conditions[COUNTER_PROL_TO_RESE][slot] >= MCS_PROL_TO_RESE:
             cell.type = CELL_TYPE_RESE
             self.transition_counts["PROL→RESE"] += 1
-            self.logger.info(f"🔄 PROL → RESE in cell {cell.id} at MCS {mcs}")
+            self.logger.info("🔄 PROL → RESE in cell %d at MCS %d", cell.id, mcs, extra=LOG_TRANSITION)
     
         # RESE → INVA
-        elif conditions['low_o2_low_glu_rese_to_inva'] >= MCS_RESE_TO_INVA:
+        elif conditions[COUNTER_RESE_TO_INVA][slot] >= MCS_RESE_TO_INVA:
             cell.type = CELL_TYPE_INVA
             self.transition_counts["RESE→INVA"] += 1
-            self.logger.info(f"🔄 RESE → INVA in cell {cell.id} at MCS {mcs}")
+            self.logger.info("🔄 RESE → INVA in cell %d at MCS %d", cell.id, mcs, extra=LOG_TRANSITION)
     
         # RESE → PROL
-        elif conditions['high_o2_high_glu_rese_to_prol'] >= MCS_RESE_TO_PROL:
+        elif conditions[COUNTER_RESE_TO_PROL][slot] >= MCS_RESE_TO_PROL:
             cell.type = CELL_TYPE_PROL
             self.transition_counts["RESE→PROL"] += 1
-            self.logger.info(f"🔄 RESE → PROL in cell {cell.id} at MCS {mcs}")
+            self.logger.info("🔄 RESE → PROL in cell %d at MCS %d", cell.id, mcs, extra=LOG_TRANSITION)
     
         # INVA → RESE
-        elif conditions['high_o2_high_glu_inva_to_rese'] >= MCS_INVA_TO_RESE:
+        elif conditions[COUNTER_INVA_TO_RESE][slot] >= MCS_INVA_TO_RESE:
             cell.type = CELL_TYPE_RESE
             self.transition_counts["INVA→RESE"] += 1
-            self.logger.info(f"🔄 INVA → RESE in cell {cell.id} at MCS {mcs}")
+            self.logger.info("🔄 INVA → RESE in cell %d at MCS %d", cell.id, mcs, extra=LOG_TRANSITION)
     
     def get_new_cell_type(self, current_type):
         """Devuelve un nuevo tipo de célula basado en el tipo actual."""
-        if current_type == CELL_TYPE_PROL:
-            return random.choice([CELL_TYPE_RESE, CELL_TYPE_INVA])
-        elif current_type == CELL_TYPE_RESE:
-            return random.choice([CELL_TYPE_PROL, CELL_TYPE_INVA])
-        else:
-            return random.choice([CELL_TYPE_PROL, CELL_TYPE_RESE])
+        return int(self.draw_new_cell_types(np.array([current_type]))[0])
+
+    def draw_new_cell_types(self, types):
+        """Nuevo tipo para cada célula del lote con una sola llamada al generador."""
+        types = np.asarray(types)
+        choice = self.rng.integers(0, 2, size=len(types))
+        rows = np.clip(types, 0, len(MUTATION_TARGETS) - 1)
+        return MUTATION_TARGETS[rows, choice].astype(types.dtype)
                 
     # def perform_random_mutations(self, mcs):
         # """Realiza mutaciones aleatorias en células cada `mutation_interval` pasos."""
         # if mcs < self.initial_mutation_delay or mcs % self.mutation_interval != 0:
     def perform_random_mutations(self, mcs):
-        if mcs % self.mutation_interval != 0:
+        # Con rate > 1 se ejecuta en la evaluación que cubre el múltiplo de mutation_interval
+        if mcs // self.mutation_interval == (mcs - self.rate) // self.mutation_interval:
             return
 
-        eligible_cells = [cell for cell in self.cell_list if cell.type in [CELL_TYPE_PROL, CELL_TYPE_RESE, CELL_TYPE_INVA]]
-        if not eligible_cells:
+        snap = self.snapshot.ensure(self.cell_list, mcs)
+        eligible_rows = np.flatnonzero(np.isin(snap.types, (CELL_TYPE_PROL, CELL_TYPE_RESE, CELL_TYPE_INVA)))
+        if eligible_rows.size == 0:
             return
 
-        num_mutations = max(1, int(len(eligible_cells) * self.mutation_percentage))
-        cells_to_mutate = random.sample(eligible_cells, min(num_mutations, len(eligible_cells)))
+        num_mutations = max(1, int(eligible_rows.size * self.mutation_percentage))
+        picked = self.rng.choice(eligible_rows.size, size=min(num_mutations, eligible_rows.size), replace=False)
+        rows_to_mutate = eligible_rows[picked]
+        new_types = self.draw_new_cell_types(snap.types[rows_to_mutate])
 
-        for cell in cells_to_mutate:
-            new_type = self.get_new_cell_type(cell.type)
+        for row, new_type in zip(rows_to_mutate.tolist(), new_types.tolist()):
+            cell = snap.cells[row]
             cell.type = new_type
             self.mutation_count += 1
-            self.logger.info(f"🧬 Mutación aleatoria: Célula {cell.id} ahora es tipo {new_type}")
-    
+            self.logger.info("🧬 Mutación aleatoria: Célula %d ahora es tipo %d", cell.id, new_type, extra=LOG_MUTATION)
+        self.snapshot.set_types(rows_to_mutate, new_types)
 
     def finish(self):
         """Guarda los resultados de mutación."""
         try:
-            output_file = os.path.join(logger_config.output_dir, "transition_counts.csv")
-            with open(output_file, "w", newline="") as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(["Transition", "Count"])
-                for transition, count in self.transition_counts.items():
-                    writer.writerow([transition, count])
-
-            mutation_file = os.path.join(logger_config.output_dir, "mutation_stats.csv")
-            with open(mutation_file, "w", newline="") as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(["Total Mutations", "MCS"])
-                writer.writerow([self.mutation_count, self.simulator.getStep()])
-
-            logger.info(f"📁 Resultados de MutationSteppable guardados correctamente")
+            output = RunOutput()
+            output.write_csv("transition_counts.csv", ["Transition", "Count"], self.transition_counts.items())
+            output.write_csv("mutation_stats.csv", ["Total Mutations", "MCS"],
+                             [[self.mutation_count, output.run_mcs(self.simulator.getStep())]])
+
+            self.logger.info("📁 Resultados de MutationSteppable guardados correctamente", extra=LOG_LIFECYCLE)
         except Exception as e:
-            logger.error(f"⚠️ Error guardando resultados de MutationSteppable: {e}")
-              
+            self.logger.error(f"⚠️ Error guardando resultados de MutationSteppable: {e}")
+
+# ------------- EVALUACIÓN MULTI-FRECUENCIA -------------
+
+def multirate_from_env():
+    """Lee SBA_MULTIRATE ("mutation=4,death=2") como {'mutation': 4, 'death': 2}."""
+    rates = {}
+    for item in os.environ.get(MULTIRATE_ENV, '').split(','):
+        if not item.strip():
+            continue
+        name, _, value = item.partition('=')
+        rates[name.strip().lower()] = max(1, int(value))
+    return rates
+
+def multirate_thresholds():
+    """Umbrales (en MCS) de los contadores que cada steppable acumula."""
+    return {
+        'mutation': {
+            'MCS_PROL_TO_RESE': MCS_PROL_TO_RESE,
+            'MCS_RESE_TO_INVA': MCS_RESE_TO_INVA,
+            'MCS_RESE_TO_PROL': MCS_RESE_TO_PROL,
+            'MCS_INVA_TO_RESE': MCS_INVA_TO_RESE,
+        },
+        'death': {'DEATH_MCS_THRESHOLD': DEATH_MCS_THRESHOLD},
+    }
+
+def transition_timing_error(threshold, rate):
+    """
+    Peor desfase (MCS) entre evaluar cada MCS y cada `rate` MCS con
+    incrementos escalados, para un estímulo constante que empieza en
+    cualquier fase respecto a las evaluaciones.
+
+    Con rate=1 el contador alcanza `threshold` a los threshold-1 MCS del
+    inicio; con rate=k la primera evaluación llega `offset` MCS después
+    (0 <= offset < k) y se necesitan ceil(threshold/k) evaluaciones.
+    """
+    evaluations = -(-threshold // rate)
+    errors = [offset + (evaluations - 1) * rate - (threshold - 1) for offset in range(rate)]
+    return max(errors, key=abs)
+
+def validate_multirate(rates, tolerance=MULTIRATE_TOLERANCE):
+    """
+    Comprueba que el tiempo de cada transición con las frecuencias `rates`
+    difiere a lo sumo `tolerance` (relativo) del de evaluar cada MCS.
+    Devuelve el reporte por umbral y lanza ValueError si alguno lo excede.
+    """
+    thresholds = multirate_thresholds()
+    unknown = sorted(set(rates) - set(thresholds))
+    if unknown:
+        raise ValueError(f"Steppables sin evaluación multi-frecuencia: {', '.join(unknown)}")
+
+    report, failures = [], []
+    for name, rate in rates.items():
+        for threshold_name, threshold in thresholds[name].items():
+            error = transition_timing_error(threshold, rate)
+            relative = abs(error) / threshold
+            report.append((name, rate, threshold_name, threshold, error, relative))
+            if relative > tolerance:
+                failures.append(f"{name} k={rate}: {threshold_name}={threshold} desfase {error} MCS ({relative:.0%})")
+
+    if failures:
+        raise ValueError("Frecuencias fuera de tolerancia: " + "; ".join(failures))
+    for name, rate, threshold_name, threshold, error, relative in report:
+        logger_main.info(f"⏱️ {name} cada {rate} MCS: {threshold_name}={threshold}, desfase máximo {error:+d} MCS ({relative:.1%})",
+                         extra=LOG_LIFECYCLE)
+    return report
+
+# ------------- PIPELINE FUSIONADO -------------
+
+class FusedCellUpdateSteppable(SteppableBasePy):
+    """
+    Pipeline fusionado de actualización celular (opcional, SBA_FUSED_PIPELINE=1).
+
+    Recorre el inventario de CC3D una sola vez por MCS (al construir el
+    snapshot) y ejecuta las etapas en este orden fijo, el mismo que el
+    registro de steppables separados:
+
+      1. Snapshot del microambiente (id, tipo, COM, campos)
+      2. Crecimiento (GrowthSteppable)
+      3. Mitosis (MitosisSteppable; refresca madres e hijas en el snapshot)
+      4. Daño y muerte (DeathSteppable)
+      5. Mutación y transiciones fenotípicas (MutationSteppable)
+
+    Las etapas son instancias de los steppables separados, que siguen
+    disponibles para depuración y producen los mismos resultados.
+    """
+    def __init__(self, frequency=1, rates=None):
+        super().__init__(frequency)
+        rates = rates or {}
+        self.logger = LoggerConfig().get_logger('fused_pipeline')
+        self.snapshot = MicroenvironmentSnapshot()
+        self.growth = GrowthSteppable(frequency)
+        self.mitosis = MitosisSteppable(frequency)
+        self.death = DeathSteppable(frequency, rate=rates.get('death', 1))
+        self.mutation = MutationSteppable(frequency, rate=rates.get('mutation', 1))
+        self.stages = [self.growth, self.mitosis, self.death, self.mutation]
+
+    @staticmethod
+    def enabled():
+        return os.environ.get(FUSED_PIPELINE_ENV, '') == '1'
+
+    def start(self):
+        self.snapshot.bind(self.field, pixel_source=self.get_cell_pixel_list)
+        for stage in self.stages:
+            self.attach(stage)
+            stage.start()
+        self.logger.info("✅ Pipeline fusionado: crecimiento → mitosis → daño → fenotipo", extra=LOG_LIFECYCLE)
+
+    def attach(self, stage):
+        """
+        Hace con una etapa lo que el registro de CC3D hace con un steppable
+        registrado: le pasa el simulador (init) y después ejecuta core_init,
+        que a partir de él obtiene potts, campos, inventario y, en
+        MitosisSteppableBase, el MitosisSteppable de C++.
+        """
+        stage.init(self.simulator)
+        stage.core_init()
+
+    def step(self, mcs):
+        LoggerConfig().begin_mcs(mcs)
+        self.snapshot.ensure(self.cell_list, mcs)
+        for stage in self.stages:
+            stage.step(mcs)
+
+    def finish(self):
+        for stage in self.stages:
+            stage.finish()
+
+# ------------- DETECCIÓN DE ESTADO ESTACIONARIO -------------
+
+class ConvergenceMonitorSteppable(SteppableBasePy):
+    """
+    Monitor de convergencia al estado estacionario.
+
+    Al final de cada ventana de `window` MCS compara poblaciones por tipo,
+    volumen celular total y o2/glc/lac medios en las células con la ventana
+    anterior. Si todas las tasas de cambio relativas quedan bajo su
+    tolerancia durante `windows` ventanas consecutivas, registra el MCS en
+    results/steady_state.json y detiene la simulación (salvo
+    SBA_STEADY_STATE_STOP=0). La serie queda en results/convergence.csv.
+    """
+    METRICS = ('PROL', 'RESE', 'INVA', 'NECR', 'total_volume', 'mean_o2', 'mean_glc', 'mean_lac')
+    GROUPS = ('population',) * 4 + ('volume',) + ('fields',) * 3
+
+    def __init__(self, frequency=1, window=CONVERGENCE_WINDOW, windows=CONVERGENCE_WINDOWS,
+                 min_mcs=CONVERGENCE_MIN_MCS, tolerances=None, stop=None):
+        super().__init__(frequency)
+        self.logger = LoggerConfig().get_logger('convergence')
+        self.snapshot = MicroenvironmentSnapshot()
+        self.window = max(1, int(window))
+        self.windows = windows
+        self.min_mcs = min_mcs
+        self.tolerances = dict(CONVERGENCE_TOLERANCES, **(tolerances or {}))
+        self.stop = stop if stop is not None else os.environ.get(STEADY_STATE_STOP_ENV, '1') != '0'
+        self.previous = None
+        self.streak = 0
+        self.steady_state_mcs = None
+        self._writer = None
+
+    def start(self):
+        self._writer = RunOutput().writer("convergence.csv",
+                                          ["MCS", *self.METRICS, *(f"rate_{name}" for name in self.METRICS), "Streak"],
+                                          resume=True)
+
+    def measure(self, mcs):
+        """Vector de métricas del MCS actual (usa el snapshot compartido)."""
+        snap = self.snapshot.ensure(self.cell_list, mcs)
+        counts = np.bincount(snap.types, minlength=CELL_TYPE_NECR + 1)[CELL_TYPE_PROL:CELL_TYPE_NECR + 1]
+        total_volume = float(sum(cell.volume for cell in snap.cells))
+        means = [float(snap.values[name].mean()) if len(snap.ids) else 0.0 for name in ('o2', 'glc', 'lac')]
+        return np.array([*counts.tolist(), total_volume, *means], dtype=np.float64)
+
+    def step(self, mcs):
+        if self._writer is None or mcs % self.window != 0 or self.steady_state_mcs is not None:
+            return
+
+        current = self.measure(mcs)
+        rates = np.full(len(current), np.nan)
+        if self.previous is not None:
+            scale = np.maximum(np.abs(self.previous), 1e-12)
+            rates = np.abs(current - self.previous) / scale / self.window
+            tolerances = np.array([self.tolerances[group] for group in self.GROUPS])
+            converged = mcs >= self.min_mcs and bool(np.all(rates <= tolerances))
+            self.streak = self.streak + 1 if converged else 0
+        self.previous = current
+
+        self._writer.writerow([mcs, *np.round(current, 6).tolist(), *np.round(rates, 8).tolist(), self.streak])
+        self._writer.flush()
+
+        if self.streak >= self.windows:
+            self.steady_state_mcs = mcs
+            self._record(mcs, current)
+            self.logger.info(f"🏁 Estado estacionario detectado en MCS {mcs} ({self.streak} ventanas de {self.window} MCS)",
+                             extra=LOG_LIFECYCLE)
+            if self.stop:
+                self.stop_simulation()
+
+    def _record(self, mcs, metrics):
+        RunOutput().write_json("steady_state.json", {
+            "steady_state_mcs": mcs,
+            "window": self.window,
+            "windows": self.windows,
+            "tolerances": self.tolerances,
+            "metrics": dict(zip(self.METRICS, metrics.tolist())),
+            "stopped": self.stop,
+        })
+
+    def finish(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self.steady_state_mcs is None:
+            self.logger.info("ℹ️ No se alcanzó el estado estacionario antes del final de la corrida", extra=LOG_LIFECYCLE)
+
+# ------------- CHECKPOINT Y REANUDACIÓN -------------
+
+def read_field_array(field, dim, dtype=np.float64):
+    """Copia (x, y, z) de un campo químico; None si el campo no existe."""
+    if field is None:
+        return None
+    array = np.asarray(field)
+    if array.shape == (dim.x, dim.y, dim.z) and array.dtype != object:
+        return array.astype(dtype, copy=True)
+    array = np.empty((dim.x, dim.y, dim.z), dtype=dtype)
+    for x in range(dim.x):
+        for y in range(dim.y):
+            for z in range(dim.z):
+                array[x, y, z] = field[x, y, z]
+    return array
+
+def resolve_checkpoint(resume, directory):
+    """Ruta del checkpoint de SBA_RESUME ("latest": el más reciente de `directory`); None si no hay."""
+    if not resume:
+        return None
+    if resume != 'latest':
+        return resume
+    if not os.path.isdir(directory):
+        return None
+    names = sorted(name for name in os.listdir(directory)
+                   if name.startswith("checkpoint_mcs_") and name.endswith(".npz"))
+    return os.path.join(directory, names[-1]) if names else None
+
+def checkpoint_mcs(path):
+    """MCS guardado en un checkpoint (solo lee sus metadatos); None sin checkpoint."""
+    if path is None or not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        return int(json.loads(str(data['meta']))['mcs'])
+
+class CheckpointSteppable(SteppableBasePy):
+    """
+    Guarda el estado completo de la corrida cada `interval` MCS en un único
+    archivo comprimido (results/checkpoints/checkpoint_mcs_NNNNNN.npz):
+    vóxeles de cada célula, tipo, volumen objetivo y lambda, columnas de
+    CellStateStore, contadores de los steppables, estado de RandomStreams y
+    campos químicos. Con SBA_RESUME (ruta o "latest") restaura el último
+    checkpoint en start y desplaza el MCS que reciben los steppables, de modo
+    que MCS_INIT_EVO y MUTATION_DELAY no se repiten. La corrida reanudada
+    termina en el mismo MCS que la original (<Steps> del XML o `steps`).
+
+    Debe registrarse después de ConstraintInitializerSteppable para que el
+    estado restaurado no se sobrescriba.
+    """
+    def __init__(self, frequency=1, steppables=(), interval=CHECKPOINT_INTERVAL,
+                 keep=CHECKPOINT_KEEP, resume=None, steps=None):
+        super().__init__(frequency)
+        self.steppables = list(steppables)
+        self.steps = steps
+        self.interval = interval
+        self.keep = keep
+        self.resume = resume if resume is not None else os.environ.get(RESUME_ENV)
+        self.logger = LoggerConfig().get_logger('checkpoint')
+        self.directory = RunOutput().path("checkpoints")
+        self.state = CellStateStore()
+        self.mcs_offset = 0
+
+    def start(self):
+        if not self.resume:
+            return
+        path = resolve_checkpoint(self.resume, self.directory)
+        if path is None:
+            self.logger.warning("⚠️ No hay checkpoints para reanudar; la corrida inicia en MCS 0")
+            return
+        self.restore(path)
+
+    def step(self, mcs):
+        mcs += self.mcs_offset
+        if mcs > 0 and mcs % self.interval == 0:
+            self.save(mcs)
+        # CC3D vuelve a correr <Steps> completos: se corta en el último MCS de la corrida original
+        if self.mcs_offset and self.steps is not None and mcs >= self.steps - 1:
+            self.logger.info(f"🏁 MCS {mcs}: fin de la corrida original ({self.steps} pasos)", extra=LOG_LIFECYCLE)
+            self.stop_simulation()
+
+    def latest(self):
+        """Ruta del checkpoint más reciente (None si no hay)."""
+        return resolve_checkpoint('latest', self.directory)
+
+    def _total_steps(self):
+        """<Steps> del XML según el simulador (None si no se puede leer)."""
+        try:
+            return int(self.simulator.getNumSteps())
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    def _counter_owners(self):
+        for steppable in self.steppables:
+            yield steppable
+            yield from getattr(steppable, 'stages', ())
+
+    def _cell_voxels(self, cells):
+        """Vóxeles (n, 3) de las células y el índice de su dueña en `cells`."""
+        voxels, owners = [], []
+        for k, cell in enumerate(cells):
+            pixels = self.get_cell_pixel_list(cell)
+            if pixels is None:
+                return self._scan_lattice(cells)
+            for data in pixels:
+                voxels.append((data.pixel.x, data.pixel.y, data.pixel.z))
+                owners.append(k)
+        return np.array(voxels, dtype=np.int32).reshape(-1, 3), np.array(owners, dtype=np.int32)
+
+    def _scan_lattice(self, cells):
+        """Respaldo sin PixelTracker: recorre toda la red (lento)."""
+        self.logger.warning("⚠️ PixelTracker no disponible: el checkpoint recorre toda la red")
+        index = {cell.id: k for k, cell in enumerate(cells)}
+        voxels, owners = [], []
+        for x in range(self.dim.x):
+            for y in range(self.dim.y):
+                for z in range(self.dim.z):
+                    cell = self.cell_field[x, y, z]
+                    if cell is not None:
+                        voxels.append((x, y, z))
+                        owners.append(index[cell.id])
+        return np.array(voxels, dtype=np.int32).reshape(-1, 3), np.array(owners, dtype=np.int32)
+
+    def _read_field(self, name):
+        return read_field_array(getattr(self.field, name, None), self.dim)
+
+    def _write_field(self, name, values):
+        field = getattr(self.field, name, None)
+        if field is None:
+            self.logger.warning(f"⚠️ Campo '{name}' del checkpoint no existe en la simulación")
+            return
+        array = np.asarray(field)
+        if array.shape == values.shape and array.dtype != object and array.flags.writeable:
+            array[...] = values
+            return
+        for (x, y, z), value in np.ndenumerate(values):
+            field[x, y, z] = float(value)
+
+    def save(self, mcs):
+        """Escribe el checkpoint de `mcs` (archivo temporal + rename)."""
+        t0 = time.perf_counter()
+        # El log de crecimiento queda en disco hasta este MCS para poder continuarlo al reanudar
+        for owner in self._counter_owners():
+            sink = getattr(owner, 'growth_sink', None)
+            if sink is not None:
+                sink.flush()
+        cells = [cell for cell in self.cell_list if cell is not None]
+        ids = np.array([cell.id for cell in cells], dtype=np.int64)
+        attributes = np.array([(cell.type, cell.targetVolume, cell.lambdaVolume) for cell in cells],
+                              dtype=np.float64).reshape(-1, 3)
+        voxels, owners = self._cell_voxels(cells)
+
+        arrays = {
+            'ids': ids,
+            'types': attributes[:, 0].astype(np.int16),
+            'target_volume': attributes[:, 1],
+            'lambda_volume': attributes[:, 2],
+            'voxels': voxels,
+            'owners': owners,
+        }
+
+        slots = self.state.slots(ids)
+        for name, column in self.state.columns.items():
+            arrays['column_' + name] = column[slots]
+
+        for name in CHECKPOINT_FIELDS:
+            values = self._read_field(name)
+            if values is not None:
+                arrays['field_' + name] = values
+
+        counters = {}
+        for owner in self._counter_owners():
+            saved = {attr: getattr(owner, attr) for attr in CHECKPOINT_COUNTERS if hasattr(owner, attr)}
+            if saved:
+                counters[type(owner).__name__] = saved
+        rng = RandomStreams()
+        meta = {'mcs': mcs, 'seed': str(rng.run_seed), 'rng': rng.get_state(), 'counters': counters}
+        arrays['meta'] = np.array(json.dumps(meta))
+
+        name = os.path.join("checkpoints", f"checkpoint_mcs_{mcs:06d}.npz")
+        path = RunOutput().path(name)
+        atomic_write(path, lambda f: np.savez_compressed(f, **arrays), mode='wb')
+        RunOutput().register(name, cells=len(cells), voxels=len(voxels))
+        self._prune()
+
+        self.logger.info(f"💾 Checkpoint MCS {mcs}: {len(cells)} células, {len(voxels)} vóxeles "
+                         f"({os.path.getsize(path) / 1e6:.1f} MB, {time.perf_counter() - t0:.2f} s)", extra=LOG_LIFECYCLE)
+        return path
+
+    def _prune(self):
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith("checkpoint_mcs_") and name.endswith(".npz"))
+        for name in names[:-self.keep] if self.keep else ():
+            os.remove(os.path.join(self.directory, name))
+            RunOutput().unregister(os.path.join("checkpoints", name))
+
+    def restore(self, path):
+        """Reconstruye red, células, contadores, RNG y campos desde un checkpoint."""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        meta = json.loads(str(arrays['meta']))
+
+        removed = [cell for cell in self.cell_list if cell is not None]
+        lifecycle = CellLifecycleRegistry()
+        for cell in removed:
+            cell_id = cell.id
+            self.delete_cell(cell)
+            lifecycle.on_removed(cell_id)
+            self.state.release(cell_id)
+
+        cells = []
+        for cell_type, target, lam in zip(arrays['types'].tolist(), arrays['target_volume'].tolist(),
+                                          arrays['lambda_volume'].tolist()):
+            cell = self.new_cell(cell_type)
+            cell.targetVolume = target
+            cell.lambdaVolume = lam
+            cells.append(cell)
+        for (x, y, z), owner in zip(arrays['voxels'].tolist(), arrays['owners'].tolist()):
+            self.cell_field[x, y, z] = cells[owner]
+
+        # Estado por célula: los ids nuevos reciben las filas de los ids guardados
+        slots = self.state.slots(np.array([cell.id for cell in cells], dtype=np.int64))
+        for key, values in arrays.items():
+            name = key[len('column_'):]
+            if key.startswith('column_') and name in self.state.columns:
+                self.state.columns[name][slots] = values
+
+        for key, values in arrays.items():
+            if key.startswith('field_'):
+                self._write_field(key[len('field_'):], values)
+
+        for owner in self._counter_owners():
+            for attr, value in meta['counters'].get(type(owner).__name__, {}).items():
+                setattr(owner, attr, value)
+        RandomStreams().set_state(meta['rng'])
+
+        # El snapshot se reconstruye con las células nuevas en el próximo MCS
+        MicroenvironmentSnapshot().mcs = None
+        self.mcs_offset = meta['mcs'] + 1
+        RunOutput().mcs_offset = self.mcs_offset
+        if self.steps is None:
+            self.steps = self._total_steps()
+        for steppable in self.steppables:
+            steppable.step = self._shifted(steppable.step)
+
+        self.logger.info(f"♻️ Reanudando desde {path}: MCS {meta['mcs']}, {len(cells)} células, "
+                         f"semilla original {meta['seed']}", extra=LOG_LIFECYCLE)
+
+    def _shifted(self, method):
+        def shifted_step(mcs):
+            return method(mcs + self.mcs_offset)
+        return shifted_step
+
+# ------------- SNAPSHOTS DE LA RED -------------
+
+def lattice_cadence_from_env():
+    """Lee SBA_LATTICE_SNAPSHOTS: "1" da LATTICE_SNAPSHOT_CADENCE y "o2=10,cell_type=50" una cadencia propia."""
+    spec = os.environ.get(LATTICE_SNAPSHOT_ENV, '').strip()
+    if spec in ('', '0'):
+        return {}
+    if spec == '1':
+        return dict(LATTICE_SNAPSHOT_CADENCE)
+    cadence = {}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, _, value = item.partition('=')
+        cadence[name.strip()] = max(1, int(value))
+    return cadence
+
+class LatticeSnapshotSteppable(SteppableBasePy):
+    """
+    Guarda la red de tipos celulares, la red de ids de célula y los campos
+    químicos seleccionados, cada uno con su propia cadencia (MCS entre
+    snapshots), en un contenedor comprimido por bloques:
+
+    - hdf5: results/lattice_snapshots.h5 con un grupo por red, dataset
+      `data` (n, x, y, z) de un bloque por snapshot (gzip + shuffle) y
+      dataset `mcs` (n,).
+    - npz: results/lattice_snapshots/<red>/mcs_NNNNNN.npz más un index.json.
+
+    Los campos se guardan en float32, los tipos en uint8 y los ids en uint32.
+    Al reanudar desde un checkpoint se reescriben los snapshots posteriores
+    al MCS restaurado.
+    """
+    LABELS = {'cell_type': np.uint8, 'cell_id': np.uint32}
+    FORMATS = ('hdf5', 'npz')
+
+    def __init__(self, frequency=1, cadence=None, fmt=LATTICE_SNAPSHOT_FORMAT, compression_level=4):
+        super().__init__(frequency)
+        self.logger = LoggerConfig().get_logger('snapshots')
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Formato de snapshots de la red no soportado: {fmt}")
+        if fmt == 'hdf5':
+            try:
+                import h5py  # noqa: F401
+            except ImportError:
+                self.logger.warning("⚠️ h5py no disponible: los snapshots de la red se guardarán como npz")
+                fmt = 'npz'
+
+        if cadence is None:
+            cadence = lattice_cadence_from_env() or LATTICE_SNAPSHOT_CADENCE
+        self.cadence = {name: max(1, int(every)) for name, every in cadence.items()}
+        self.fmt = fmt
+        self.compression_level = compression_level
+        self.name = 'lattice_snapshots.h5' if fmt == 'hdf5' else 'lattice_snapshots'
+        self.path = RunOutput().path(self.name)
+        self.written = 0
+        self._file = None
+
+    @staticmethod
+    def enabled():
+        return os.environ.get(LATTICE_SNAPSHOT_ENV, '').strip() not in ('', '0')
+
+    def _dtype(self, name):
+        return self.LABELS.get(name, np.float32)
+
+    @property
+    def shape(self):
+        return (self.dim.x, self.dim.y, self.dim.z)
+
+    def start(self):
+        for name in list(self.cadence):
+            if name not in self.LABELS and getattr(self.field, name, None) is None:
+                self.logger.warning(f"⚠️ Campo '{name}' no existe; se omite de los snapshots de la red")
+                del self.cadence[name]
+
+        if self.fmt == 'hdf5':
+            import h5py
+
+            partial_path = self.path + '.partial'
+            if os.path.exists(self.path):
+                os.replace(self.path, partial_path)
+            self._file = h5py.File(partial_path, 'a')
+            self._file.attrs['axes'] = 'xyz'
+            for name in self.cadence:
+                group = self._file.require_group(name)
+                group.attrs['every'] = self.cadence[name]
+                if 'data' not in group:
+                    group.create_dataset('data', shape=(0, *self.shape), maxshape=(None, *self.shape),
+                                         dtype=self._dtype(name), chunks=(1, *self.shape), compression='gzip',
+                                         compression_opts=self.compression_level, shuffle=True)
+                    group.create_dataset('mcs', shape=(0,), maxshape=(None,), dtype=np.int32)
+        else:
+            os.makedirs(self.path, exist_ok=True)
+
+        cadence = ", ".join(f"{name}={every}" for name, every in self.cadence.items())
+        self.logger.info(f"✅ Snapshots de la red ({self.fmt}) en {self.path}: {cadence}", extra=LOG_LIFECYCLE)
+
+    def step(self, mcs):
+        due = [name for name, every in self.cadence.items() if mcs % every == 0]
+        if not due:
+            return
+
+        t0 = time.perf_counter()
+        ids = lut = None
+        if 'cell_id' in due or 'cell_type' in due:
+            ids, lut = self._label_lattice()
+        for name in due:
+            if name == 'cell_id':
+                array = ids
+            elif name == 'cell_type':
+                array = lut[ids]
+            else:
+                array = read_field_array(getattr(self.field, name), self.dim, dtype=np.float32)
+            self._write(name, mcs, array.astype(self._dtype(name), copy=False))
+        self.logger.debug(f"📸 MCS {mcs}: {', '.join(due)} ({time.perf_counter() - t0:.3f} s)", extra=LOG_METRICS)
+
+    def _label_lattice(self):
+        """Red de ids (x, y, z) y tabla id → tipo con la que se deriva la red de tipos."""
+        cells = [cell for cell in self.cell_list if cell is not None]
+        lut = np.zeros(max((cell.id for cell in cells), default=0) + 1, dtype=np.uint8)
+        ids = np.zeros(self.shape, dtype=np.uint32)
+        for cell in cells:
+            lut[cell.id] = cell.type
+            pixels = self.get_cell_pixel_list(cell)
+            if pixels is None:
+                return self._scan_lattice(ids), lut
+            voxels = np.array([(data.pixel.x, data.pixel.y, data.pixel.z) for data in pixels], dtype=np.intp).reshape(-1, 3)
+            ids[voxels[:, 0], voxels[:, 1], voxels[:, 2]] = cell.id
+        return ids, lut
+
+    def _scan_lattice(self, ids):
+        """Respaldo sin PixelTracker: recorre toda la red (lento)."""
+        self.logger.warning("⚠️ PixelTracker no disponible: el snapshot recorre toda la red")
+        ids[...] = 0
+        for x in range(self.dim.x):
+            for y in range(self.dim.y):
+                for z in range(self.dim.z):
+                    cell = self.cell_field[x, y, z]
+                    if cell is not None:
+                        ids[x, y, z] = cell.id
+        return ids
+
+    def _write(self, name, mcs, array):
+        if self.fmt == 'hdf5':
+            group = self._file[name]
+            # Al reanudar se descartan los snapshots posteriores al checkpoint
+            n = int(np.searchsorted(group['mcs'][:], mcs))
+            group['data'].resize(n + 1, axis=0)
+            group['mcs'].resize(n + 1, axis=0)
+            group['data'][n] = array
+            group['mcs'][n] = mcs
+        else:
+            path = os.path.join(self.path, name, f"mcs_{mcs:06d}.npz")
+            atomic_write(path, lambda f: np.savez_compressed(f, data=array), mode='wb')
+        self.written += 1
+
+    def index(self):
+        """Redes guardadas: dtype, cadencia y MCS de cada snapshot."""
+        index = {}
+        for name, every in self.cadence.items():
+            if self.fmt == 'hdf5':
+                frames = self._file[name]['mcs'][:].tolist()
+            else:
+                directory = os.path.join(self.path, name)
+                names = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+                frames = [int(entry[4:-4]) for entry in names if entry.startswith('mcs_') and entry.endswith('.npz')]
+            index[name] = {'dtype': np.dtype(self._dtype(name)).name, 'every': every, 'mcs': frames}
+        return index
+
+    def finish(self):
+        if self.fmt == 'hdf5' and self._file is None:
+            return
+        output = RunOutput()
+        index = self.index()
+        frames = sum(len(entry['mcs']) for entry in index.values())
+        if self.fmt == 'hdf5':
+            self._file.close()
+            self._file = None
+            os.replace(self.path + '.partial', self.path)
+        else:
+            output.write_json(os.path.join(self.name, 'index.json'), {'axes': 'xyz', 'shape': list(self.shape), 'fields': index})
+        output.register(self.name, rows=frames, format=self.fmt)
+        self.logger.info(f"📁 {frames} snapshots de la red en {self.path} ({self.written} en esta corrida)", extra=LOG_LIFECYCLE)
+
+# ------------- INSTRUMENTACIÓN -------------
+
+def process_rss_mb():
+    """Memoria residente actual del proceso en MB (psutil, /proc o pico de getrusage)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+
+    try:
+        with open('/proc/self/statm') as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss está en KB en Linux y en bytes en macOS
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        return float('nan')
+
+class StepTimer:
+    """
+    Acumula el tiempo de pared de step() de cada steppable envuelto.
+    Con record=True guarda además cada llamada (start/step/finish) como evento.
+    """
+    def __init__(self, record=False):
+        self.names = []
+        self.totals = {}
+        self.calls = {}
+        self.record = record
+        self.events = []  # (steppable, fase, MCS, inicio (s), duración (s))
+        self.origin = time.perf_counter()
+
+    def wrap(self, steppable, name=None, phases=('step',)):
+        name = name or type(steppable).__name__
+        self.names.append(name)
+        self.totals[name] = 0.0
+        self.calls[name] = 0
+        for phase in phases:
+            setattr(steppable, phase, self._timed(name, phase, getattr(steppable, phase)))
+        return steppable
+
+    def _timed(self, name, phase, method):
+        if phase == 'step':
+            def timed_step(mcs):
+                t0 = time.perf_counter()
+                try:
+                    return method(mcs)
+                finally:
+                    duration = time.perf_counter() - t0
+                    self.totals[name] += duration
+                    self.calls[name] += 1
+                    if self.record:
+                        self.events.append((name, phase, mcs, t0 - self.origin, duration))
+            return timed_step
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                if self.record:
+                    self.events.append((name, phase, None, t0 - self.origin, time.perf_counter() - t0))
+        return timed
+
+    def drain(self):
+        """Devuelve {nombre: (segundos, llamadas)} desde la última lectura y reinicia."""
+        window = {name: (self.totals[name], self.calls[name]) for name in self.names}
+        for name in self.names:
+            self.totals[name] = 0.0
+            self.calls[name] = 0
+        return window
+
+class InstrumentationSteppable(SteppableBasePy):
+    """
+    Muestreo ligero de rendimiento: RSS del proceso, células vivas por tipo,
+    MCS por segundo y tiempo de pared por steppable, cada `interval` MCS, en
+    una serie temporal CSV. Los snapshots completos de tracemalloc solo se
+    toman si se piden con SBA_TRACEMALLOC=1 o con la señal SIGUSR1. Si es la
+    señal la que inicia tracemalloc, el snapshot solo ve las asignaciones
+    posteriores y se guarda como parcial (tracemalloc_parcial_mcs_N.txt).
+    """
+    def __init__(self, frequency=1, steppables=(), interval=INSTRUMENTATION_INTERVAL):
+        super().__init__(frequency)
+        self.logger = LoggerConfig().get_logger('instrumentation')
+        self.snapshot = MicroenvironmentSnapshot()
+        self.interval = max(1, int(interval))
+        self.timer = StepTimer()
+        for steppable in steppables:
+            self.timer.wrap(steppable)
+        self._writer = None
+        self._start_time = None
+        self._last_time = None
+        self._last_mcs = None
+        self.tracemalloc_always = os.environ.get(TRACEMALLOC_ENV, '') == '1'
+        self.tracemalloc_requested = False
+        self.tracemalloc_since_mcs = None   # MCS en que SIGUSR1 inició tracemalloc (None: desde el inicio)
+
+    def start(self):
+        if self.tracemalloc_always and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        # SIGUSR1 pide un snapshot de tracemalloc en la siguiente muestra
+        sigusr1 = getattr(signal, 'SIGUSR1', None)
+        if sigusr1 is not None:
+            try:
+                signal.signal(sigusr1, self._request_tracemalloc)
+            except ValueError:
+                self.logger.warning("⚠️ SIGUSR1 no disponible fuera del hilo principal")
+
+        header = ["MCS", "Elapsed_s", "RSS_MB", "MCS_per_s", "PROL", "RESE", "INVA", "NECR"]
+        header += [f"{name}_ms" for name in self.timer.names]
+        self._writer = RunOutput().writer("instrumentation.csv", header, resume=True)
+        self._start_time = time.perf_counter()
+        self._last_time = self._start_time
+        self._last_mcs = None
+        self.logger.info(f"✅ Instrumentación cada {self.interval} MCS en {self._writer.path}", extra=LOG_LIFECYCLE)
+
+    def _request_tracemalloc(self, signum, frame):
+        self.tracemalloc_requested = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.tracemalloc_since_mcs = self._last_mcs if self._last_mcs is not None else 0
+
+    def step(self, mcs):
+        if self._writer is None or mcs % self.interval != 0:
+            return
+
+        now = time.perf_counter()
+        elapsed = now - self._last_time
+        steps = mcs - self._last_mcs if self._last_mcs is not None else 1
+        mcs_per_s = steps / elapsed if elapsed > 0 else float('nan')
+        self._last_time = now
+        self._last_mcs = mcs
+
+        types = self.snapshot.types if self.snapshot.mcs == mcs else np.array([cell.type for cell in self.cell_list], dtype=np.int16)
+        counts = np.bincount(types, minlength=CELL_TYPE_NECR + 1)
+
+        row = [mcs, round(now - self._start_time, 3), round(process_rss_mb(), 1), round(mcs_per_s, 3)]
+        row += counts[CELL_TYPE_PROL:CELL_TYPE_NECR + 1].tolist()
+        for name, (seconds, calls) in self.timer.drain().items():
+            row.append(round(1000.0 * seconds / calls, 3) if calls else 0.0)
+        self._writer.writerow(row)
+        self._writer.flush()
+
+        if self.tracemalloc_requested or (self.tracemalloc_always and tracemalloc.is_tracing()):
+            self.tracemalloc_requested = False
+            self.dump_tracemalloc(mcs)
+
+    def dump_tracemalloc(self, mcs, limit=25):
+        """Snapshot completo de tracemalloc (caro): solo bajo petición explícita."""
+        snapshot = tracemalloc.take_snapshot()
+        stats = snapshot.statistics('lineno')
+        total_mb = sum(stat.size for stat in stats) / (1024 * 1024)
+        if self.tracemalloc_since_mcs is None:
+            header, name = f"MCS {mcs}: {total_mb:.2f} MB trazados", f"tracemalloc_mcs_{mcs}.txt"
+        else:
+            # tracemalloc empezó con SIGUSR1: no es el heap completo
+            header = (f"MCS {mcs}: {total_mb:.2f} MB trazados (PARCIAL: solo asignaciones posteriores a "
+                      f"SIGUSR1, después del MCS {self.tracemalloc_since_mcs}; use SBA_TRACEMALLOC=1 para el heap completo)")
+            name = f"tracemalloc_parcial_mcs_{mcs}.txt"
+        lines = [header] + [str(stat) for stat in stats[:limit]]
+        path = RunOutput().write_text(name, "\n".join(lines) + "\n")
+        kind = "" if self.tracemalloc_since_mcs is None else f" parcial (desde MCS {self.tracemalloc_since_mcs})"
+        self.logger.info("🧠 Snapshot tracemalloc%s MCS %d: %.2f MB (%s)", kind, mcs, total_mb, path, extra=LOG_METRICS)
+
+    def finish(self):
+        if self._writer is not None:
+            self._writer.close()
+            self.logger.info(f"📁 Serie de instrumentación guardada en {self._writer.path}", extra=LOG_LIFECYCLE)
+
+# ------------- RECOLECCIÓN DE BASURA -------------
+
+class GCManager:
+    """
+    Política única de recolección de basura para todos los steppables.
+
+    Congela (gc.freeze) los objetos creados durante start(), ajusta los
+    umbrales generacionales y ejecuta como máximo una recolección completa
+    por MCS programado. Registra la duración de todas las pausas del GC.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(GCManager, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self.logger = LoggerConfig().get_logger('gc')
+        self.interval = GC_INTERVAL
+        self.last_collect_mcs = None
+        self.frozen = False
+        self._pause_start = None
+        # Pausas por generación: [número, total (s), máximo (s)]
+        self.pauses = {generation: [0, 0.0, 0.0] for generation in range(3)}
+        gc.callbacks.append(self._on_gc)
+
+    def _on_gc(self, phase, info):
+        if phase == 'start':
+            self._pause_start = time.perf_counter()
+        elif self._pause_start is not None:
+            duration = time.perf_counter() - self._pause_start
+            stats = self.pauses[info['generation']]
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+            self._pause_start = None
+
+    def configure(self, thresholds=GC_THRESHOLDS, interval=GC_INTERVAL):
+        gc.set_threshold(*thresholds)
+        self.interval = max(1, int(interval))
+
+    def freeze(self):
+        """Recolecta y saca de las generaciones los objetos de larga vida del setup."""
+        gc.collect()
+        gc.freeze()
+        self.frozen = True
+        self.logger.info("🧊 GC congelado tras start(): %d objetos permanentes", gc.get_freeze_count(), extra=LOG_LIFECYCLE)
+
+    def maybe_collect(self, mcs):
+        """Recolección completa si el MCS está programado y aún no se hizo en este MCS."""
+        if mcs % self.interval != 0 or mcs == self.last_collect_mcs:
+            return False
+        self.last_collect_mcs = mcs
+        gc.collect()
+        return True
+
+    def summary(self):
+        return {generation: {'count': count, 'total_ms': round(1000.0 * total, 3), 'max_ms': round(1000.0 * peak, 3)}
+                for generation, (count, total, peak) in self.pauses.items()}
+
+class GarbageCollectionSteppable(SteppableBasePy):
+    """
+    Aplica GCManager. Se registra después de CheckpointSteppable y
+    LatticeSnapshotSteppable (detrás solo van StepProfilerSteppable y
+    RunOutputSteppable, que no hacen nada en start()) para
+    congelar tras todos los start(), incluida la población restaurada de un
+    checkpoint, y recolectar al cierre del MCS.
+    """
+    def __init__(self, frequency=1, thresholds=GC_THRESHOLDS, interval=GC_INTERVAL):
+        super().__init__(frequency)
+        self.logger = LoggerConfig().get_logger('gc')
+        self.manager = GCManager()
+        self.manager.configure(thresholds, interval)
+
+    def start(self):
+        self.manager.freeze()
+
+    def step(self, mcs):
+        if self.manager.maybe_collect(mcs):
+            self.logger.info("🗑️ MCS %d: pausas de GC %s", mcs, self.manager.summary(), extra=LOG_METRICS)
+
+    def finish(self):
+        self.logger.info(f"🗑️ Resumen de pausas de GC por generación: {self.manager.summary()}", extra=LOG_LIFECYCLE)
+
+class StepProfilerSteppable(SteppableBasePy):
+    """
+    Perfilado opcional (SBA_PROFILE_STEPS=1) de start/step/finish de cada
+    steppable registrado. Al terminar exporta los eventos en CSV y como traza
+    de Chrome (chrome://tracing, Perfetto) y resume percentiles de step().
+    Las etapas de FusedCellUpdateSteppable se miden además por separado.
+    Debe registrarse al final (antes de RunOutputSteppable), con la lista
+    completa de steppables registrados, para que su finish() mida los de los
+    demás.
+    """
+    def __init__(self, frequency=1, steppables=()):
+        super().__init__(frequency)
+        self.logger = LoggerConfig().get_logger('profiler')
+        self.timer = StepTimer(record=True)
+        for steppable in steppables:
+            self.timer.wrap(steppable, phases=('start', 'step', 'finish'))
+            for stage in getattr(steppable, 'stages', ()):
+                self.timer.wrap(stage, phases=('start', 'step', 'finish'))
+
+    @staticmethod
+    def enabled():
+        return os.environ.get(STEP_PROFILE_ENV, '') == '1'
+
+    def step(self, mcs):
+        pass
+
+    def summary(self):
+        """Percentiles de la duración de step() por steppable (ms)."""
+        durations = {}
+        for name, phase, mcs, start, duration in self.timer.events:
+            if phase == 'step':
+                durations.setdefault(name, []).append(duration)
+
+        rows = []
+        for name in self.timer.names:
+            values = 1000.0 * np.array(durations.get(name, []), dtype=np.float64)
+            if values.size == 0:
+                continue
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            rows.append({
+                'Steppable': name, 'Calls': int(values.size), 'Total_ms': round(float(values.sum()), 3),
+                'Mean_ms': round(float(values.mean()), 3), 'P50_ms': round(float(p50), 3),
+                'P90_ms': round(float(p90), 3), 'P99_ms': round(float(p99), 3), 'Max_ms': round(float(values.max()), 3),
+            })
+        return rows
+
+    def export_csv(self, name="step_timing.csv"):
+        writer = RunOutput().writer(name, ["Steppable", "Phase", "MCS", "Start_ms", "Duration_ms"])
+        for steppable, phase, mcs, start, duration in self.timer.events:
+            writer.writerow([steppable, phase, "" if mcs is None else mcs, round(1000.0 * start, 3), round(1000.0 * duration, 4)])
+        writer.close()
+
+    def export_chrome_trace(self, name="step_timing_trace.json"):
+        pid = os.getpid()
+        events = [{
+            'name': name, 'cat': phase, 'ph': 'X', 'pid': pid, 'tid': 0,
+            'ts': round(1e6 * start, 1), 'dur': round(1e6 * duration, 1),
+            'args': {} if mcs is None else {'mcs': mcs},
+        } for name, phase, mcs, start, duration in self.timer.events]
+        RunOutput().write_json(name, {'traceEvents': events, 'displayTimeUnit': 'ms'}, indent=None)
+
+    def finish(self):
+        try:
+            self.export_csv()
+            self.export_chrome_trace()
+
+            rows = self.summary()
+            fieldnames = ["Steppable", "Calls", "Total_ms", "Mean_ms", "P50_ms", "P90_ms", "P99_ms", "Max_ms"]
+            RunOutput().write_csv("step_timing_summary.csv", fieldnames, [[row[key] for key in fieldnames] for row in rows])
+            for row in rows:
+                self.logger.info(f"⏱️ {row['Steppable']}: p50={row['P50_ms']} ms, p90={row['P90_ms']} ms, p99={row['P99_ms']} ms, total={row['Total_ms']} ms", extra=LOG_LIFECYCLE)
+        except Exception as e:
+            self.logger.error(f"⚠️ Error exportando tiempos de steppables: {e}")
+
+# ------------- CIERRE DE LA CORRIDA -------------
+
+class RunOutputSteppable(SteppableBasePy):
+    """
+    Cierra RunOutput en finish(): renombra los .partial y marca el manifiesto
+    como completo. Se registra el último, después de StepProfilerSteppable,
+    para que los finish() de los demás escriban antes del cierre.
+    """
+    def step(self, mcs):
+        pass
+
+    def finish(self):
+        RunOutput().close()
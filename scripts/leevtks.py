@@ -1,15 +1,19 @@
 import os
 import glob
+import multiprocessing
+from collections import deque
+from functools import partial
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # solo se guardan imágenes; también en los procesos del pool
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy import stats
-from scipy.spatial import distance, ConvexHull
-from sklearn.cluster import DBSCAN
+from scipy import ndimage
+from scipy.spatial import ConvexHull
 import vtk
 from vtk.util.numpy_support import vtk_to_numpy
-from mpl_toolkits.mplot3d import Axes3D
-from matplotlib.animation import FuncAnimation
+from matplotlib.colors import ListedColormap
+from matplotlib.patches import Patch
 
 # Configuración de estilo de matplotlib
 plt.style.use('default')  # Usar estilo por defecto en lugar de seaborn
@@ -22,13 +26,115 @@ plt.rcParams.update({
     'legend.edgecolor': 'black'
 })
 
+# Modo cuasi-2D: redes con z delgada (p. ej. Dimensions z="2") se colapsan en z
+# y se analizan con algoritmos 2D (etiquetado, envolventes y perímetros 2D).
+# Las magnitudes 2D van en columnas propias (AreaProyectada, Perimetro) y no
+# en "Area", que siempre es área de superficie 3D
+ESPESOR_MAXIMO_2D = 4   # capas en z hasta las que la red se trata como 2D
+MODO_2D = None          # None: detectar por dimensiones; True/False: forzar
+
+# Área de superficie: 'caras' (caras de vóxel expuestas, tiempo lineal) o
+# 'marching_cubes' (área de la malla, requiere scikit-image)
+METODO_AREA = 'caras'
+
+def es_cuasi_2d(dimensiones):
+    """Indica si la red (nx, ny, nz) debe analizarse en modo 2D."""
+    if MODO_2D is not None:
+        return MODO_2D
+    return dimensiones[2] <= ESPESOR_MAXIMO_2D
+
+def puntos_2d(mascara, origen, espaciado):
+    """Coordenadas (x, y) de los píxeles ocupados de una máscara (y, x)."""
+    ys, xs = np.nonzero(mascara)
+    return np.column_stack((origen[0] + espaciado[0] * xs, origen[1] + espaciado[1] * ys))
+
+def calcular_perimetro_2d(mascara, espaciado):
+    # Aristas de píxel entre ocupado y vacío (vecindad 4)
+    return calcular_area_superficie(mascara, espaciado[:2], metodo='caras')
+
+def calcular_compacidad_2d(puntos):
+    # Cociente isoperimétrico de la envolvente convexa 2D (1 para un círculo)
+    try:
+        hull = ConvexHull(puntos)
+        return 4 * np.pi * hull.volume / hull.area**2  # en 2D volume es el área y area el perímetro
+    except:
+        return np.nan
+
+def contar_clusters(mascara):
+    # Componentes conexas de al menos 2 vóxeles. En la red unitaria equivale a
+    # DBSCAN con eps=1.5 y min_samples=2: vecindad 8 en 2D, 18 en 3D
+    estructura = ndimage.generate_binary_structure(mascara.ndim, 2)
+    etiquetas, num = ndimage.label(mascara, structure=estructura)
+    tamanos = np.bincount(etiquetas.ravel())[1:]
+    return int(np.count_nonzero(tamanos >= 2))
+
+def analizar_vecindad_2d(tipos_zyx):
+    # Clusters por tipo de célula sobre la proyección en z
+    return {tipo: contar_clusters(np.any(tipos_zyx == tipo, axis=0)) for tipo in np.unique(tipos_zyx)}
+
+def morfologia_2d(tipos_zyx, tipo, origen, espaciado):
+    """Área y perímetro de la proyección en z, elongación y centroide de un tipo celular."""
+    ocupado = tipos_zyx == tipo
+    mascara = np.any(ocupado, axis=0)
+    puntos = puntos_2d(mascara, origen, espaciado)
+    capas = ocupado.sum(axis=(1, 2))
+    centroide = calcular_centroide(puntos) if len(puntos) else (np.nan, np.nan)
+    return {
+        "AreaProyectada": np.count_nonzero(mascara) * espaciado[0] * espaciado[1],
+        "Perimetro": calcular_perimetro_2d(mascara, espaciado),
+        "Elongacion": calcular_elongacion(puntos) if len(puntos) > 2 else np.nan,
+        "Centroide_X": centroide[0],
+        "Centroide_Y": centroide[1],
+        "Centroide_Z": origen[2] + espaciado[2] * np.dot(capas, np.arange(len(capas))) / capas.sum(),
+    }
+
 def calcular_centroide(puntos):
     return np.mean(puntos, axis=0)
 
-def calcular_area_superficie(puntos):
-    # Implementación básica de área superficial usando la envolvente convexa
-    hull = distance.pdist(puntos)
-    return np.sum(hull)
+def _areas_de_cara(espaciado, ndim):
+    # Área de una cara normal a cada eje de la red (z, y, x) / (y, x); en 2D es la longitud de la arista
+    lados = np.asarray(espaciado[:ndim], dtype=float)[::-1]
+    return [np.prod(np.delete(lados, eje)) for eje in range(ndim)]
+
+def calcular_area_superficie(mascara, espaciado=(1.0, 1.0, 1.0), metodo=None):
+    """
+    Área de la superficie de una máscara (z, y, x): caras de vóxel entre
+    ocupado y vacío, contadas con comparaciones vectorizadas entre vecinos
+    (tiempo lineal en la red). Con metodo='marching_cubes' se usa el área de
+    la malla de scikit-image, más cercana a la superficie suave. Sobre una
+    máscara (y, x) devuelve el perímetro.
+    """
+    metodo = metodo or METODO_AREA
+    if metodo == 'marching_cubes' and mascara.ndim == 3:
+        try:
+            from skimage.measure import marching_cubes, mesh_surface_area
+            vertices, caras, _, _ = marching_cubes(np.pad(mascara, 1).astype(np.float32), 0.5,
+                                                   spacing=tuple(np.asarray(espaciado, dtype=float)[::-1]))
+            return mesh_surface_area(vertices, caras)
+        except ImportError:
+            print("⚠️ scikit-image no disponible: el área se calcula con caras de vóxel")
+
+    borde = np.pad(mascara, 1).astype(np.int8)
+    return sum(area * np.count_nonzero(np.diff(borde, axis=eje))
+               for eje, area in enumerate(_areas_de_cara(espaciado, mascara.ndim)))
+
+def calcular_area_por_cluster(mascara, espaciado=(1.0, 1.0, 1.0)):
+    """
+    Vóxeles y área de superficie (perímetro en 2D) de cada componente conexa
+    de la máscara, con la misma vecindad que contar_clusters. Cada cara
+    expuesta se asigna a su cluster con np.bincount sobre las etiquetas.
+    """
+    etiquetas, num = ndimage.label(mascara, structure=ndimage.generate_binary_structure(mascara.ndim, 2))
+    voxeles = np.bincount(etiquetas.ravel(), minlength=num + 1)
+    areas = np.zeros(num + 1)
+    borde = np.pad(etiquetas, 1)
+    for eje, area in enumerate(_areas_de_cara(espaciado, mascara.ndim)):
+        vista = np.moveaxis(borde, eje, 0)
+        antes, despues = vista[:-1], vista[1:]
+        distinto = antes != despues
+        areas += area * (np.bincount(antes[distinto], minlength=num + 1) +
+                         np.bincount(despues[distinto], minlength=num + 1))
+    return voxeles[1:], areas[1:]
 
 def calcular_elongacion(puntos):
     # Cálculo de la elongación usando PCA
@@ -36,25 +142,14 @@ def calcular_elongacion(puntos):
     eigenvalues = np.linalg.eigvals(cov_matrix)
     return np.max(eigenvalues) / np.min(eigenvalues)
 
-def analizar_vecindad(celltypes, posiciones, radio=1.5):
-    # Análisis de vecindad usando DBSCAN
-    clustering = DBSCAN(eps=radio, min_samples=2).fit(posiciones)
-    labels = clustering.labels_
-    
-    # Contar clusters por tipo de célula
-    clusters_por_tipo = {}
-    for tipo in np.unique(celltypes):
-        mask = celltypes == tipo
-        clusters_tipo = labels[mask]
-        clusters_por_tipo[tipo] = len(np.unique(clusters_tipo[clusters_tipo != -1]))
-    
-    return clusters_por_tipo
+def analizar_vecindad(tipos_zyx):
+    # Clusters por tipo de célula sobre la red 3D (índices, sin nube de puntos)
+    return {tipo: contar_clusters(tipos_zyx == tipo) for tipo in np.unique(tipos_zyx)}
 
 def calcular_transiciones(estado_anterior, estado_actual):
-    transiciones = np.zeros((5, 5))  # 5 tipos de células (0-4)
-    for i in range(len(estado_anterior)):
-        transiciones[estado_anterior[i], estado_actual[i]] += 1
-    return transiciones
+    # 5 tipos de células (0-4); conteo vectorizado de pares (anterior, actual)
+    pares = estado_anterior.astype(np.intp) * 5 + estado_actual
+    return np.bincount(pares, minlength=25).reshape(5, 5).astype(float)
 
 def calcular_compacidad(puntos):
     # Cálculo de la compacidad usando la relación entre volumen y área superficial
@@ -77,7 +172,7 @@ def calcular_crecimiento(df_anterior, df_actual):
             tasas[tipo] = tasa
     return tasas
 
-def visualizar_3D(posiciones, celltypes, mcs, output_dir):
+def visualizar_3D(frame, mcs, output_dir):
     fig = plt.figure(figsize=(10, 8))
     ax = fig.add_subplot(111, projection='3d')
     
@@ -86,9 +181,9 @@ def visualizar_3D(posiciones, celltypes, mcs, output_dir):
     nombres = {1: 'PROL', 2: 'RESE', 3: 'INVA', 4: 'NECR'}
     
     for tipo in [1, 2, 3, 4]:
-        mask = celltypes == tipo
+        mask = frame.celltypes == tipo
         if np.any(mask):
-            puntos_tipo = posiciones[mask]
+            puntos_tipo = frame.coordenadas(mask)
             ax.scatter(puntos_tipo[:, 0], puntos_tipo[:, 1], puntos_tipo[:, 2],
                       c=colores[tipo], label=nombres[tipo], alpha=0.6)
     
@@ -102,210 +197,344 @@ def visualizar_3D(posiciones, celltypes, mcs, output_dir):
     plt.savefig(os.path.join(output_dir, f'distribucion_3d_mcs_{mcs}.png'))
     plt.close()
 
-# Configuración:
-carpeta_vtk = "/Users/mixcoha/CC3DWorkspace/steady_state_simulation_cc3d_04_21_2025_20_27_45_900265/LatticeData"
-
-# Verificar que la carpeta existe
-if not os.path.exists(carpeta_vtk):
-    print(f"❌ Error: La carpeta '{carpeta_vtk}' no existe")
-    exit(1)
+def visualizar_2D(tipos_zyx, mcs, output_dir):
+    # Proyección en z como imagen: en cada columna se muestra el tipo de mayor índice
+    colores = ['white', 'blue', 'green', 'red', 'purple']
+    nombres = {1: 'PROL', 2: 'RESE', 3: 'INVA', 4: 'NECR'}
+    proyeccion = tipos_zyx.max(axis=0)
 
-# Crear lista de archivos VTK ordenados
-archivos_vtk = sorted(glob.glob(os.path.join(carpeta_vtk, "*.vtk")))
+    fig, ax = plt.subplots(figsize=(10, 8))
+    ax.imshow(proyeccion, origin='lower', cmap=ListedColormap(colores), vmin=0, vmax=4, interpolation='nearest')
+    ax.legend(handles=[Patch(color=colores[tipo], label=nombre) for tipo, nombre in nombres.items()])
+    ax.set_xlabel('X')
+    ax.set_ylabel('Y')
+    ax.set_title(f'Distribución espacial (proyección en z) - MCS: {mcs}')
+    ax.grid(False)
 
-if not archivos_vtk:
-    print(f"❌ Error: No se encontraron archivos .vtk en la carpeta '{carpeta_vtk}'")
-    exit(1)
+    plt.savefig(os.path.join(output_dir, f'distribucion_2d_mcs_{mcs}.png'))
+    plt.close()
 
-print(f"📂 Encontrados {len(archivos_vtk)} archivos VTK")
+# Configuración:
+carpeta_vtk = "/Users/mixcoha/CC3DWorkspace/steady_state_simulation_cc3d_04_21_2025_20_27_45_900265/LatticeData"
 
-# Obtener la lista de campos disponibles del primer archivo
-reader = vtk.vtkStructuredPointsReader()
-reader.SetFileName(archivos_vtk[0])
-reader.Update()
-data = reader.GetOutput()
-point_data = data.GetPointData()
+# Procesamiento en paralelo: cada frame se analiza en un proceso del pool y
+# los resultados vuelven en orden para las partes que dependen del frame
+# anterior (transiciones y crecimiento)
+PROCESOS = None             # None: os.cpu_count(); 1: secuencial en el proceso principal
+FRAMES_EN_VUELO = None      # frames enviados y no consumidos (None: 2 × PROCESOS); acota la memoria
+FRAMES_POR_PROCESO = 20     # cada proceso se reinicia tras este número de frames (libera memoria de VTK/matplotlib)
 
-campos_disponibles = []
-for i in range(point_data.GetNumberOfArrays()):
-    nombre_campo = point_data.GetArrayName(i)
-    campos_disponibles.append(nombre_campo)
+def leer_vtk(archivo):
+    reader = vtk.vtkStructuredPointsReader()
+    reader.SetFileName(archivo)
+    reader.Update()
+    return reader.GetOutput()
 
-print("\n📊 Campos disponibles en los archivos VTK:")
-for campo in campos_disponibles:
-    print(f"  - {campo}")
+class FrameVTK:
+    """
+    Frame de LatticeData como arreglos NumPy (z, y, x) con su tipo original
+    (CellType como uint8). Las coordenadas no se materializan: se derivan de
+    origen y espaciado solo para los vóxeles que se piden (coordenadas()).
+    """
+    def __init__(self, archivo):
+        self._data = leer_vtk(archivo)  # los arreglos comparten memoria con VTK
+        point_data = self._data.GetPointData()
+        self.archivo = archivo
+        self.mcs = int(os.path.basename(archivo).split("_")[1].split(".")[0])
+        self.dimensiones = self._data.GetDimensions()
+        self.origen = np.array(self._data.GetOrigin())
+        self.espaciado = np.array(self._data.GetSpacing())
+        self.nombres = [point_data.GetArrayName(i) for i in range(point_data.GetNumberOfArrays())]
 
-# Inicializar DataFrames para diferentes análisis
-datos_morfologia = []
-datos_transiciones = []
-datos_vecindad = []
-datos_gradientes = []
-datos_compacidad = []
-datos_crecimiento = []
-datos_distribucion = []
+        forma = self.dimensiones[::-1]  # VTK recorre x más rápido
+        self.campos = {}
+        for nombre in self.nombres:
+            arreglo = point_data.GetArray(nombre)
+            if arreglo.GetNumberOfComponents() == 1:  # Solo campos escalares
+                self.campos[nombre] = vtk_to_numpy(arreglo).reshape(forma)
+        self.celltypes = self.campos.pop("CellType").astype(np.uint8)
 
-estado_anterior = None
+    @property
+    def cuasi_2d(self):
+        return es_cuasi_2d(self.dimensiones)
 
-# Crear directorio para visualizaciones 3D
-output_3d_dir = os.path.join(carpeta_vtk, "visualizaciones_3d")
-os.makedirs(output_3d_dir, exist_ok=True)
+    def coordenadas(self, mascara):
+        """Coordenadas (x, y, z) de los vóxeles de una máscara (z, y, x)."""
+        z, y, x = np.nonzero(mascara)
+        return self.origen + self.espaciado * np.column_stack((x, y, z))
 
-for archivo in archivos_vtk:
+def analizar_frame(archivo, campos_disponibles, output_3d_dir):
+    """
+    Análisis independiente de un frame (morfología, vecindad, gradientes,
+    compacidad y visualización). Devuelve las filas de cada análisis y los
+    tipos por vóxel (uint8) para la reducción ordenada.
+    """
     try:
-        reader = vtk.vtkStructuredPointsReader()
-        reader.SetFileName(archivo)
-        reader.Update()
-
-        data = reader.GetOutput()
-        point_data = data.GetPointData()
-        
-        # Obtener MCS del nombre del archivo
-        mcs = int(os.path.basename(archivo).split("_")[1].split(".")[0])
-        
-        # Obtener coordenadas y tipos de células
-        celltypes = vtk_to_numpy(point_data.GetArray("CellType"))
-        posiciones = np.array([data.GetPoint(i) for i in range(data.GetNumberOfPoints())])
-        
+        frame = FrameVTK(archivo)
+        mcs = frame.mcs
+        tipos_zyx = frame.celltypes
+        origen, espaciado = frame.origen, frame.espaciado
+        modo_2d = frame.cuasi_2d
+
+        resultado = {"archivo": archivo, "MCS": mcs, "celltypes": tipos_zyx.ravel(),
+                     "morfologia": [], "vecindad": [], "clusters": [], "gradientes": [], "compacidad": []}
+
         # Análisis morfológico
         for tipo in [1, 2, 3, 4]:  # Tipos de células
-            mask = celltypes == tipo
+            mask = tipos_zyx == tipo
             if np.any(mask):
-                puntos_tipo = posiciones[mask]
                 morfologia = {
                     "MCS": mcs,
                     "Tipo": tipo,
                     "Numero": np.sum(mask),
-                    "Area": calcular_area_superficie(puntos_tipo),
-                    "Elongacion": calcular_elongacion(puntos_tipo),
-                    "Centroide_X": calcular_centroide(puntos_tipo)[0],
-                    "Centroide_Y": calcular_centroide(puntos_tipo)[1],
-                    "Centroide_Z": calcular_centroide(puntos_tipo)[2]
                 }
-                datos_morfologia.append(morfologia)
-        
-        # Análisis de transiciones
-        if estado_anterior is not None:
-            transiciones = calcular_transiciones(estado_anterior, celltypes)
-            for i in range(5):
-                for j in range(5):
-                    if transiciones[i,j] > 0:
-                        datos_transiciones.append({
-                            "MCS": mcs,
-                            "De": i,
-                            "A": j,
-                            "Cantidad": transiciones[i,j]
-                        })
-        estado_anterior = celltypes
-        
+                if modo_2d:
+                    morfologia.update(morfologia_2d(tipos_zyx, tipo, origen, espaciado))
+                else:
+                    puntos_tipo = frame.coordenadas(mask)
+                    centroide = calcular_centroide(puntos_tipo)
+                    morfologia.update({
+                        "Area": calcular_area_superficie(mask, espaciado),
+                        "Elongacion": calcular_elongacion(puntos_tipo),
+                        "Centroide_X": centroide[0],
+                        "Centroide_Y": centroide[1],
+                        "Centroide_Z": centroide[2]
+                    })
+                resultado["morfologia"].append(morfologia)
+
         # Análisis de vecindad
-        clusters = analizar_vecindad(celltypes, posiciones)
+        clusters = analizar_vecindad_2d(tipos_zyx) if modo_2d else analizar_vecindad(tipos_zyx)
         for tipo, num_clusters in clusters.items():
-            datos_vecindad.append({
+            resultado["vecindad"].append({
                 "MCS": mcs,
                 "Tipo": tipo,
                 "NumClusters": num_clusters
             })
-        
-        # Análisis de gradientes para campos químicos
-        for campo in campos_disponibles:
-            if campo != "CellType":
-                valores = vtk_to_numpy(point_data.GetArray(campo))
-                if len(valores.shape) == 1:  # Solo para campos escalares
-                    gradiente = np.gradient(valores.reshape(data.GetDimensions()))
-                    magnitud_gradiente = np.sqrt(sum(g**2 for g in gradiente))
-                    datos_gradientes.append({
+
+        # Superficie por cluster (perímetro sobre la proyección en modo 2D)
+        for tipo in [1, 2, 3, 4]:
+            mask = tipos_zyx == tipo
+            if np.any(mask):
+                if modo_2d:
+                    voxeles, areas = calcular_area_por_cluster(np.any(mask, axis=0), espaciado[:2])
+                else:
+                    voxeles, areas = calcular_area_por_cluster(mask, espaciado)
+                for cluster, (num_voxeles, area) in enumerate(zip(voxeles.tolist(), areas.tolist()), start=1):
+                    resultado["clusters"].append({
                         "MCS": mcs,
-                        "Campo": campo,
-                        "Gradiente_Medio": np.mean(magnitud_gradiente),
-                        "Gradiente_Max": np.max(magnitud_gradiente)
+                        "Tipo": tipo,
+                        "Cluster": cluster,
+                        "Voxeles": num_voxeles,
+                        "Perimetro" if modo_2d else "Area": area
                     })
-        
+
+        # Análisis de gradientes para campos químicos
+        for campo in campos_disponibles:
+            if campo in frame.campos:
+                valores = frame.campos[campo]
+                # En modo 2D: promedio en z y gradiente 2D sobre la proyección
+                gradiente = np.gradient(valores.mean(axis=0) if modo_2d else valores)
+                magnitud_gradiente = np.sqrt(sum(g**2 for g in gradiente))
+                resultado["gradientes"].append({
+                    "MCS": mcs,
+                    "Campo": campo,
+                    "Gradiente_Medio": np.mean(magnitud_gradiente),
+                    "Gradiente_Max": np.max(magnitud_gradiente)
+                })
+
         # Análisis de compacidad
         for tipo in [1, 2, 3, 4]:
-            mask = celltypes == tipo
+            mask = tipos_zyx == tipo
             if np.any(mask):
-                puntos_tipo = posiciones[mask]
-                compacidad = calcular_compacidad(puntos_tipo)
-                datos_compacidad.append({
+                if modo_2d:
+                    compacidad = calcular_compacidad_2d(puntos_2d(np.any(mask, axis=0), origen, espaciado))
+                else:
+                    compacidad = calcular_compacidad(frame.coordenadas(mask))
+                resultado["compacidad"].append({
                     "MCS": mcs,
                     "Tipo": tipo,
                     "Compacidad": compacidad
                 })
-        
-        # Análisis de crecimiento
+
+        # Visualización (imagen de la proyección en modo 2D)
+        if modo_2d:
+            visualizar_2D(tipos_zyx, mcs, output_3d_dir)
+        else:
+            visualizar_3D(frame, mcs, output_3d_dir)
+
+        return resultado
+    except Exception as e:
+        return {"archivo": archivo, "error": str(e)}
+
+def frames_en_orden(funcion, archivos, procesos=PROCESOS, en_vuelo=FRAMES_EN_VUELO):
+    """
+    Aplica `funcion` a cada archivo y entrega los resultados en el orden de
+    `archivos`. Con más de un proceso mantiene a lo sumo `en_vuelo` frames
+    enviados al pool y sin consumir, de modo que la memoria no crece con la
+    longitud de la serie.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1:
+        for archivo in archivos:
+            yield funcion(archivo)
+        return
+
+    en_vuelo = max(1, en_vuelo or 2 * procesos)
+    with multiprocessing.Pool(procesos, maxtasksperchild=FRAMES_POR_PROCESO) as pool:
+        pendientes = deque()
+        for archivo in archivos:
+            pendientes.append(pool.apply_async(funcion, (archivo,)))
+            if len(pendientes) >= en_vuelo:
+                yield pendientes.popleft().get()
+        while pendientes:
+            yield pendientes.popleft().get()
+
+def main():
+    # Verificar que la carpeta existe
+    if not os.path.exists(carpeta_vtk):
+        print(f"❌ Error: La carpeta '{carpeta_vtk}' no existe")
+        exit(1)
+
+    # Crear lista de archivos VTK ordenados
+    archivos_vtk = sorted(glob.glob(os.path.join(carpeta_vtk, "*.vtk")))
+
+    if not archivos_vtk:
+        print(f"❌ Error: No se encontraron archivos .vtk en la carpeta '{carpeta_vtk}'")
+        exit(1)
+
+    print(f"📂 Encontrados {len(archivos_vtk)} archivos VTK")
+
+    # Obtener la lista de campos disponibles del primer archivo
+    primero = FrameVTK(archivos_vtk[0])
+    campos_disponibles = primero.nombres
+
+    print("\n📊 Campos disponibles en los archivos VTK:")
+    for campo in campos_disponibles:
+        print(f"  - {campo}")
+
+    dimensiones_red = primero.dimensiones
+    print(f"\n📐 Red {dimensiones_red[0]}x{dimensiones_red[1]}x{dimensiones_red[2]}: análisis "
+          f"{'cuasi-2D (proyección en z)' if primero.cuasi_2d else '3D'}")
+    del primero
+    procesos = PROCESOS or os.cpu_count() or 1
+    print(f"⚙️ Procesando frames con {procesos} proceso(s)")
+
+    # Inicializar DataFrames para diferentes análisis
+    datos_morfologia = []
+    datos_transiciones = []
+    datos_vecindad = []
+    datos_clusters = []
+    datos_gradientes = []
+    datos_compacidad = []
+    datos_crecimiento = []
+
+    estado_anterior = None
+    morfologia_anterior = None
+
+    # Crear directorio para visualizaciones 3D
+    output_3d_dir = os.path.join(carpeta_vtk, "visualizaciones_3d")
+    os.makedirs(output_3d_dir, exist_ok=True)
+
+    analizar = partial(analizar_frame, campos_disponibles=campos_disponibles, output_3d_dir=output_3d_dir)
+    for resultado in frames_en_orden(analizar, archivos_vtk, procesos):
+        archivo = resultado["archivo"]
+        if "error" in resultado:
+            print(f"⚠️ Error procesando {archivo}: {resultado['error']}")
+            continue
+
+        mcs = resultado["MCS"]
+        celltypes = resultado["celltypes"]
+        datos_morfologia.extend(resultado["morfologia"])
+        datos_vecindad.extend(resultado["vecindad"])
+        datos_clusters.extend(resultado["clusters"])
+        datos_gradientes.extend(resultado["gradientes"])
+        datos_compacidad.extend(resultado["compacidad"])
+
+        # Reducción ordenada: análisis de transiciones respecto al frame anterior
         if estado_anterior is not None:
-            tasas_crecimiento = calcular_crecimiento(
-                pd.DataFrame(datos_morfologia[-4:]),  # Últimos datos de morfología
-                pd.DataFrame([m for m in datos_morfologia if m["MCS"] == mcs])
-            )
+            transiciones = calcular_transiciones(estado_anterior, celltypes)
+            for i in range(5):
+                for j in range(5):
+                    if transiciones[i,j] > 0:
+                        datos_transiciones.append({
+                            "MCS": mcs,
+                            "De": i,
+                            "A": j,
+                            "Cantidad": transiciones[i,j]
+                        })
+        estado_anterior = celltypes
+
+        # Reducción ordenada: análisis de crecimiento respecto al frame anterior
+        morfologia_actual = pd.DataFrame(resultado["morfologia"], columns=["MCS", "Tipo", "Numero"])
+        if morfologia_anterior is not None:
+            tasas_crecimiento = calcular_crecimiento(morfologia_anterior, morfologia_actual)
             for tipo, tasa in tasas_crecimiento.items():
                 datos_crecimiento.append({
                     "MCS": mcs,
                     "Tipo": tipo,
                     "Tasa_Crecimiento": tasa
                 })
-        
-        # Visualización 3D
-        visualizar_3D(posiciones, celltypes, mcs, output_3d_dir)
-        
+        morfologia_anterior = morfologia_actual
+
         print(f"✅ Procesado: {os.path.basename(archivo)}")
+
+    # Guardar todos los análisis
+    analisis = {
+        "morfologia": pd.DataFrame(datos_morfologia),
+        "transiciones": pd.DataFrame(datos_transiciones),
+        "vecindad": pd.DataFrame(datos_vecindad),
+        "clusters": pd.DataFrame(datos_clusters),
+        "gradientes": pd.DataFrame(datos_gradientes),
+        "compacidad": pd.DataFrame(datos_compacidad),
+        "crecimiento": pd.DataFrame(datos_crecimiento)
+    }
+
+    for nombre, df in analisis.items():
+        if not df.empty:
+            output_csv = os.path.join(carpeta_vtk, f"analisis_{nombre}.csv")
+            df.to_csv(output_csv, index=False)
+            print(f"✅ CSV guardado para {nombre}: {output_csv}")
+
+    # Generar gráficos adicionales
+    try:
+        # Gráfico de compacidad
+        if not analisis["compacidad"].empty:
+            plt.figure()
+            for tipo in [1, 2, 3, 4]:
+                df_tipo = analisis["compacidad"][analisis["compacidad"]["Tipo"] == tipo]
+                if not df_tipo.empty:
+                    plt.plot(df_tipo["MCS"], df_tipo["Compacidad"], 
+                            label=f"Tipo {tipo}", marker='o')
+            plt.xlabel("MCS")
+            plt.ylabel("Índice de Compacidad")
+            plt.title("Evolución de la Compacidad por Tipo de Célula")
+            plt.legend()
+            plt.grid(True)
+            plt.tight_layout()
+            plt.savefig(os.path.join(carpeta_vtk, "compacidad_celular.png"))
+            plt.close()
+
+        # Gráfico de tasas de crecimiento
+        if not analisis["crecimiento"].empty:
+            plt.figure()
+            for tipo in [1, 2, 3, 4]:
+                df_tipo = analisis["crecimiento"][analisis["crecimiento"]["Tipo"] == tipo]
+                if not df_tipo.empty:
+                    plt.plot(df_tipo["MCS"], df_tipo["Tasa_Crecimiento"], 
+                            label=f"Tipo {tipo}", marker='o')
+            plt.xlabel("MCS")
+            plt.ylabel("Tasa de Crecimiento")
+            plt.title("Evolución de las Tasas de Crecimiento")
+            plt.legend()
+            plt.grid(True)
+            plt.tight_layout()
+            plt.savefig(os.path.join(carpeta_vtk, "tasas_crecimiento.png"))
+            plt.close()
+
     except Exception as e:
-        print(f"⚠️ Error procesando {archivo}: {str(e)}")
-        continue
-
-# Guardar todos los análisis
-analisis = {
-    "morfologia": pd.DataFrame(datos_morfologia),
-    "transiciones": pd.DataFrame(datos_transiciones),
-    "vecindad": pd.DataFrame(datos_vecindad),
-    "gradientes": pd.DataFrame(datos_gradientes),
-    "compacidad": pd.DataFrame(datos_compacidad),
-    "crecimiento": pd.DataFrame(datos_crecimiento)
-}
-
-for nombre, df in analisis.items():
-    if not df.empty:
-        output_csv = os.path.join(carpeta_vtk, f"analisis_{nombre}.csv")
-        df.to_csv(output_csv, index=False)
-        print(f"✅ CSV guardado para {nombre}: {output_csv}")
-
-# Generar gráficos adicionales
-try:
-    # Gráfico de compacidad
-    if not analisis["compacidad"].empty:
-        plt.figure()
-        for tipo in [1, 2, 3, 4]:
-            df_tipo = analisis["compacidad"][analisis["compacidad"]["Tipo"] == tipo]
-            if not df_tipo.empty:
-                plt.plot(df_tipo["MCS"], df_tipo["Compacidad"], 
-                        label=f"Tipo {tipo}", marker='o')
-        plt.xlabel("MCS")
-        plt.ylabel("Índice de Compacidad")
-        plt.title("Evolución de la Compacidad por Tipo de Célula")
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
-        plt.savefig(os.path.join(carpeta_vtk, "compacidad_celular.png"))
-        plt.close()
-
-    # Gráfico de tasas de crecimiento
-    if not analisis["crecimiento"].empty:
-        plt.figure()
-        for tipo in [1, 2, 3, 4]:
-            df_tipo = analisis["crecimiento"][analisis["crecimiento"]["Tipo"] == tipo]
-            if not df_tipo.empty:
-                plt.plot(df_tipo["MCS"], df_tipo["Tasa_Crecimiento"], 
-                        label=f"Tipo {tipo}", marker='o')
-        plt.xlabel("MCS")
-        plt.ylabel("Tasa de Crecimiento")
-        plt.title("Evolución de las Tasas de Crecimiento")
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
-        plt.savefig(os.path.join(carpeta_vtk, "tasas_crecimiento.png"))
-        plt.close()
-
-except Exception as e:
-    print(f"⚠️ Error al generar gráficos: {str(e)}")
-
-print("\n✨ Análisis completado!")
\ No newline at end of file
+        print(f"⚠️ Error al generar gráficos: {str(e)}")
+
+    print("\n✨ Análisis completado!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Barrido de parámetros para la simulación steady_state.
+
+Expande una malla de parámetros (producto cartesiano × réplicas), lanza cada
+corrida como un proceso independiente y sin interfaz gráfica con su propio
+directorio de resultados, y registra el estado de cada una en un manifiesto
+(manifest.jsonl). Si el barrido se interrumpe, volver a ejecutar el mismo
+comando retoma solo las corridas que no terminaron correctamente.
+
+Archivo de barrido (JSON):
+    {
+        "base": "ruta/a/parameters.json",      (opcional)
+        "malla": {"MCS_PROL_TO_RESE": [10, 14, 20], "GROWTH_BASE_PROL": [0.2, 0.26]},
+        "replicas": 3,
+        "semilla": 12345
+    }
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import itertools
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_SCRIPT = REPO_ROOT / "projects_simulations" / "steady_state" / "Simulation" / "run_steady_state.py"
+DEFAULT_COMMAND = "{python} {script} --outdir {run_dir} --params {params} --seed {seed}"
+MANIFEST_NAME = "manifest.jsonl"
+
+def expandir_malla(barrido: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Expande la especificación del barrido en una lista ordenada de corridas.
+
+    Args:
+        barrido (Dict[str, Any]): Especificación leída del archivo de barrido
+
+    Returns:
+        List[Dict[str, Any]]: Corridas con id, parámetros (base + malla) y semilla
+    """
+    base = {}
+    if barrido.get("base"):
+        with open(barrido["base"]) as f:
+            base = json.load(f)
+
+    malla = barrido.get("malla", {})
+    nombres = sorted(malla)
+    combinaciones = list(itertools.product(*(malla[nombre] for nombre in nombres)))
+    replicas = int(barrido.get("replicas", 1))
+
+    total = len(combinaciones) * replicas
+    semillas = np.random.SeedSequence(barrido.get("semilla")).spawn(total)
+
+    corridas = []
+    for indice, (valores, replica) in enumerate(itertools.product(combinaciones, range(replicas))):
+        parametros = dict(base)
+        parametros.update(zip(nombres, valores))
+        corridas.append({
+            "id": f"run_{indice:04d}",
+            "replica": replica,
+            "variables": dict(zip(nombres, valores)),
+            "parametros": parametros,
+            "semilla": int(semillas[indice].generate_state(1)[0]),
+        })
+    return corridas
+
+def leer_manifiesto(directorio: Path) -> Dict[str, Dict[str, Any]]:
+    """Último registro de cada corrida en el manifiesto (vacío si no existe)."""
+    estado = {}
+    ruta = directorio / MANIFEST_NAME
+    if ruta.exists():
+        with open(ruta) as f:
+            for linea in f:
+                if linea.strip():
+                    registro = json.loads(linea)
+                    estado[registro["id"]] = registro
+    return estado
+
+def validar_comando(comando: str) -> None:
+    """
+    Falla antes de lanzar corridas si la plantilla no puede producir una
+    corrida válida: el lanzador no existe o los resultados no irían a {run_dir}.
+    """
+    if "{script}" in comando and not DEFAULT_SCRIPT.exists():
+        raise FileNotFoundError(f"No existe el lanzador de corridas {DEFAULT_SCRIPT}")
+    if "{run_dir}" not in comando:
+        raise ValueError("La plantilla del comando debe incluir {run_dir} para que cada corrida "
+                         "escriba en su propio directorio")
+
+def ejecutar_corrida(corrida: Dict[str, Any], directorio: Path, comando: str,
+                     timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Ejecuta una corrida en su propio directorio y devuelve su registro.
+
+    Args:
+        corrida (Dict[str, Any]): Corrida generada por expandir_malla
+        directorio (Path): Directorio raíz del barrido
+        comando (str): Plantilla del comando ({python}, {script}, {run_dir}, {params}, {seed})
+        timeout (float, optional): Segundos máximos por corrida
+
+    Returns:
+        Dict[str, Any]: Registro para el manifiesto
+    """
+    run_dir = directorio / corrida["id"]
+    run_dir.mkdir(parents=True, exist_ok=True)
+    params_path = run_dir / "parameters.json"
+    with open(params_path, "w") as f:
+        json.dump(corrida["parametros"], f, indent=2)
+
+    argumentos = shlex.split(comando.format(python=sys.executable, script=DEFAULT_SCRIPT, run_dir=run_dir,
+                                            params=params_path, seed=corrida["semilla"]))
+    env = dict(os.environ)
+    env.update({
+        "SBA_PARAMS": str(params_path),
+        "SBA_SEED": str(corrida["semilla"]),
+        "SBA_OUTPUT_DIR": str(run_dir / "results"),
+        "SBA_LOG_PROFILE": env.get("SBA_LOG_PROFILE", "quiet"),
+    })
+
+    inicio = time.time()
+    try:
+        with open(run_dir / "run.log", "w") as log:
+            proceso = subprocess.run(argumentos, cwd=run_dir, env=env, stdout=log,
+                                     stderr=subprocess.STDOUT, timeout=timeout)
+        estado = "ok" if proceso.returncode == 0 else "fallida"
+        codigo = proceso.returncode
+    except subprocess.TimeoutExpired:
+        estado, codigo = "timeout", None
+    except OSError as e:
+        estado, codigo = f"error: {e}", None
+
+    return {
+        "id": corrida["id"],
+        "estado": estado,
+        "codigo": codigo,
+        "segundos": round(time.time() - inicio, 2),
+        "semilla": corrida["semilla"],
+        "variables": corrida["variables"],
+        "directorio": str(run_dir),
+    }
+
+def ejecutar_barrido(archivo_barrido: str, directorio: str, procesos: Optional[int] = None,
+                     comando: str = DEFAULT_COMMAND, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Ejecuta (o retoma) un barrido completo con a lo sumo `procesos` corridas simultáneas.
+
+    Args:
+        archivo_barrido (str): Ruta al JSON del barrido
+        directorio (str): Directorio raíz de resultados del barrido
+        procesos (int, optional): Corridas simultáneas (default: número de núcleos)
+        comando (str): Plantilla del comando de cada corrida
+        timeout (float, optional): Segundos máximos por corrida
+
+    Returns:
+        List[Dict[str, Any]]: Registros de las corridas ejecutadas en esta invocación
+    """
+    validar_comando(comando)
+    with open(archivo_barrido) as f:
+        barrido = json.load(f)
+
+    directorio = Path(directorio).resolve()
+    directorio.mkdir(parents=True, exist_ok=True)
+    corridas = expandir_malla(barrido)
+    with open(directorio / "plan.json", "w") as f:
+        json.dump(corridas, f, indent=2)
+
+    previas = leer_manifiesto(directorio)
+    pendientes = [c for c in corridas if previas.get(c["id"], {}).get("estado") != "ok"]
+    print(f"🧪 {len(corridas)} corridas en el barrido, {len(corridas) - len(pendientes)} ya completas, "
+          f"{len(pendientes)} pendientes")
+
+    procesos = procesos or os.cpu_count() or 1
+    registros = []
+    with open(directorio / MANIFEST_NAME, "a") as manifiesto, ThreadPoolExecutor(max_workers=procesos) as pool:
+        futuros = {pool.submit(ejecutar_corrida, c, directorio, comando, timeout): c for c in pendientes}
+        for futuro in as_completed(futuros):
+            registro = futuro.result()
+            manifiesto.write(json.dumps(registro) + "\n")
+            manifiesto.flush()
+            registros.append(registro)
+            simbolo = "✔️" if registro["estado"] == "ok" else "❌"
+            print(f"{simbolo} {registro['id']} ({registro['estado']}, {registro['segundos']} s) {registro['variables']}")
+
+    fallidas = sum(r["estado"] != "ok" for r in registros)
+    print(f"Barrido terminado: {len(registros) - fallidas} correctas, {fallidas} con error")
+    return registros
+
+def main():
+    """Función principal para ejecutar el script desde la línea de comandos."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Barrido de parámetros de la simulación steady_state")
+    parser.add_argument("barrido", help="Archivo JSON con la malla de parámetros")
+    parser.add_argument("--salida", required=True, help="Directorio raíz de resultados del barrido")
+    parser.add_argument("--procesos", type=int, default=None,
+                        help="Corridas simultáneas (default: número de núcleos)")
+    parser.add_argument("--comando", default=DEFAULT_COMMAND,
+                        help=f"Plantilla del comando de cada corrida (default: '{DEFAULT_COMMAND}')")
+    parser.add_argument("--timeout", type=float, default=None, help="Segundos máximos por corrida")
+
+    args = parser.parse_args()
+    registros = ejecutar_barrido(args.barrido, args.salida, args.procesos, args.comando, args.timeout)
+    sys.exit(1 if any(r["estado"] != "ok" for r in registros) else 0)
+
+if __name__ == "__main__":
+    main()
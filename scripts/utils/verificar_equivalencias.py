@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Verificaciones de equivalencia de las optimizaciones de steady_state.
+
+Cada verificación ejecuta la versión optimizada y la de referencia sobre la
+misma población sintética, con una semilla fija, y compara los eventos que
+producen. No necesita una simulación de CompuCell3D en marcha, pero sí poder
+importar `cc3d` (se ejecuta con el Python de CompuCell3D).
+
+- mitosis: MitosisCandidateIndex frente al recorrido completo de cell_list;
+  compara los pares (MCS, id de célula) de cada división.
+- transiciones: MutationSteppable con PhenotypeTransitionEngine frente a la
+  implementación célula por célula, cada una con su generador y la misma
+  semilla; compara tipos, contadores, mutaciones por hipoxia y aleatorias
+  (y con ellas las extracciones del generador) y transiciones de cada MCS.
+
+Uso:
+    python scripts/utils/verificar_equivalencias.py --celulas 500 --mcs 400 --semilla 7
+    python scripts/utils/verificar_equivalencias.py --solo transiciones --rate 3
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Tuple
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+SIMULATION_DIR = REPO_ROOT / "projects_simulations" / "steady_state" / "Simulation"
+sys.path.insert(0, str(SIMULATION_DIR))
+
+import steady_state_simulationSteppables as sba  # noqa: E402
+
+VOLUME_NOISE = 3.0       # voxels: fluctuación del volumen real alrededor de su relajación
+VOLUME_RELAXATION = 0.1  # fracción de la diferencia con el volumen objetivo recuperada por MCS
+
+# Nichos (o2, glc, lac) de la población sintética de transiciones: óptimo,
+# estrés leve, estrés severo, viable (hipóxico) y lactato tóxico
+NICHES = np.array([
+    (180.0, 10.0, 2.0),
+    (100.0, 5.0, 6.0),
+    (8.0, 0.3, 15.0),
+    (190.0, 12.0, 2.0),
+    (60.0, 11.0, 25.0),
+])
+NICHE_NOISE = (25.0, 1.5, 1.5)  # fluctuación por MCS de cada concentración
+NICHE_CHANGE = 0.02             # probabilidad por MCS de que una célula cambie de nicho
+RANDOM_MUTATION_INTERVAL = 50   # MUTATION_INTERVAL de la verificación (el de la corrida es 500)
+
+def verificar_mitosis(celulas: int, mcs: int, semilla: int, ruido: float = VOLUME_NOISE,
+                      relajacion: float = VOLUME_RELAXATION) -> List[Tuple[int, int, str]]:
+    """
+    Hace crecer una población sintética y, en cada MCS, compara las células
+    que dividiría el índice de candidatas con las del recorrido completo.
+
+    El volumen objetivo crece hasta GROWTH_MAX_PER_MCS por MCS (como en
+    GrowthSteppable) y el volumen real lo sigue con una fluctuación acotada.
+    Las divisiones se aplican con el resultado del recorrido completo, así que
+    ambas versiones ven la misma población en cada MCS.
+
+    Args:
+        celulas (int): Células iniciales
+        mcs (int): MCS a simular
+        semilla (int): Semilla del generador
+        ruido (float): Fluctuación máxima del volumen real por MCS (voxels)
+        relajacion (float): Fracción de la diferencia con el volumen objetivo recuperada por MCS
+
+    Returns:
+        List[Tuple[int, int, str]]: Divisiones que no coinciden (MCS, id, versión que la omitió)
+    """
+    rng = np.random.default_rng(semilla)
+    state = sba.CellStateStore()
+    lifecycle = sba.CellLifecycleRegistry()
+    index = sba.MitosisCandidateIndex(state)
+    threshold = sba.MITOSIS_VOLUME_THRESHOLD
+
+    ids = np.arange(1, celulas + 1, dtype=np.int64)
+    target = rng.uniform(sba.INITIAL_TARGET_VOLUME, threshold, size=celulas)
+    volume = target + rng.uniform(-ruido, ruido, size=celulas)
+    next_id = celulas + 1
+
+    divisiones, diferencias = [], []
+    for step in range(mcs):
+        rate = rng.uniform(0.0, sba.GROWTH_MAX_PER_MCS, size=len(ids))
+        target += rate
+        volume += relajacion * (target - volume) + rng.uniform(-ruido, ruido, size=len(ids))
+        slots = state.slots(ids)
+        state.columns[sba.COL_TARGET_VOLUME][slots] = target
+        state.columns[sba.COL_GROWTH_RATE][slots] = rate
+
+        full = volume > threshold
+        selected = index.select(slots, step)
+        index.observe(slots[selected], volume[selected], step)
+        indexed = np.zeros(len(ids), dtype=bool)
+        indexed[selected] = volume[selected] > threshold
+
+        diferencias += [(step, int(cell_id), "índice") for cell_id in ids[full & ~indexed].tolist()]
+        diferencias += [(step, int(cell_id), "recorrido completo") for cell_id in ids[indexed & ~full].tolist()]
+
+        parents = np.flatnonzero(full)
+        divisiones += [(step, int(cell_id)) for cell_id in ids[parents].tolist()]
+        if parents.size:
+            children = np.arange(next_id, next_id + parents.size, dtype=np.int64)
+            next_id += parents.size
+            for parent_id, child_id in zip(ids[parents].tolist(), children.tolist()):
+                lifecycle.on_birth(parent_id, child_id)
+            target[parents] /= 2.0
+            volume[parents] /= 2.0
+            ids = np.concatenate([ids, children])
+            target = np.concatenate([target, target[parents]])
+            volume = np.concatenate([volume, volume[parents]])
+            state.columns[sba.COL_TARGET_VOLUME][state.slots(ids[parents])] = target[parents]
+
+    leidas = index.checked / max(index.checked + index.skipped, 1)
+    print(f"🧬 mitosis: {len(divisiones)} divisiones en {mcs} MCS, {len(ids)} células finales, "
+          f"{leidas:.0%} de volúmenes leídos por el índice, {len(diferencias)} diferencias")
+    return diferencias
+
+class SyntheticSnapshot:
+    """
+    Foto del microambiente de una población sintética con la interfaz que usa
+    MutationSteppable (ensure, set_types y los arreglos por fila).
+    """
+    def __init__(self, cells):
+        self.cells = cells
+        self.ids = np.array([cell.id for cell in cells], dtype=np.int64)
+
+    def refresh(self, values):
+        """Nuevas concentraciones del MCS; los tipos se leen de las células, como al reconstruir la foto."""
+        self.values = values
+        self.env_class = sba.EnvironmentEvaluator(None).classify(values['o2'], values['glc'], values['lac'])
+        self.types = np.array([cell.type for cell in self.cells], dtype=np.int16)
+
+    def ensure(self, cell_list, mcs):
+        return self
+
+    def set_types(self, rows, types):
+        self.types[np.asarray(rows, dtype=np.int64)] = types
+
+def verificar_transiciones(celulas: int, mcs: int, semilla: int, rate: int = 1,
+                           intervalo: int = RANDOM_MUTATION_INTERVAL) -> List[Tuple[int, int, str]]:
+    """
+    Ejecuta MutationSteppable.step con el motor por lotes y con la versión
+    célula por célula sobre la misma población sintética y compara el
+    resultado de cada MCS.
+
+    Cada célula vive en un nicho (NICHES) con fluctuaciones y cambia de nicho
+    con probabilidad NICHE_CHANGE, de modo que los contadores crecen, decaen y
+    alcanzan sus umbrales. Las dos versiones tienen su propio generador con la
+    misma semilla: cualquier diferencia en el orden o el número de
+    extracciones (mutación por hipoxia, mutaciones aleatorias) cambia los
+    tipos de los MCS siguientes y aparece como diferencia.
+
+    Args:
+        celulas (int): Células de la población
+        mcs (int): MCS a simular a partir de MUTATION_DELAY
+        semilla (int): Semilla del generador de la población y de las dos versiones
+        rate (int): Evaluación multirate de MutationSteppable
+        intervalo (int): MCS entre mutaciones aleatorias
+
+    Returns:
+        List[Tuple[int, int, str]]: Diferencias (MCS, id de célula o -1, qué difiere)
+    """
+    rng = np.random.default_rng(semilla)
+    types = rng.choice((sba.CELL_TYPE_PROL, sba.CELL_TYPE_RESE, sba.CELL_TYPE_INVA), size=celulas)
+    niche = rng.integers(0, len(NICHES), size=celulas)
+
+    versiones = {}
+    for offset, vectorized in ((0, True), (celulas, False)):
+        steppable = sba.MutationSteppable(vectorized=vectorized, rate=rate)
+        steppable.rng = np.random.default_rng(semilla)
+        steppable.mutation_interval = intervalo
+        steppable.env = sba.EnvironmentEvaluator(None)
+        steppable.engine = sba.PhenotypeTransitionEngine(steppable.env)
+        steppable.field_accessor = sba.FieldAccessor(None)
+        steppable.cell_list = None
+        steppable.initialized = True
+        cells = [SimpleNamespace(id=offset + k + 1, type=int(t)) for k, t in enumerate(types.tolist())]
+        steppable.snapshot = SyntheticSnapshot(cells)
+        versiones["lotes" if vectorized else "célula por célula"] = steppable
+
+    lotes, celda = versiones["lotes"], versiones["célula por célula"]
+    state = sba.CellStateStore()
+    diferencias = []
+    start = sba.MUTATION_DELAY
+    for step in range(start, start + mcs):
+        changed = rng.random(celulas) < NICHE_CHANGE
+        niche[changed] = rng.integers(0, len(NICHES), size=int(changed.sum()))
+        values = _concentrations(rng, niche)
+        for steppable in (lotes, celda):
+            steppable.snapshot.refresh(values)
+            steppable.step(step)
+
+        tipos = [np.array([cell.type for cell in s.snapshot.cells]) for s in (lotes, celda)]
+        diferencias += [(step, k + 1, "tipo") for k in np.flatnonzero(tipos[0] != tipos[1]).tolist()]
+        for name in sba.PHENOTYPE_COUNTERS:
+            a, b = (state.columns[name][state.slots(s.snapshot.ids)] for s in (lotes, celda))
+            diferencias += [(step, k + 1, name) for k in np.flatnonzero(a != b).tolist()]
+        if lotes.mutation_count != celda.mutation_count:
+            diferencias.append((step, -1, f"mutaciones {lotes.mutation_count} != {celda.mutation_count}"))
+        if lotes.transition_counts != celda.transition_counts:
+            diferencias.append((step, -1, f"transiciones {lotes.transition_counts} != {celda.transition_counts}"))
+        if diferencias:
+            break  # las diferencias se propagan: se informa el primer MCS que difiere
+
+    print(f"🔄 transiciones: {lotes.mutation_count} mutaciones y {lotes.transition_counts} en {mcs} MCS "
+          f"(rate {rate}), {len(diferencias)} diferencias")
+    return diferencias
+
+def _concentrations(rng, niche):
+    """Concentraciones por célula: centro del nicho más una fluctuación uniforme."""
+    values = np.maximum(NICHES[niche] + rng.uniform(-1.0, 1.0, size=(len(niche), 3)) * NICHE_NOISE, 0.0)
+    return {name: values[:, k] for k, name in enumerate(('o2', 'glc', 'lac'))}
+
+def main():
+    """Función principal para ejecutar el script desde la línea de comandos."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Verifica que las optimizaciones de steady_state producen los mismos eventos")
+    parser.add_argument("--celulas", type=int, default=500, help="Células iniciales de la población sintética")
+    parser.add_argument("--mcs", type=int, default=400, help="MCS a simular")
+    parser.add_argument("--semilla", type=int, default=7, help="Semilla del generador")
+    parser.add_argument("--ruido", type=float, default=VOLUME_NOISE,
+                        help="Fluctuación máxima del volumen por MCS en voxels (mitosis)")
+    parser.add_argument("--relajacion", type=float, default=VOLUME_RELAXATION,
+                        help="Fracción de la diferencia con el volumen objetivo recuperada por MCS (mitosis)")
+    parser.add_argument("--rate", type=int, default=1, help="Evaluación multirate de MutationSteppable (transiciones)")
+    parser.add_argument("--intervalo", type=int, default=RANDOM_MUTATION_INTERVAL,
+                        help="MCS entre mutaciones aleatorias (transiciones)")
+    parser.add_argument("--solo", choices=("mitosis", "transiciones"), default=None,
+                        help="Ejecutar solo una verificación")
+    parser.add_argument("--salida", default=None, help="Directorio para logs y manifiesto (default: temporal)")
+    args = parser.parse_args()
+
+    salida = args.salida or tempfile.mkdtemp(prefix="verificacion_")
+    sba.configure_run(output_dir=salida, seed=args.semilla, log_profile="quiet")
+    fallos = 0
+    if args.solo in (None, "mitosis"):
+        diferencias = verificar_mitosis(args.celulas, args.mcs, args.semilla, args.ruido, args.relajacion)
+        for step, cell_id, omitida in diferencias[:20]:
+            print(f"❌ MCS {step}: célula {cell_id} no dividida por {omitida}")
+        fallos += len(diferencias)
+    if args.solo in (None, "transiciones"):
+        diferencias = verificar_transiciones(args.celulas, args.mcs, args.semilla, args.rate, args.intervalo)
+        for step, cell_id, que in diferencias[:20]:
+            print(f"❌ MCS {step}: {'célula ' + str(cell_id) + ': ' if cell_id >= 0 else ''}{que} difiere")
+        fallos += len(diferencias)
+    sba.RunOutput().close()
+    sys.exit(1 if fallos else 0)
+
+if __name__ == "__main__":
+    main()